@@ -1,11 +1,29 @@
+import operator
+from collections import OrderedDict
+
+# Operator precedence and the functions behind each operator
+PRECEDENCE = {'+': 1, '-': 1, '*': 2, '/': 2}
+OPERATORS = {'+': operator.add, '-': operator.sub, '*': operator.mul, '/': operator.truediv}
+
+# Kinds of steps in a compiled expression
+CONST, NAME, OP, INVALID = range(4)
+
 class Interpreter:
     def __init__(self):
         self.variables = {}  # Dictionary to store variable assignments
         self.undefined_variables = set()  # Set to track undefined variables
+        self.expression_cache = OrderedDict()  # Compiled expressions, least recently used first
+        self.expression_cache_size = 1024
 
     def interpret(self, program):
         # Split the program into lines and execute each line
-        lines = program.split('\n')
+        self.execute_lines(program.split('\n'))
+
+    def interpret_stream(self, file_obj):
+        # Same as interpret, but pulls lines from the file as they are needed
+        self.execute_lines(file_obj)
+
+    def execute_lines(self, lines):
         for line in lines:
             line = line.strip()
             if line:  # Skip empty lines
@@ -52,61 +70,73 @@ class Interpreter:
             print("Syntax Error: Unknown statement.")    
 
     def evaluate_expression(self, tokens):
-        # Stack to hold intermediate results
-        stack = []
+        # Expressions are compiled once into reverse-Polish order and cached by their tokens
+        key = tuple(tokens)
+        cache = self.expression_cache
+        program = cache.get(key)
+        if program is None:
+            program = self.compile_expression(key)
+            cache[key] = program
+            if len(cache) > self.expression_cache_size:
+                cache.popitem(last=False)
+        else:
+            cache.move_to_end(key)
 
-        # Operator precedence
-        precedence = {'+': 1, '-': 1, '*': 2, '/': 2}
-
-        # Function to apply an operator to two operands
-        def apply_operator(operators, values):
-            operator = operators.pop()
-            right = values.pop()
-            left = values.pop()
-            if operator == '+':
-                values.append(left + right)
-            elif operator == '-':
-                values.append(left - right)
-            elif operator == '*':
-                values.append(left * right)
-            elif operator == '/':
-                if right == 0:
+        values = []
+        for kind, arg in program:
+            if kind == NAME:
+                # Anything that is not a literal or operator has to be a known variable
+                if arg in self.variables:
+                    values.append(self.variables[arg])
+                else:
+                    print(f"Syntax Error: Unrecognized token '{arg}'.")
+                    print(f"Syntax Error: add spaces '{arg}'.")
+                    return None
+            elif kind == CONST:
+                values.append(arg)
+            elif kind == OP:
+                right = values.pop()
+                try:
+                    values[-1] = arg(values[-1], right)
+                except ZeroDivisionError:
                     print("Error: Division by zero.")
+                    print("Error: Invalid expression.")
                     return None
-                values.append(left / right)
+            else:
+                print("Error: Invalid expression.")
+                return None
+        return values[0]
 
-        # Shunting-yard algorithm to parse and evaluate the expression
+    def compile_expression(self, tokens):
+        # Shunting-yard algorithm, run once per distinct expression
+        program = []
         operators = []
-        values = []
-
-        i = 0
-        while i < len(tokens):
-            token = tokens[i]
-
+        depth = 0
+        valid = True
+        for token in tokens:
             if token.isdigit():
-                values.append(int(token))
+                program.append((CONST, int(token)))
+                depth += 1
             elif token.startswith('"') and token.endswith('"'):
-                values.append(token.strip('"'))
-            elif token in self.variables:
-                values.append(self.variables[token])
-            elif token in precedence:
-                while (operators and operators[-1] in precedence and
-                       precedence[operators[-1]] >= precedence[token]):
-                    apply_operator(operators, values)
+                program.append((CONST, token.strip('"')))
+                depth += 1
+            elif token in PRECEDENCE:
+                while operators and PRECEDENCE[operators[-1]] >= PRECEDENCE[token]:
+                    valid = valid and depth >= 2
+                    program.append((OP, OPERATORS[operators.pop()]))
+                    depth -= 1
                 operators.append(token)
             else:
-                print(f"Syntax Error: Unrecognized token '{token}'.")
-                print(f"Syntax Error: add spaces '{token}'.")
-                return None
-            i += 1
-
+                program.append((NAME, token))
+                depth += 1
         while operators:
-            apply_operator(operators, values)
-
-        if len(values) != 1:
-            print("Error: Invalid expression.")
-            return None
-        return values[0]
+            valid = valid and depth >= 2
+            program.append((OP, OPERATORS[operators.pop()]))
+            depth -= 1
+        if depth != 1 or not valid:
+            # Keep the lookups so unknown tokens are still reported first
+            program = [item for item in program if item[0] == NAME] + [(INVALID, None)]
+        return tuple(program)
 
 def main():
     interpreter = Interpreter()
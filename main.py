@@ -1,15 +1,26 @@
+import argparse
+
 from Interpreter import Interpreter
 
 def main():
+    parser = argparse.ArgumentParser(description="Run a GRAH program.")
+    parser.add_argument("file", nargs="?", default="hero.GRAH")
+    parser.add_argument("--stream", action="store_true",
+                        help="read and execute the file line by line instead of loading it whole")
+    args = parser.parse_args()
+
     interpreter = Interpreter()
-    file_name = "hero.GRAH"
+    file_name = args.file
 
     try:
         with open(file_name, 'r') as file:
-            code = file.read()
-            interpreter.interpret(code)
+            if args.stream:
+                interpreter.interpret_stream(file)
+            else:
+                code = file.read()
+                interpreter.interpret(code)
     except FileNotFoundError:
         print("File not found.")    
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,10 +1,99 @@
-import re
+from collections import OrderedDict
+from grah_ast import (Parser, Declaration, Display, Print, Assignment, Append, ForLoop, IfStatement,
+                      SwitchStatement, SyntaxErrorStatement, Halt)
+from grah_lexer import Lexer, is_name
+from grah_output import BufferedSink
+from grah_expr import compile_expression, unary_operators, CONST, VAR, OP, MEMO, UNARY
+from grah_array import ArrayError, declared, target, append
+from grah_slots import Variables, Resolver, UNSET
+from grah_optimize import Optimizer, fold
+from grah_tier import Tiering
+import grah_ast
+import grah_lexer
+# grah_vm, grah_transpile, grah_profiler and grah_cache are imported only when
+# an interpreter needs them, to keep command-line startup short
+
+DEFAULT_CONFIG = {
+    "declare": ["grah", "hero"],   # Change this keyword to anything you want for variable declaration
+    "display": ["display-"], # Change this keyword to anything you want for display
+    "int": "int",         # Change this keyword to anything you want for integer type
+    "string": "string",    # Change this keyword to anything you want for string type
+    "for": "for",          # Change this keyword to anything you want for 'for' loop
+    "if": "if",            # Change this keyword to anything you want for 'if' statement
+    "else": "else",        # Change this keyword to anything you want for 'else' statement
+    "print": "print",
+    "switch": "switch",    # Add this keyword for 'switch' statement
+    "case": "case",        # Add this keyword for 'case' statement
+    "default": "default",  # Add this keyword for 'default' case
+    "array": "array",      # Change this keyword to anything you want for the array type
+    "append": "append",    # Change this keyword to anything you want for appending to an array
+    "length": "length",    # Change this keyword to anything you want for an array's length
+}
+
+# Keys added after dialects were first written; a config without them gets these
+ADDED_KEYS = ("array", "append", "length")
+
+# Programs shorter than this (in characters) parse faster than the cache module
+# can be imported and a cache file checked and loaded, so they are never cached
+CACHE_MIN_SIZE = 16384
 
 class Interpreter:
-    def __init__(self, config):
-        self.variables = {}
+    def __init__(self, config, backend="ast", output=None, profile=False, optimize=True, cache=False, cache_dir=None,
+                 tiering=True):
+        if backend not in ("ast", "vm", "python"):
+            raise ValueError(f"Unknown backend '{backend}'.")
+        config = {**{key: DEFAULT_CONFIG[key] for key in ADDED_KEYS}, **config}
+        self.variables = Variables()  # dict-like view over the slot list
+        self.output = output if output is not None else BufferedSink()  # Where displayed values and errors go
+        self.backend = backend
         self.config = config
         self.handlers = self.create_handlers(config)
+        self.executors = {
+            Declaration: self.handle_declaration,
+            Display: self.handle_display,
+            Print: self.handle_print,
+            Assignment: self.handle_assignment,
+            Append: self.handle_append,
+            ForLoop: self.handle_for_loop,
+            IfStatement: self.handle_if_statement,
+            SwitchStatement: self.handle_switch_statement,
+            SyntaxErrorStatement: self.handle_syntax_error,
+            Halt: self.handle_syntax_error,
+        }
+        self.profiler = None
+        if profile:
+            # Profiling times each statement in the tree walker, whatever the backend
+            from grah_profiler import Profiler
+            self.profiler = Profiler()
+            self.executors = {kind: self.profiler.wrap_statement(handler) for kind, handler in self.executors.items()}
+            self.run_expression = self.profiler.wrap_expression(self.run_expression)
+        self.lexer = Lexer(config)
+        self.parser = Parser(self)
+        self.cache = None  # parsed programs on disk, for interpret(program, path); opened on first use
+        self.cache_dir = cache_dir
+        self.use_cache = cache
+        self.expression_cache = OrderedDict()  # token tuple -> compiled program, least recently used first
+        self.expression_cache_size = 1024
+        self.unary = unary_operators(config)  # prefix keyword -> (symbol, function)
+        self.statement_kinds = {}  # statement text -> (keyword, syntax error)
+        self.statement_kinds_size = 4096
+        self.optimizer = Optimizer(config, self.compile_expression, self.variables) if optimize else None
+        if self.optimizer is not None and profile:
+            # A loop run in closed form would report no hits for its body
+            self.optimizer.closed_forms = False
+        self.resolver = Resolver(self.variables, self.compile_expression)
+        self.compiler = self.vm = self.transpiler = self.runtime = None
+        # Hot loops and ifs in the tree walker get compiled to closures; the
+        # profiler needs every statement to go through its wrapped executors
+        self.tiering = Tiering(self) if tiering and backend == "ast" and not profile else None
+        if backend == "vm":
+            from grah_vm import Compiler, VM
+            self.compiler = Compiler(config)
+            self.vm = VM(self)
+        elif backend == "python":
+            from grah_transpile import Transpiler, Runtime
+            self.transpiler = Transpiler(config, self.compile_expression)
+            self.runtime = Runtime(self)
         self.line_buffer = ""  # Buffer to keep track of the current line content
         self.last_print_was_newline = True  # Flag to track if the last print was a newline
 
@@ -19,344 +108,380 @@ class Interpreter:
         handlers[config["print"]] = self.handle_print
         handlers[config["if"]] = self.handle_if_statement
         handlers[config["switch"]] = self.handle_switch_statement
+        handlers[config["append"]] = self.handle_append
+
+        # Keyword -> (position, keyword); when both leading tokens are keywords
+        # the one registered first wins, as with the old linear scan
+        self.dispatch = {keyword: (position, keyword) for position, keyword in enumerate(handlers)}
         return handlers
 
-    def interpret(self, program):
-        lines = program.split('\n')
-        i = 0
-        while i < len(lines):
-            line = lines[i].strip()
-            if line:
-                if not line.endswith('.') and not line.endswith('{') and line != "}":
-                    print("Syntax Error: Statements must end with a period.")
+    def interpret(self, program, path=None):
+        # `path` names the file the program came from, for the parse cache
+        if self.profiler is not None:
+            self.profiler.add_source(program)
+        statements = None
+        if self.use_cache and path is not None and len(program) >= CACHE_MIN_SIZE:
+            if self.cache is None:
+                from grah_cache import ProgramCache
+                self.cache = ProgramCache(self.config, self.cache_dir, (__file__, grah_ast.__file__, grah_lexer.__file__))
+            statements = self.cache.load(path, program)
+            if statements is None:
+                statements = self.parser.parse(program)
+                self.cache.store(path, program, statements)
+        if statements is None:
+            statements = self.parser.parse(program)
+        self.run(statements)
+
+    def interpret_stream(self, file_obj, batch_lines=1):
+        # Executes a program while reading it line by line. Top-level statements run
+        # once `batch_lines` of them are buffered; a block is held until its closing
+        # brace, so memory is bounded by the largest block rather than the file.
+        # Each chunk is checked before it runs, but unlike interpret() errors in a
+        # later block come out after the output of the chunks before it.
+        pending = []
+        first_line = 1
+        line_number = 0
+        nested_level = 0
+        for raw_line in file_obj:
+            line_number += 1
+            pending.append(raw_line.rstrip('\n'))
+            line = raw_line.strip()
+            if nested_level == 0:
+                if line.endswith('{') and self.opens_block(line):
+                    nested_level = 1
+            elif self.parser.is_else_line(line):
+                pass
+            elif line == "}":
+                nested_level -= 1
+            elif line.endswith('{'):
+                nested_level += 1
+
+            if nested_level == 0 and len(pending) >= batch_lines:
+                if not self.run_stream_chunk(pending, first_line):
                     return
-                statement = line[:-1].strip() if line.endswith('.') else line
-                tokens = self.tokenize(statement)
-                matched = False
-
-                for keyword, handler in self.handlers.items():
-                    if tokens[0] == keyword or (len(tokens) > 1 and tokens[1] == keyword):
-                        if self.validate_syntax(tokens, keyword):
-                            if keyword == self.config["for"]:
-                                i = self.handle_for_loop(tokens, lines, i)
-                            elif keyword == self.config["if"]:
-                                i = self.handle_if_statement(tokens, lines, i)
-                            elif keyword == self.config["switch"]:
-                                i = self.handle_switch_statement(tokens, lines, i)
-                            else:
-                                handler(tokens)
-                        matched = True
-                        break
-
-                if not matched:
-                    print(f"Syntax Error: Unknown statement '{statement}'.")
-
-            i += 1
+                pending = []
+                first_line = line_number + 1
+        if pending:
+            self.run_stream_chunk(pending, first_line)
+
+    def opens_block(self, line):
+        keyword = self.classify(self.lexer.tokenize(line))
+        return keyword in (self.config["for"], self.config["if"], self.config["switch"])
+
+    def run_stream_chunk(self, lines, first_line):
+        # Returns False when the chunk ended the program with a missing-period error
+        program = "\n".join(lines)
+        if self.profiler is not None:
+            self.profiler.add_source(program, first_line)
+        statements = self.parser.parse(program, first_line)
+        self.run(statements)
+        return not (statements and isinstance(statements[-1], Halt))
+
+    def run(self, statements):
+        self.execute(self.prepare(statements))
+
+    def prepare(self, statements):
+        # Optimizes a parsed program and compiles it for the backend. The result
+        # stays valid for as long as this interpreter's variable slots do, so it
+        # can be passed to execute() again after reset().
+        if self.optimizer is not None:
+            statements = self.optimizer.optimize(statements)
+        if self.backend == "python" and self.profiler is None:
+            # Generated code keeps its variables in Python locals instead of slots
+            try:
+                return self.transpiler.compile(statements)
+            except (SyntaxError, RecursionError):
+                # Nested too deeply for CPython's compiler (about 20 blocks); the tree walker runs it
+                pass
+        self.resolver.resolve(statements)
+        if self.backend == "vm" and self.profiler is None:
+            return self.compiler.compile(statements)
+        return statements
+
+    def execute(self, prepared):
+        try:
+            if self.profiler is not None or self.backend == "ast":
+                self.execute_block(prepared)
+            elif self.backend == "vm":
+                self.vm.run(prepared)
+            elif prepared.__class__ is list:
+                self.execute_block(prepared)
+            else:
+                prepared(self.runtime, self.variables)
+        finally:
+            self.output.flush()
+
+    def reset(self):
+        # Forgets every variable's value and the print column, keeping slots and caches
+        self.variables.clear()
+        self.line_buffer = ""
+        self.last_print_was_newline = True
+
+    def execute_block(self, statements):
+        executors = self.executors
+        for node in statements:
+            executors[node.__class__](node)
+
+    def classify(self, tokens):
+        if not tokens:
+            return None
+        dispatch = self.dispatch
+        first = dispatch.get(tokens[0])
+        if len(tokens) > 1:
+            if tokens[1] == "=" and first is None:
+                return "="  # Assignment fast path
+            second = dispatch.get(tokens[1])
+            if second is not None and (first is None or second[0] < first[0]):
+                return second[1]
+        return first[1] if first is not None else None
+
+    def classify_statement(self, statement, tokens):
+        # Returns (keyword, syntax error) for a statement, remembering the result
+        # so repeated lines and re-parses skip classification and validation
+        entry = self.statement_kinds.get(statement)
+        if entry is None:
+            keyword = self.classify(tokens)
+            error = self.syntax_error(tokens, keyword) if keyword is not None else None
+            entry = (keyword, error)
+            if len(self.statement_kinds) >= self.statement_kinds_size:
+                self.statement_kinds.clear()
+            self.statement_kinds[statement] = entry
+        return entry
 
     def tokenize(self, statement):
-        
-        # This method splits the statement into tokens while preserving quoted strings as single tokens
-        return re.findall(r'\".*?\"|\S+', statement)
+        # Tokens from the dialect's lexer; quoted strings stay single tokens
+        return self.lexer.tokenize(statement)
 
-    def validate_syntax(self, tokens, keyword):
+    def syntax_error(self, tokens, keyword):
+        # Returns the message for a malformed statement, or None when it is well formed
         if keyword in self.config["declare"]:
             if len(tokens) < 5 or tokens[3] != "=":
-                print("Syntax Error: Invalid variable declaration.")
-                return False
-            if tokens[1] != self.config["int"] and tokens[1] != self.config["string"]:
-                print("Syntax Error: Invalid type for declaration.")
-                return False
-            if not re.match(r'^[a-zA-Z_]\w*$', tokens[2]):
-                print(f"Syntax Error: Invalid variable name '{tokens[2]}'.")
-                return False
+                return "Syntax Error: Invalid variable declaration."
+            if tokens[1] not in (self.config["int"], self.config["string"], self.config["array"]):
+                return "Syntax Error: Invalid type for declaration."
+            if not is_name(tokens[2]):
+                return f"Syntax Error: Invalid variable name '{tokens[2]}'."
         elif keyword in self.config["display"]:
             if len(tokens) < 2:
-                print("Syntax Error: Display statement must have an expression.")
-                return False
+                return "Syntax Error: Display statement must have an expression."
         elif keyword == self.config["for"]:
-            if len(tokens) < 5 or tokens[2] != "in" or tokens[3] != "range" or not re.match(r'\d+', tokens[4]) or not tokens[-1].endswith("{"):
-                print("Syntax Error: Invalid 'for' loop syntax.")
-                return False
+            if len(tokens) < 5 or tokens[2] != "in" or not tokens[-1].endswith("{"):
+                return "Syntax Error: Invalid 'for' loop syntax."
+            if tokens[3] == "range" and not tokens[4][:1].isdigit():
+                return "Syntax Error: Invalid 'for' loop syntax."
+            if tokens[3] != "range" and (len(tokens) != 5 or not is_name(tokens[3])):
+                return "Syntax Error: Invalid 'for' loop syntax."
         elif keyword in [self.config["print"]]:  
             if len(tokens) < 2:
-                print(f"Syntax Error: '{keyword}' statement must have an expression.")
-                return False
+                return f"Syntax Error: '{keyword}' statement must have an expression."
         elif keyword == self.config["if"]:
             if len(tokens) < 4 or not tokens[-1].endswith("{"):
-                print("Syntax Error: Invalid 'if' statement syntax.")
-                return False
+                return "Syntax Error: Invalid 'if' statement syntax."
         elif keyword == self.config["switch"]:
             if len(tokens) < 2 or not tokens[-1].endswith("{"):
-                print("Syntax Error: Invalid 'switch' statement syntax.")
-                return False
+                return "Syntax Error: Invalid 'switch' statement syntax."
+        elif keyword == self.config["append"]:
+            if len(tokens) < 3 or not is_name(tokens[1]):
+                return f"Syntax Error: Invalid '{keyword}' statement syntax."
         elif "=" in tokens:
             if len(tokens) < 3 or tokens[1] != "=":
-                print("Syntax Error: Invalid assignment statement.")
-                return False
-            if not re.match(r'^[a-zA-Z_]\w*$', tokens[0]):
-                print(f"Syntax Error: Invalid variable name '{tokens[0]}'.")
-                return False
+                return "Syntax Error: Invalid assignment statement."
+            if not is_name(tokens[0]):
+                return f"Syntax Error: Invalid variable name '{tokens[0]}'."
         else:
-            print("Syntax Error: Unrecognized syntax.")
-            return False
-        return True
-
-    def handle_declaration(self, tokens):
-        if len(tokens) < 5 or tokens[3] != "=":
-            
-            print("Syntax Error: Invalid variable declaration.")
-            return
-        var_type = tokens[1]
-        var_name = tokens[2]
-        expr = " ".join(tokens[4:])
-        value = self.evaluate_expression(expr.split())
+            return "Syntax Error: Unrecognized syntax."
+        return None
 
-        if var_type == self.config["int"]:
+    def handle_declaration(self, node):
+        value = self.run_expression(node.program)
+
+        if node.var_type == self.config["int"]:
             value = int(value)
-        elif var_type == self.config["string"]:
+        elif node.var_type == self.config["string"]:
             value = str(value.strip('"'))
+        elif node.var_type == self.config["array"]:
+            if value is None:
+                return
+            try:
+                value = declared(value, node.name)
+            except ArrayError as e:
+                self.output.write(f"{e}\n")
+                return
         else:
-            print(f"Syntax Error: Unknown type '{var_type}' for declaration.")
+            self.output.write(f"Syntax Error: Unknown type '{node.var_type}' for declaration.\n")
             return
-        
-        self.variables[var_name] = value
 
-    def handle_display(self, tokens):
-        expr_tokens = tokens[1:]
-        value = self.evaluate_expression(expr_tokens)
+        self.variables.values[node.slot] = value
+
+    def handle_display(self, node):
+        value = self.run_expression(node.program)
         if value is not None:
             if not self.last_print_was_newline:
-                print()  # Print a new line before printing the value
-            print(value)
+                self.output.write("\n")  # Start a new line before printing the value
+            self.output.write(f"{value}\n")
         self.last_print_was_newline = True  # Update flag
-            
-    def handle_print(self, tokens):
-        expr_tokens = tokens[1:]
-        value = self.evaluate_expression(expr_tokens)
+
+    def handle_print(self, node):
+        value = self.run_expression(node.program)
         if value is not None:
-            if not self.last_print_was_newline:
-                print('', end='')  # Ensure no new line is printed
-            print(value, end='')
+            self.output.write(str(value))
         self.last_print_was_newline = False  # Update flag
 
-    def handle_assignment(self, tokens):
-        var_name = tokens[0]
-        if var_name not in self.variables:
-            print(f"Error: Variable '{var_name}' is used before being declared with '{self.config['declare']}'.")
+    def handle_assignment(self, node):
+        values = self.variables.values
+        if node.slot is None or values[node.slot] is UNSET:
+            self.output.write(f"Error: Variable '{node.name}' is used before being declared with '{self.config['declare']}'.\n")
             return
-        expr = " ".join(tokens[2:])
-        value = self.evaluate_expression(expr.split())
-        self.variables[var_name] = value
+        values[node.slot] = self.run_expression(node.program)
 
-    def handle_for_loop(self, tokens, lines, start_index):
-        loop_var = tokens[1]
-        range_value = int(tokens[4].strip("()"))
+    def handle_append(self, node):
+        array = self.array(node.slot, node.name)
+        if array is None:
+            return
+        value = self.run_expression(node.program)
+        if value is not None:
+            try:
+                append(array, value)
+            except ArrayError as e:
+                self.output.write(f"{e}\n")
+
+    def array(self, slot, name):
+        # The array a variable holds, or None after reporting why it has none
+        value = self.variables.values[slot] if slot is not None else UNSET
+        if value is UNSET:
+            self.output.write(f"Error: Variable '{name}' is not defined.\n")
+            return None
+        try:
+            return target(value, name)
+        except ArrayError as e:
+            self.output.write(f"{e}\n")
+            return None
 
-        loop_body = []
-        i = start_index + 1
-        nested_level = 1
+    def handle_for_loop(self, node):
+        if node.closed is not None and node.closed.run(self.variables.values):
+            return
+        if node.compiled is None:
+            if node.source is None:
+                elements = range(node.count)
+            else:
+                elements = self.array(node.source_slot, node.source)
+                if elements is None:
+                    return
+                elements = elements.copy()  # appending in the body does not change what the loop walks
+            if self.tiering is None or not self.tiering.enter_loop(node, len(elements)):
+                values = self.variables.values
+                slot = node.slot
+                body = node.body
+                for memo in node.invariants:
+                    memo.value = None
+                common = node.common
+                if common:
+                    for j in elements:
+                        values[slot] = j
+                        for memo in common:
+                            memo.value = None
+                        self.execute_block(body)
+                else:
+                    for j in elements:
+                        values[slot] = j
+                        self.execute_block(body)
+                return
+        node.compiled()
+
+    def handle_if_statement(self, node):
+        if node.compiled is None and (self.tiering is None or not self.tiering.enter_branch(node)):
+            if self.run_expression(node.program):
+                self.execute_block(node.body)
+            else:
+                self.execute_block(node.else_body)
+        else:
+            node.compiled()
 
-        while i < len(lines):
-            line = lines[i].strip()
-            if line == "{":
-                nested_level += 1
-            elif line == "}":
-                nested_level -= 1
-                if nested_level == 0:
-                    break
-            loop_body.append(line)
-            i += 1
-
-        if nested_level != 0:
-            print("Syntax Error: Mismatched braces in 'for' loop.")
-            return start_index
-
-        for j in range(range_value):
-            self.variables[loop_var] = j
-            self.interpret("\n".join(loop_body))
-        
-        return i
-
-    def handle_if_statement(self, tokens, lines, start_index):
-        condition_expr = " ".join(tokens[1:-1])
-        condition = self.evaluate_expression(condition_expr.split())
-        
-        if_body = []
-        else_body = []
-        current_body = if_body
-        i = start_index + 1
-        nested_level = 1
-
-        while i < len(lines):
-            line = lines[i].strip()
-            print("Debugging mode:")
-            print(f"Processing line: {line}, nested_level: {nested_level}")
-            
-            if line == "{":
-                nested_level += 1
-            elif line == "}":
-                nested_level -= 1
-                if nested_level == 0:
-                    break
-            elif line.startswith(self.config["else"]) and nested_level == 1:
-                print("Switching to else body")
-                current_body = else_body
-                continue
-            current_body.append(line)
-            i += 1
-
-        if nested_level != 0:
-            print("Syntax Error: Mismatched braces in 'if' statement.")
-            return start_index
-
-        # Remove the 'else {' line from if_body
-        if len(if_body) > 0 and if_body[-1] == self.config["else"] + " {":
-            if_body.pop()
-        
-        print("If body:", if_body)
-        print("Else body:", else_body)
-        print("Output:\n")
-        
-        if condition:
-            self.interpret("\n".join(if_body))
+    def handle_switch_statement(self, node):
+        switch_value = self.variables.values[node.slot] if node.slot is not None else UNSET
+        if switch_value is not UNSET:
+            index = node.table.lookup(switch_value)
+            self.execute_block(node.bodies[index] if index is not None else node.default)
         else:
-            self.interpret("\n".join(else_body))
-        
-        return i
-
-    def handle_switch_statement(self, tokens, lines, start_index):
-        switch_var = tokens[1]
-
-        case_bodies = {}
-        default_body = []
-        current_case = None
-        i = start_index + 1
-        nested_level = 1
-
-        while i < len(lines):
-            line = lines[i].strip()
-            if line == "{":
-                nested_level += 1
-            elif line == "}":
-                nested_level -= 1
-                if nested_level == 0:
-                    break
-            elif line.startswith(self.config["case"]):
-                current_case = line.split()[1].strip(":")
-                case_bodies[current_case] = []
-            elif line.startswith(self.config["default"]):
-                current_case = "default"
-            elif current_case is not None:
-                if current_case == "default":
-                    default_body.append(line)
-                else:
-                    case_bodies[current_case].append(line)
-            i += 1
-
-        if nested_level != 0:
-            print("Syntax Error: Mismatched braces in 'switch' statement.")
-            return start_index
-
-        if switch_var in self.variables:
-            switch_value = self.variables[switch_var]
-            if str(switch_value) in case_bodies:
-                self.interpret("\n".join(case_bodies[str(switch_value)]))
-            elif "default" in case_bodies:
-                self.interpret("\n".join(case_bodies["default"]))
+            self.output.write(f"Error: Variable '{node.var}' is not defined.\n")
+
+    def handle_syntax_error(self, node):
+        self.output.write(f"{node.message}\n")
+
+    def compile_expression(self, tokens):
+        key = tuple(tokens)
+        cache = self.expression_cache
+        program = cache.get(key)
+        if program is None:
+            program = compile_expression(key, self.unary)
+            if self.optimizer is not None:
+                program = fold(program)
+            cache[key] = program
+            if len(cache) > self.expression_cache_size:
+                cache.popitem(last=False)
         else:
-            print(f"Error: Variable '{switch_var}' is not defined.")
-        
-        return i
+            cache.move_to_end(key)
+        return program
 
     def evaluate_expression(self, tokens):
-        stack = []
-        precedence = {'+': 1, '-': 1, '*': 2, '/': 2, '>': 0, '<': 0, '>=': 0, '<=': 0, '==': 0, '!=': 0}
-
-        def apply_operator(operators, values):
-            operator = operators.pop()
-            right = values.pop()
-            left = values.pop()
-            if operator == '+':
-                values.append(left + right)
-            elif operator == '-':
-                values.append(left - right)
-            elif operator == '*':
-                values.append(left * right)
-            elif operator == '/':
-                if right == 0:
-                    print("Error: Division by zero.")
-                    return None
-                values.append(left / right)
-            elif operator == '>':
-                values.append(left > right)
-            elif operator == '<':
-                values.append(left < right)
-            elif operator == '>=':
-                values.append(left >= right)
-            elif operator == '<=':
-                values.append(left <= right)
-            elif operator == '==':
-                values.append(left == right)
-            elif operator == '!=':
-                values.append(left != right)
-
-        operators = []
+        # For tokens outside a resolved program: every name gets a slot and is
+        # checked when read
+        slot = self.variables.slot
+        program = tuple((VAR, slot(arg)) if kind == VAR else (kind, arg)
+                        for kind, arg in self.compile_expression(tokens))
+        return self.run_expression(program)
+
+    def run_expression(self, program):
+        # Straight pass over a resolved reverse-Polish program; VAR items carry slots
+        slots = self.variables.values
         values = []
-        i = 0
-        while i < len(tokens):
-            token = tokens[i]
-            if token.isdigit():
-                values.append(int(token))
-            elif re.match(r'^[a-zA-Z_]\w*$', token):
-                if token in self.variables:
-                    values.append(self.variables[token])
-                else:
-                    print(f"Error: Variable '{token}' is not defined.")
+        push = values.append
+        for kind, arg in program:
+            if kind == VAR:
+                value = slots[arg]
+                if value is UNSET:
+                    self.output.write(f"Error: Variable '{self.variables.names[arg]}' is not defined.\n")
+                    return None
+                push(value)
+            elif kind == CONST:
+                push(arg)
+            elif kind == OP:
+                right = values.pop()
+                try:
+                    values[-1] = arg[1](values[-1], right)
+                except ZeroDivisionError:
+                    self.output.write("Error: Division by zero.\n")
+                    self.output.write("Error: Invalid expression.\n")
                     return None
-            elif token in precedence:
-                while (operators and operators[-1] in precedence and
-                       precedence[operators[-1]] >= precedence[token]):
-                    apply_operator(operators, values)
-                operators.append(token)
-            elif token.startswith('"') and token.endswith('"'):
-                values.append(token.strip('"'))
+                except ArrayError as e:
+                    self.output.write(f"{e}\n")
+                    return None
+            elif kind == UNARY:
+                try:
+                    values[-1] = arg[1](values[-1])
+                except ArrayError as e:
+                    self.output.write(f"{e}\n")
+                    return None
+            elif kind == MEMO:
+                value = arg.value
+                if value is None:
+                    # Not through self.run_expression, which the profiler may have wrapped
+                    value = Interpreter.run_expression(self, arg.program)
+                    if value is None:
+                        return None
+                    arg.value = value
+                push(value)
             else:
-                print(f"Syntax Error: Unrecognized token '{token}'.")
+                self.output.write(f"{arg}\n")
                 return None
-            i += 1
-
-        while operators:
-            apply_operator(operators, values)
-
-        if len(values) != 1:
-            print("Error: Invalid expression.")
-            return None
         return values[0]
 
 def main():
-    config = {
-        "declare": ["grah", "hero"],   # Change this keyword to anything you want for variable declaration
-        "display": ["display-"], # Change this keyword to anything you want for display
-        "int": "int",         # Change this keyword to anything you want for integer type
-        "string": "string",    # Change this keyword to anything you want for string type
-        "for": "for",          # Change this keyword to anything you want for 'for' loop
-        "if": "if",            # Change this keyword to anything you want for 'if' statement
-        "else": "else",        # Change this keyword to anything you want for 'else' statement
-        "print": "print",
-        "switch": "switch",    # Add this keyword for 'switch' statement
-        "case": "case",        # Add this keyword for 'case' statement
-        "default": "default",  # Add this keyword for 'default' case
-    }
-    
-    interpreter = Interpreter(config)
-    file_name = "test/hero.GRAH"
-
-    try:
-        with open(file_name, 'r') as file:
-            code = file.read()
-            interpreter.interpret(code)
-    except FileNotFoundError:
-        print("File not found.")
+    # Kept for `python Interpreter.py file.GRAH`; the command line lives in grah_cli
+    import sys
+    from grah_cli import main as cli_main
+    return cli_main(["run"] + sys.argv[1:])
 
 if __name__ == "__main__":
-    main()
+    import sys
+    sys.exit(main())
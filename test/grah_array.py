@@ -0,0 +1,136 @@
+# Array values: 64-bit signed integers kept in one contiguous array('q')
+# buffer rather than a list of Python ints. + - * with another array of the
+# same length, or with an int on either side, work element-wise: a map over
+# the buffers that applies the operator once per element, then one copy into
+# a new array. This is not vectorized; it only saves building a list first.
+# Any other operand (a string, a fraction, a comparison's result) is an error,
+# as are / and the ordering comparisons; == and != compare whole arrays.
+# Anything a program can get wrong with an array raises ArrayError, whose
+# text is the message the interpreter reports.
+import operator
+from array import array
+from itertools import repeat
+
+
+class ArrayError(Exception):
+    pass
+
+
+def build(values):
+    # fromlist() on a list sizes the buffer once; building from the iterator grows it element by element
+    result = Array()
+    try:
+        result.fromlist(list(values))
+    except OverflowError:
+        raise ArrayError("Error: Array element out of the 64-bit integer range.") from None
+    return result
+
+
+OPERAND_KINDS = {str: "a string", float: "a fraction", bool: "a comparison result"}
+
+
+def mismatch(symbol, other):
+    # bool is an int subclass, so checks for ints compare classes
+    kind = OPERAND_KINDS.get(other.__class__, "a non-integer value")
+    return ArrayError(f"Error: Cannot apply '{symbol}' to an array and {kind}.")
+
+
+def elementwise(function, symbol):
+    def forward(self, other):
+        if type(other) is Array:
+            if len(other) != len(self):
+                raise ArrayError(f"Error: Cannot apply '{symbol}' to arrays of lengths {len(self)} and {len(other)}.")
+            return build(map(function, self, other))
+        if other.__class__ is int:
+            return build(map(function, self, repeat(other, len(self))))
+        raise mismatch(symbol, other)
+
+    def reflected(self, other):
+        if other.__class__ is int:
+            return build(map(function, repeat(other, len(self)), self))
+        raise mismatch(symbol, other)
+
+    return forward, reflected
+
+
+def refuse(message):
+    def refused(self, other):
+        raise ArrayError(message)
+    return refused
+
+
+class Array(array):
+    __slots__ = ()
+
+    def __new__(cls, values=()):
+        return array.__new__(cls, 'q', values)
+
+    __add__, __radd__ = elementwise(operator.add, '+')
+    __sub__, __rsub__ = elementwise(operator.sub, '-')
+    __mul__, __rmul__ = elementwise(operator.mul, '*')
+    __truediv__ = __rtruediv__ = refuse("Error: Cannot apply '/' to an array.")
+    # Python swaps the symbol when an array is on the right, so one message for all four
+    __gt__ = __lt__ = __ge__ = __le__ = refuse("Error: Arrays can only be compared with '==' and '!='.")
+
+    def copy(self):
+        result = Array()
+        result.extend(self)  # same typecode: one memcpy
+        return result
+
+    def __str__(self):
+        return f"[{', '.join(map(str, self))}]"
+
+    def __repr__(self):
+        return f"Array({list(self)})"
+
+    def __reduce__(self):
+        return (Array, (list(self),))
+
+
+def index(container, position):
+    # container [ position ]: an element of an array or a character of a string
+    if type(container) is not Array and type(container) is not str:
+        raise ArrayError("Error: Only arrays and strings can be indexed.")
+    if type(position) is not int:
+        raise ArrayError("Error: Array and string indexes must be integers.")
+    if position < 0 or position >= len(container):
+        raise ArrayError(f"Error: Index {position} is out of range for length {len(container)}.")
+    return container[position]
+
+
+def length(value):
+    if type(value) is not Array and type(value) is not str:
+        raise ArrayError("Error: Only arrays and strings have a length.")
+    return len(value)
+
+
+def copy(value):
+    # What assignments store: an array is copied so that appending through one
+    # variable never shows through another
+    return value.copy() if type(value) is Array else value
+
+
+def declared(value, name):
+    # The value a declared array starts with
+    if type(value) is not Array:
+        raise ArrayError(f"Error: Array '{name}' must be declared with an array value.")
+    return value.copy()
+
+
+def target(value, name):
+    # The array an 'append' statement or a 'for ... in' loop works on
+    if type(value) is not Array:
+        raise ArrayError(f"Error: Variable '{name}' is not an array.")
+    return value
+
+
+def append(values, value):
+    if type(value) is Array:
+        values.extend(value)
+    elif value.__class__ is int:
+        try:
+            values.append(value)
+        except OverflowError:
+            raise ArrayError("Error: Array element out of the 64-bit integer range.") from None
+    else:
+        raise ArrayError("Error: Arrays hold integers only.")
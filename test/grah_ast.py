@@ -0,0 +1,283 @@
+# Parse-once front end: turns a GRAH program into a tree of statement nodes
+# so block bodies are tokenized and validated a single time, not on every run.
+
+
+class Node:
+    __slots__ = ("line",)
+
+    def __init__(self, line):
+        self.line = line  # 1-based source line the statement came from
+
+
+class Declaration(Node):
+    __slots__ = ("var_type", "name", "expr", "optimized", "slot", "program")
+
+    def __init__(self, line, var_type, name, expr):
+        super().__init__(line)
+        self.var_type = var_type
+        self.name = name
+        self.expr = expr
+        self.optimized = None  # expression program from grah_optimize, when it ran
+        self.slot = None  # variable slot, filled in by grah_slots.Resolver
+        self.program = None  # resolved expression program, likewise
+
+
+class Display(Node):
+    __slots__ = ("expr", "optimized", "program")
+
+    def __init__(self, line, expr):
+        super().__init__(line)
+        self.expr = expr
+        self.optimized = None
+        self.program = None
+
+
+class Print(Node):
+    __slots__ = ("expr", "optimized", "program")
+
+    def __init__(self, line, expr):
+        super().__init__(line)
+        self.expr = expr
+        self.optimized = None
+        self.program = None
+
+
+class Assignment(Node):
+    __slots__ = ("name", "expr", "optimized", "slot", "program")
+
+    def __init__(self, line, name, expr):
+        super().__init__(line)
+        self.name = name
+        self.expr = expr
+        self.optimized = None
+        self.slot = None  # stays None when the name is never declared
+        self.program = None
+
+
+class Append(Node):
+    __slots__ = ("name", "expr", "optimized", "slot", "program")
+
+    def __init__(self, line, name, expr):
+        super().__init__(line)
+        self.name = name  # the array appended to
+        self.expr = expr
+        self.optimized = None
+        self.slot = None
+        self.program = None
+
+
+class ForLoop(Node):
+    __slots__ = ("var", "count", "body", "source", "slot", "source_slot", "invariants", "common", "closed", "hits",
+                 "compiled")
+
+    def __init__(self, line, var, count, body, source=None):
+        super().__init__(line)
+        self.var = var
+        self.count = count  # None when the loop walks an array
+        self.body = body
+        self.source = source  # name of that array
+        self.slot = None
+        self.source_slot = None
+        self.invariants = ()  # grah_expr.Memo values cleared as the loop starts
+        self.common = ()  # and those cleared before every iteration
+        self.closed = None  # grah_closed.ClosedForm when the loop has one
+        self.hits = 0  # iterations run by the tree walker, for grah_tier
+        self.compiled = None  # grah_tier closure once the loop is hot
+
+
+class IfStatement(Node):
+    __slots__ = ("condition", "body", "else_body", "optimized", "program", "hits", "compiled")
+
+    def __init__(self, line, condition, body, else_body):
+        super().__init__(line)
+        self.condition = condition
+        self.body = body
+        self.else_body = else_body
+        self.optimized = None
+        self.program = None
+        self.hits = 0  # times the tree walker entered it, for grah_tier
+        self.compiled = None
+
+
+class SwitchStatement(Node):
+    __slots__ = ("var", "cases", "default", "slot", "table", "bodies")
+
+    def __init__(self, line, var, cases, default):
+        super().__init__(line)
+        self.var = var
+        self.cases = cases  # case label (as written) -> body
+        self.default = default  # body under 'default:', run when no case matches
+        self.slot = None
+        self.table = None  # grah_switch.SwitchTable over the labels, built by the resolver
+        self.bodies = None  # case bodies in label order, indexed by the table
+
+
+class SyntaxErrorStatement(Node):
+    # Reports its message when reached and lets the block carry on
+    __slots__ = ("message",)
+
+    def __init__(self, line, message):
+        super().__init__(line)
+        self.message = message
+
+
+class Halt(Node):
+    # Reports its message when reached; the parser drops the rest of the block
+    __slots__ = ("message",)
+
+    def __init__(self, line, message):
+        super().__init__(line)
+        self.message = message
+
+
+class Parser:
+    def __init__(self, interpreter):
+        self.interpreter = interpreter
+        self.config = interpreter.config
+
+    def parse(self, program, first_line=1):
+        # first_line numbers the statements when `program` is a piece of a larger file
+        lines = []
+        self.line_tokens = []
+        self.first_line = first_line
+        for text, tokens in self.interpreter.lexer.lines(program):
+            lines.append(text)
+            self.line_tokens.append(tokens)
+        # Brace mismatches are found in one pass and reported before anything runs
+        statements = self.build_block_table(lines)
+        statements.extend(self.parse_block(lines, 0, len(lines)))
+        return statements
+
+    def build_block_table(self, lines):
+        # Single pass over the program that fills self.blocks with
+        # {opening line: (index of its '}', else lines directly inside, case
+        # lines directly inside)}. Returns an error statement per unmatched brace.
+        self.blocks = {}
+        self.unmatched = set()  # stray '}' lines, skipped when parsing
+        errors = []
+        stack = []  # [opening line, else lines, case lines] for every open block
+        for i, line in enumerate(lines):
+            if self.is_else_line(line):
+                if stack:
+                    stack[-1][1].append(i)
+            elif line == "}":
+                if stack:
+                    start, else_lines, case_lines = stack.pop()
+                    self.blocks[start] = (i, else_lines, case_lines)
+                else:
+                    self.unmatched.add(i)
+                    errors.append(SyntaxErrorStatement(
+                        i + self.first_line, f"Syntax Error: Mismatched braces: '}}' on line {i + self.first_line} has no matching '{{'."))
+            elif line.endswith("{"):
+                stack.append([i, [], []])
+            elif stack and self.is_case_line(line):
+                stack[-1][2].append(i)
+        for start, _, _ in stack:
+            errors.append(SyntaxErrorStatement(
+                start + self.first_line, f"Syntax Error: Mismatched braces: '{{' on line {start + self.first_line} is never closed."))
+        errors.sort(key=lambda error: error.line)
+        return errors
+
+    def parse_block(self, lines, start, end):
+        statements = []
+        i = start
+        while i < end:
+            line = lines[i]
+            if line:
+                if i in self.unmatched:
+                    i += 1
+                    continue  # Already reported up front
+                if not line.endswith('.') and not line.endswith('{') and line != "}":
+                    statements.append(Halt(i + self.first_line, "Syntax Error: Statements must end with a period."))
+                    break
+                tokens = self.line_tokens[i]
+                if line.endswith('.'):
+                    statement = line[:-1].strip()
+                    tokens = tokens[:-1]  # Drop the terminating period
+                else:
+                    statement = line
+                keyword, error = self.interpreter.classify_statement(statement, tokens)
+
+                if keyword is None:
+                    statements.append(SyntaxErrorStatement(i + self.first_line, f"Syntax Error: Unknown statement '{statement}'."))
+                elif error is not None:
+                    statements.append(SyntaxErrorStatement(i + self.first_line, error))
+                    # A rejected block header still owns its body
+                    if line.endswith('{') and i in self.blocks:
+                        i = self.blocks[i][0]
+                elif keyword == self.config["for"]:
+                    i = self.parse_for_loop(tokens, lines, i, end, statements)
+                elif keyword == self.config["if"]:
+                    i = self.parse_if_statement(tokens, lines, i, end, statements)
+                elif keyword == self.config["switch"]:
+                    i = self.parse_switch_statement(tokens, lines, i, end, statements)
+                else:
+                    statements.append(self.parse_simple_statement(tokens, keyword, i + self.first_line))
+            i += 1
+        return statements
+
+    def parse_simple_statement(self, tokens, keyword, line_number):
+        if keyword in self.config["declare"]:
+            return Declaration(line_number, tokens[1], tokens[2], tuple(tokens[4:]))
+        if keyword in self.config["display"]:
+            return Display(line_number, tuple(tokens[1:]))
+        if keyword == self.config["print"]:
+            return Print(line_number, tuple(tokens[1:]))
+        if keyword == self.config["append"]:
+            return Append(line_number, tokens[1], tuple(tokens[2:]))
+        return Assignment(line_number, tokens[0], tuple(tokens[2:]))
+
+    def is_else_line(self, line):
+        words = line.split()
+        return bool(words) and (words[0] == self.config["else"] or
+                                (words[0] == "}" and len(words) > 1 and words[1] == self.config["else"]))
+
+    def parse_for_loop(self, tokens, lines, start, end, statements):
+        if start not in self.blocks:
+            return start  # Unclosed; reported up front
+        close = self.blocks[start][0]
+        if tokens[3] != "range":
+            # for <variable> in <array> {
+            body = self.parse_block(lines, start + 1, close)
+            statements.append(ForLoop(start + self.first_line, tokens[1], None, body, tokens[3]))
+            return close
+        try:
+            range_value = int(tokens[4].strip("()"))
+        except ValueError:
+            statements.append(SyntaxErrorStatement(start + self.first_line, "Syntax Error: Invalid 'for' loop syntax."))
+            return close
+        body = self.parse_block(lines, start + 1, close)
+        statements.append(ForLoop(start + self.first_line, tokens[1], range_value, body))
+        return close
+
+    def parse_if_statement(self, tokens, lines, start, end, statements):
+        if start not in self.blocks:
+            return start
+        close, else_lines, _ = self.blocks[start]
+        split = else_lines[0] if else_lines else close
+        body = self.parse_block(lines, start + 1, split)
+        else_body = self.parse_block(lines, split + 1, close) if else_lines else []
+        statements.append(IfStatement(start + self.first_line, tuple(tokens[1:-1]), body, else_body))
+        return close
+
+    def is_case_line(self, line):
+        return line.startswith(self.config["case"]) or line.startswith(self.config["default"])
+
+    def parse_switch_statement(self, tokens, lines, start, end, statements):
+        if start not in self.blocks:
+            return start
+        close, _, labels = self.blocks[start]
+
+        case_bodies = {}
+        default_body = []
+        for n, label_line in enumerate(labels):
+            body_end = labels[n + 1] if n + 1 < len(labels) else close
+            body = self.parse_block(lines, label_line + 1, body_end)
+            line = lines[label_line]
+            if line.startswith(self.config["case"]):
+                case_bodies[line.split()[1].strip(":")] = body
+            else:
+                default_body = body
+
+        statements.append(SwitchStatement(start + self.first_line, tokens[1], case_bodies, default_body))
+        return close
@@ -0,0 +1,94 @@
+# Batch runner: executes many independent GRAH files across a pool of
+# processes and reports, per file, its status, run time and output.
+#
+#   python grah_cli.py batch scripts/ 'nightly/**/*.GRAH' [--workers N] [--output-dir DIR]
+#
+# Each worker process builds one Interpreter for the dialect when it starts
+# and reuses it for every file it is given, clearing the variables between
+# files, so handlers, the expression cache and the lexer are set up once per
+# process instead of once per file.
+import glob
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+MAX_SLOTS = 1 << 16  # variable names a worker's interpreter may collect before it is rebuilt
+
+# Worker process state, set by start_worker()
+worker_interpreter = None
+worker_options = None
+
+
+class Result:
+    __slots__ = ("path", "status", "seconds", "output", "error")
+
+    def __init__(self, path, status, seconds, output="", error=None):
+        self.path = path
+        self.status = status  # "ok", "failed" (the interpreter raised) or "unreadable"
+        self.seconds = seconds  # time spent parsing and running, without reading the file
+        self.output = output  # everything the program wrote, GRAH error messages included
+        self.error = error  # what went wrong when status is not "ok"
+
+
+def find_programs(patterns):
+    # Directories are searched recursively for .GRAH files; other arguments are
+    # glob patterns ('**' allowed) or plain paths, kept even if they do not exist
+    # so they are reported as unreadable. Each file is listed once.
+    paths = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            for directory, subdirectories, files in os.walk(pattern):
+                subdirectories.sort()
+                paths.extend(os.path.join(directory, name) for name in sorted(files)
+                             if name.lower().endswith(".grah"))
+        elif glob.has_magic(pattern):
+            paths.extend(path for path in sorted(glob.glob(pattern, recursive=True)) if os.path.isfile(path))
+        else:
+            paths.append(pattern)
+    return list(dict.fromkeys(paths))
+
+
+def start_worker(config, backend, optimize, cache):
+    global worker_interpreter, worker_options
+    worker_options = (config, backend, optimize, cache)
+    worker_interpreter = build_interpreter()
+
+
+def build_interpreter():
+    from Interpreter import Interpreter
+    config, backend, optimize, cache = worker_options
+    return Interpreter(config, backend=backend, optimize=optimize, cache=cache)
+
+
+def run_file(path):
+    global worker_interpreter
+    from grah_output import CollectorSink
+
+    try:
+        with open(path, 'r') as file:
+            code = file.read()
+    except (OSError, UnicodeDecodeError) as e:
+        return Result(path, "unreadable", 0.0, error=str(e))
+    if len(worker_interpreter.variables.names) > MAX_SLOTS:
+        worker_interpreter = build_interpreter()
+    interpreter = worker_interpreter
+    sink = CollectorSink()
+    interpreter.output = sink
+    interpreter.reset()
+    started = time.perf_counter()
+    try:
+        interpreter.interpret(code, path)
+    except Exception as e:
+        interpreter.output.flush()
+        return Result(path, "failed", time.perf_counter() - started, sink.getvalue(), f"{type(e).__name__}: {e}")
+    return Result(path, "ok", time.perf_counter() - started, sink.getvalue())
+
+
+def run_batch(paths, config, backend="ast", workers=None, optimize=True, cache=True):
+    # Yields a Result per path, in the order given, as soon as it and every
+    # earlier one are done
+    workers = workers or os.cpu_count() or 1
+    chunk = max(1, min(64, len(paths) // (workers * 8)))  # fewer round trips for thousands of small files
+    with ProcessPoolExecutor(workers, initializer=start_worker,
+                             initargs=(config, backend, optimize, cache)) as executor:
+        yield from executor.map(run_file, paths, chunksize=chunk)
@@ -0,0 +1,282 @@
+# Benchmark suite: generates parameterised GRAH workloads, runs each one under
+# every backend with the optimizer and tiering on and off, and compares ops/sec
+# and peak traced memory with a JSON baseline.
+#
+#   python grah_bench.py                     # run, compare with grah_bench.json if it exists
+#   python grah_bench.py --save              # run and (re)write the baseline
+#   python grah_bench.py --scale 0.1 -w switch_table -b vm -m plain
+#
+# An "op" is one executed GRAH statement, counted from the shape of the
+# generated program, so numbers stay comparable across backends.
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+from Interpreter import Interpreter, DEFAULT_CONFIG
+from grah_output import NullSink
+
+BACKENDS = ("ast", "vm", "python")
+# Interpreter options per mode. With both on, loops with a closed form run in
+# one step, so "plain" is what shows the cost of actually iterating.
+MODES = {
+    "opt+tier": {"optimize": True, "tiering": True},
+    "opt": {"optimize": True, "tiering": False},
+    "tier": {"optimize": False, "tiering": True},
+    "plain": {"optimize": False, "tiering": False},
+}
+TIERED_BACKENDS = ("ast",)  # the others ignore the tiering option
+UNTIERED = {"opt+tier": "opt", "tier": "plain"}
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "grah_bench.json")
+
+
+def nested_loops(depth=3, width=20):
+    names = [f"l{level}" for level in range(depth)]
+    lines = ["grah int total = 0."]
+    for level, name in enumerate(names):
+        lines.append("    " * level + f"for {name} in range {width} {{")
+    lines.append("    " * depth + f"total = total + {names[-1]} * 2 - {names[0]}.")
+    for level in reversed(range(depth)):
+        lines.append("    " * level + "}")
+    lines.append("display- total.")
+    ops = 2 + sum(width ** level for level in range(depth)) + width ** depth
+    return "\n".join(lines), ops
+
+
+def long_expressions(terms=40, statements=20, iterations=200):
+    operators = ("+", "*", "-", "+")
+    parts = ["i"]
+    for term in range(1, terms):
+        parts.append(operators[term % len(operators)])
+        parts.append("i" if term % 3 == 0 else str(term % 7 + 1))
+    expression = " ".join(parts)
+    lines = ["grah int x = 0.", f"for i in range {iterations} {{"]
+    lines += [f"    x = {expression}." for _ in range(statements)]
+    lines += ["}", "display- x."]
+    return "\n".join(lines), 3 + iterations * statements
+
+
+def switch_table(cases=64, iterations=100):
+    lines = ["grah int hits = 0.", f"for r in range {iterations} {{", f"    for k in range {cases} {{", "        switch k {"]
+    for case in range(cases):
+        lines.append(f"            case {case}:")
+        lines.append(f"                hits = hits + {case % 5 + 1}.")
+    lines += ["        }", "    }", "}", "display- hits."]
+    return "\n".join(lines), 3 + iterations + iterations * cases * 2
+
+
+def string_building(iterations=5000):
+    lines = [
+        'grah string s = "".',
+        f"for i in range {iterations} {{",
+        '    s = s + "ab".',
+        "}",
+        "display- s.",
+    ]
+    return "\n".join(lines), 3 + iterations
+
+
+def print_heavy(iterations=20000):
+    lines = [
+        f"for i in range {iterations} {{",
+        "    print i.",
+        '    print " ".',
+        "}",
+        'display- "done".',
+    ]
+    return "\n".join(lines), 2 + iterations * 2
+
+
+def branchy_loop(iterations=20000):
+    # Which branch runs depends on the running total, so no closed form applies
+    lines = [
+        "grah int total = 0.",
+        "grah int wraps = 0.",
+        f"for i in range {iterations} {{",
+        "    if total > 1000 {",
+        "        total = total - 997.",
+        "        wraps = wraps + 1.",
+        "    } else {",
+        "        total = total + i.",
+        "    }",
+        "}",
+        "display- total.",
+        "display- wraps.",
+    ]
+    ops = 5 + iterations * 2
+    total = 0
+    for i in range(iterations):
+        if total > 1000:
+            total -= 997
+            ops += 1
+        else:
+            total += i
+    return "\n".join(lines), ops
+
+
+def long_program(statements=5000):
+    # Straight-line code run once, so lexing and parsing dominate
+    lines = ["grah int x = 0.", 'grah string s = "".']
+    for n in range(statements):
+        lines.append(f"x = x + {n % 7} * 2." if n % 2 else f's = "ab" + "{n}".')
+    lines.append("display- x.")
+    return "\n".join(lines), 3 + statements
+
+
+WORKLOADS = {
+    "nested_loops": (nested_loops, "width"),
+    "long_expressions": (long_expressions, "iterations"),
+    "switch_table": (switch_table, "iterations"),
+    "string_building": (string_building, "iterations"),
+    "print_heavy": (print_heavy, "iterations"),
+    "branchy_loop": (branchy_loop, "iterations"),
+    "long_program": (long_program, "statements"),
+}
+
+
+def generate(name, scale=1.0):
+    # Scales the workload's main size parameter; nested_loops scales per level
+    function, parameter = WORKLOADS[name]
+    default = function.__defaults__[function.__code__.co_varnames.index(parameter)]
+    if name == "nested_loops":
+        size = max(1, round(default * scale ** (1 / 3)))
+    else:
+        size = max(1, round(default * scale))
+    return function(**{parameter: size})
+
+
+def modes_for(backend, modes):
+    # A backend that does not tier runs a tiering mode as the same mode without it
+    if backend in TIERED_BACKENDS:
+        return list(modes)
+    result = []
+    for mode in modes:
+        mode = UNTIERED.get(mode, mode)
+        if mode not in result:
+            result.append(mode)
+    return result
+
+
+def run_once(source, backend, mode="opt+tier"):
+    interpreter = Interpreter(DEFAULT_CONFIG, backend=backend, output=NullSink(), **MODES[mode])
+    start = time.perf_counter()
+    interpreter.interpret(source)
+    return time.perf_counter() - start
+
+
+def measure(source, ops, backend, mode="opt+tier", repeat=3):
+    # Best-of-`repeat` wall time, then one separate traced run for peak memory
+    # (tracemalloc slows execution down, so it never overlaps with timing)
+    best = min(run_once(source, backend, mode) for _ in range(repeat))
+    tracemalloc.start()
+    try:
+        run_once(source, backend, mode)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"seconds": best, "ops_per_sec": ops / best if best > 0 else float("inf"), "peak_bytes": peak}
+
+
+def run_suite(workloads, backends, scale=1.0, repeat=3, log=None, modes=tuple(MODES)):
+    results = {}
+    for name in workloads:
+        source, ops = generate(name, scale)
+        for backend in backends:
+            for mode in modes_for(backend, modes):
+                result = measure(source, ops, backend, mode, repeat)
+                result["ops"] = ops
+                key = f"{name}/{backend}/{mode}"
+                results[key] = result
+                if log is not None:
+                    log(f"{key:<36} {result['ops_per_sec']:>14,.0f} ops/s "
+                        f"{result['peak_bytes'] / 1024:>10,.1f} KiB")
+    return results
+
+
+def compare(results, baseline, threshold):
+    # Returns one message per run that got slower or used more memory than the
+    # baseline allows; runs missing from either side are ignored
+    regressions = []
+    for key, result in results.items():
+        previous = baseline.get(key)
+        if previous is None:
+            continue
+        if result["ops_per_sec"] < previous["ops_per_sec"] * (1 - threshold):
+            regressions.append(f"{key}: {result['ops_per_sec']:,.0f} ops/s, "
+                               f"baseline {previous['ops_per_sec']:,.0f} ops/s")
+        if result["peak_bytes"] > previous["peak_bytes"] * (1 + threshold):
+            regressions.append(f"{key}: peak {result['peak_bytes']:,} bytes, "
+                               f"baseline {previous['peak_bytes']:,} bytes")
+    return regressions
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark the GRAH interpreter backends.")
+    parser.add_argument("-w", "--workload", action="append", choices=sorted(WORKLOADS),
+                        help="run only this workload (repeatable)")
+    parser.add_argument("-b", "--backend", action="append", choices=BACKENDS,
+                        help="run only this backend (repeatable)")
+    parser.add_argument("-m", "--mode", action="append", choices=list(MODES),
+                        help="run only this optimizer/tiering mode (repeatable)")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiply every workload's size")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per workload; the best one counts")
+    parser.add_argument("--baseline", default=BASELINE, help="baseline JSON file")
+    parser.add_argument("--save", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="allowed fractional slowdown or memory growth before failing")
+    parser.add_argument("--dump", help="also write this run's results to a JSON file")
+    parser.add_argument("--show", metavar="WORKLOAD", help="print the generated program and exit")
+    args = parser.parse_args()
+
+    if args.show:
+        print(generate(args.show, args.scale)[0])
+        return 0
+
+    workloads = args.workload or list(WORKLOADS)
+    backends = args.backend or list(BACKENDS)
+    modes = args.mode or list(MODES)
+    results = run_suite(workloads, backends, args.scale, args.repeat, log=print, modes=modes)
+    document = {
+        "python": platform.python_version(),
+        "scale": args.scale,
+        "results": results,
+    }
+    if args.dump:
+        with open(args.dump, 'w') as file:
+            json.dump(document, file, indent=2, sort_keys=True)
+
+    if args.save:
+        if os.path.exists(args.baseline):
+            # Keep entries for workloads and backends that were not part of this run
+            with open(args.baseline) as file:
+                previous = json.load(file)
+            if previous.get("scale") == args.scale:
+                document["results"] = {**previous["results"], **results}
+        with open(args.baseline, 'w') as file:
+            json.dump(document, file, indent=2, sort_keys=True)
+        print(f"Baseline written to {args.baseline}.")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save to create one.")
+        return 0
+    with open(args.baseline) as file:
+        baseline = json.load(file)
+    if baseline.get("scale") != args.scale:
+        print(f"Baseline was recorded at scale {baseline.get('scale')}, not {args.scale}; not comparing.")
+        return 0
+    regressions = compare(results, baseline["results"], args.threshold)
+    for message in regressions:
+        print(f"Regression: {message}")
+    if regressions:
+        return 1
+    print(f"No regressions beyond {args.threshold:.0%} of the baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,74 @@
+# On-disk cache of parsed programs, like __pycache__ for GRAH. A cache file
+# holds the statement tree straight out of the parser, pickled, behind a
+# header naming what it was built from: the source text, the dialect config
+# and the front-end code. Any mismatch means the file is stale and the program
+# is parsed again and the file rewritten.
+import hashlib
+import json
+import os
+import pickle
+import sys
+
+MAGIC = b"GRAHC1\n"  # bump when the pickled node layout changes
+CACHE_DIRECTORY = "__grahcache__"
+
+
+def config_digest(config):
+    return hashlib.sha256(json.dumps(config, sort_keys=True).encode()).hexdigest()
+
+
+class ProgramCache:
+    def __init__(self, config, directory=None, sources=()):
+        # directory: where cache files go; None puts them in __grahcache__ next to
+        # each program. sources: front-end modules whose edits invalidate the cache.
+        self.directory = directory
+        stamps = [f"{sys.version_info[0]}.{sys.version_info[1]}", config_digest(config)]
+        for path in sources:
+            try:
+                status = os.stat(path)
+            except OSError:
+                continue
+            stamps.append(f"{path}:{status.st_mtime_ns}:{status.st_size}")
+        self.fingerprint = hashlib.sha256("\n".join(stamps).encode()).hexdigest().encode()
+
+    def path_for(self, path):
+        path = os.path.abspath(path)
+        stem = os.path.splitext(os.path.basename(path))[0]
+        if self.directory is None:
+            return os.path.join(os.path.dirname(path), CACHE_DIRECTORY, stem + ".grahc")
+        # One flat directory for every program, so the name also encodes where it came from
+        location = hashlib.sha256(path.encode()).hexdigest()[:16]
+        return os.path.join(self.directory, f"{stem}.{location}.grahc")
+
+    def header(self, source):
+        return MAGIC + self.fingerprint + b"\n" + hashlib.sha256(source.encode()).hexdigest().encode() + b"\n"
+
+    def load(self, path, source):
+        # Returns the cached statements for `source`, or None
+        header = self.header(source)
+        try:
+            with open(self.path_for(path), 'rb') as file:
+                if file.read(len(header)) != header:
+                    return None
+                return pickle.load(file)
+        except Exception:
+            # Unreadable, or damaged past the header: unpickling garbage can
+            # raise almost anything (ValueError, KeyError, IndexError, ...)
+            return None
+
+    def store(self, path, source, statements):
+        cache_path = self.path_for(path)
+        temporary = f"{cache_path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            with open(temporary, 'wb') as file:
+                file.write(self.header(source))
+                pickle.dump(statements, file, pickle.HIGHEST_PROTOCOL)
+            os.replace(temporary, cache_path)  # readers never see a half-written file
+        except (OSError, RecursionError):
+            # Read-only location, a tree too deep to pickle and the like: run
+            # without caching, as Python does
+            try:
+                os.remove(temporary)
+            except OSError:
+                pass
@@ -0,0 +1,282 @@
+# Command-line entry point.
+#
+#   python grah_cli.py run script.GRAH [--config dialect.json] [options]
+#   python grah_cli.py run - < script.GRAH
+#   python grah_cli.py ide [--config dialect.json]
+#   python grah_cli.py serve [--socket PATH]       (see grah_server)
+#   python grah_cli.py send script.GRAH [--socket PATH]
+#   python grah_cli.py batch DIR|GLOB... [--workers N] [--output-dir DIR]
+#
+# `run` is headless and never imports a GUI module, so it starts quickly in
+# cron jobs and containers; only `ide` pulls in tkinter. `send` does not even
+# load the interpreter.
+import sys
+
+
+def read_dialect(path):
+    # A dialect file is JSON holding any of DEFAULT_CONFIG's keys; the rest keep their defaults
+    import json
+
+    with open(path, 'r') as file:
+        return json.load(file)
+
+
+def load_config(path):
+    return merge_dialect(read_dialect(path))
+
+
+def merge_dialect(dialect):
+    from Interpreter import DEFAULT_CONFIG
+
+    if not isinstance(dialect, dict):
+        raise ValueError("a dialect file must hold a JSON object")
+    config = dict(DEFAULT_CONFIG)
+    for key, value in dialect.items():
+        if key not in DEFAULT_CONFIG:
+            raise ValueError(f"unknown dialect key '{key}'")
+        if isinstance(DEFAULT_CONFIG[key], list):
+            if isinstance(value, str):
+                value = [value]
+            if not isinstance(value, list) or not value or not all(isinstance(word, str) for word in value):
+                raise ValueError(f"'{key}' must be a keyword or a list of keywords")
+        elif not isinstance(value, str) or not value:
+            raise ValueError(f"'{key}' must be a keyword")
+        config[key] = value
+    return config
+
+
+def build_parser():
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="grah", description="Run GRAH programs.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="run a program without the IDE")
+    run.add_argument("file", nargs="?", default="test/hero.GRAH", help="program to run; '-' reads standard input")
+    run.add_argument("--config", help="JSON file with the dialect's keywords")
+    run.add_argument("--backend", choices=("ast", "vm", "python"), default="ast")
+    run.add_argument("--stream", action="store_true",
+                     help="read and execute the file line by line instead of loading it whole; syntax "
+                          "and brace errors in a block are reported when the block is reached, after "
+                          "the output of the statements before it")
+    run.add_argument("--batch-lines", type=int, default=1,
+                     help="top-level lines to collect before executing them in --stream mode")
+    run.add_argument("--output", help="write program output to this file instead of stdout")
+    run.add_argument("--profile", nargs="?", const="table", choices=("table", "json", "collapsed"),
+                     help="record per-line execution counts and timings and report them")
+    run.add_argument("--profile-output", help="write the profile report to this file instead of stderr")
+    run.add_argument("--no-optimize", action="store_true",
+                     help="skip constant folding and dead-branch elimination")
+    run.add_argument("--optimizer-report", action="store_true",
+                     help="list what the optimizer simplified on stderr")
+    run.add_argument("--no-tiering", action="store_true",
+                     help="never compile hot loops and ifs to closures (ast backend)")
+    run.add_argument("--tier-threshold", type=int, metavar="N",
+                     help="compile a loop after N iterations and an if after N entries (default 64)")
+    run.add_argument("--tier-stats", action="store_true",
+                     help="list the statements compiled to closures on stderr")
+    run.add_argument("--no-cache", action="store_true",
+                     help="always parse the program instead of using the .grahc cache")
+    run.add_argument("--cache-dir", help="keep .grahc files here instead of __grahcache__ next to the program")
+
+    ide = commands.add_parser("ide", help="open the editor")
+    ide.add_argument("--config", help="JSON file with the dialect's keywords")
+
+    batch = commands.add_parser("batch", help="run many programs in parallel and report on each")
+    batch.add_argument("paths", nargs="+", help="files, directories (searched for .GRAH files) or glob patterns")
+    batch.add_argument("--config", help="JSON file with the dialect's keywords")
+    batch.add_argument("--backend", choices=("ast", "vm", "python"), default="ast")
+    batch.add_argument("--workers", type=int, help="processes to run programs in (default: CPU count)")
+    batch.add_argument("--output-dir", help="write each program's output to DIR/<path>.out instead of stdout")
+    batch.add_argument("--report", help="also write the per-file results to this JSON file")
+    batch.add_argument("--no-optimize", action="store_true",
+                       help="skip constant folding and dead-branch elimination")
+    batch.add_argument("--no-cache", action="store_true",
+                       help="always parse programs instead of using the .grahc cache")
+
+    serve = commands.add_parser("serve", help="run programs sent over a Unix socket until stopped")
+    serve.add_argument("--socket", help="socket path; defaults to grah-<uid>.sock in $XDG_RUNTIME_DIR or /tmp")
+    serve.add_argument("--workers", type=int, help="programs run at once, each in its own process (default: CPU count)")
+    serve.add_argument("--timeout", type=float, default=30.0, help="seconds a program may run; 0 for no limit")
+    serve.add_argument("--queue", type=int, default=64, help="requests that may wait for a worker before more are refused")
+
+    send = commands.add_parser("send", help="run a program on a server started with 'serve'")
+    send.add_argument("file", nargs="?", default="-", help="program to run; '-' reads standard input")
+    send.add_argument("--socket", help="socket path the server listens on")
+    send.add_argument("--config", help="JSON file with the dialect's keywords")
+    send.add_argument("--backend", choices=("ast", "vm", "python"), default="ast")
+    send.add_argument("--timeout", type=float, help="seconds the program may run, at most the server's limit")
+    send.add_argument("--no-optimize", action="store_true",
+                      help="skip constant folding and dead-branch elimination")
+    return parser
+
+
+def run(args, config):
+    from Interpreter import Interpreter, DEFAULT_CONFIG
+
+    output = None
+    if args.output:
+        from grah_output import FileSink
+        output = FileSink(args.output)
+    interpreter = Interpreter(config or DEFAULT_CONFIG, backend=args.backend, output=output,
+                              profile=args.profile is not None, optimize=not args.no_optimize,
+                              cache=not args.no_cache, cache_dir=args.cache_dir, tiering=not args.no_tiering)
+    if interpreter.optimizer is not None:
+        interpreter.optimizer.report = args.optimizer_report
+    if interpreter.tiering is not None and args.tier_threshold is not None:
+        interpreter.tiering.loop_threshold = interpreter.tiering.branch_threshold = args.tier_threshold
+    file_name = args.file
+    status = 0
+
+    try:
+        if file_name == "-":
+            if args.stream:
+                interpreter.interpret_stream(sys.stdin, args.batch_lines)
+            else:
+                interpreter.interpret(sys.stdin.read())
+        else:
+            with open(file_name, 'r') as file:
+                if args.stream:
+                    interpreter.interpret_stream(file, args.batch_lines)
+                else:
+                    code = file.read()
+                    interpreter.interpret(code, file_name)
+    except FileNotFoundError:
+        print("File not found.")
+        status = 1
+    finally:
+        if output is not None:
+            output.close()
+
+    if interpreter.optimizer is not None and interpreter.optimizer.notes:
+        sys.stderr.write("\n".join(interpreter.optimizer.notes) + "\n")
+    if args.tier_stats and interpreter.tiering is not None:
+        sys.stderr.write(interpreter.tiering.report() + "\n")
+
+    if interpreter.profiler is not None:
+        report = interpreter.profiler.report(args.profile)
+        if args.profile_output:
+            with open(args.profile_output, 'w') as file:
+                file.write(report + "\n")
+        else:
+            sys.stderr.write(report + "\n")
+    return status
+
+
+def batch(args, config):
+    # Program output goes to stdout (or --output-dir), one line per file and the
+    # totals to stderr. Fails if any program could not be read or crashed.
+    import os
+    import time
+    from grah_batch import find_programs, run_batch
+    from Interpreter import DEFAULT_CONFIG
+
+    paths = find_programs(args.paths)
+    if not paths:
+        print("Error: No programs found.", file=sys.stderr)
+        return 1
+    root = os.path.commonpath([os.path.dirname(os.path.abspath(path)) for path in paths])
+    counts = {"ok": 0, "failed": 0, "unreadable": 0}
+    records = []
+    busy = 0.0
+    started = time.perf_counter()
+    for result in run_batch(paths, config or DEFAULT_CONFIG, args.backend, args.workers,
+                            not args.no_optimize, not args.no_cache):
+        counts[result.status] += 1
+        busy += result.seconds
+        if result.status == "unreadable":
+            pass
+        elif args.output_dir:
+            target = os.path.join(args.output_dir, os.path.relpath(os.path.abspath(result.path), root))
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target + ".out", 'w') as file:
+                file.write(result.output)
+        else:
+            sys.stdout.write(f"==> {result.path} <==\n{result.output}")
+            if result.output and not result.output.endswith("\n"):
+                sys.stdout.write("\n")
+        line = f"{result.seconds:9.3f}s  {result.status:<10}  {result.path}"
+        if result.error:
+            line += f": {result.error}"
+        print(line, file=sys.stderr)
+        records.append({"path": result.path, "status": result.status, "seconds": round(result.seconds, 6),
+                        "error": result.error})
+    elapsed = time.perf_counter() - started
+    summary = ", ".join(f"{count} {status}" for status, count in counts.items() if count)
+    print(f"{len(paths)} programs: {summary} in {elapsed:.2f}s ({busy:.2f}s running programs)", file=sys.stderr)
+    if args.report:
+        import json
+        with open(args.report, 'w') as file:
+            json.dump({"programs": records, "totals": dict(counts, seconds=round(elapsed, 6))}, file, indent=2)
+    return 0 if counts["ok"] == len(paths) else 1
+
+
+def send(args, dialect):
+    # Output goes to stdout as it arrives, diagnostics to stderr
+    from grah_client import Client
+
+    try:
+        if args.file == "-":
+            code = sys.stdin.read()
+        else:
+            with open(args.file, 'r') as file:
+                code = file.read()
+    except FileNotFoundError:
+        print("File not found.")
+        return 1
+    try:
+        client = Client(args.socket)
+    except OSError as e:
+        print(f"Error: Cannot reach the GRAH server: {e}", file=sys.stderr)
+        return 1
+    status = 0
+    try:
+        for kind, payload in client.submit(code, args.backend, dialect, False if args.no_optimize else None,
+                                           args.timeout):
+            if kind == "output":
+                sys.stdout.write(payload)
+                sys.stdout.flush()
+            elif kind != "done":
+                sys.stderr.write(payload + "\n")
+                status = 1
+    except OSError as e:
+        print(f"Error: Lost the GRAH server: {e}", file=sys.stderr)
+        status = 1
+    finally:
+        client.close()
+    return status
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    dialect = config = None
+    if getattr(args, "config", None):  # serve takes its dialects from each request
+        try:
+            dialect = read_dialect(args.config)
+            if args.command != "send":  # the server checks what it is sent
+                config = merge_dialect(dialect)
+        except (OSError, ValueError) as e:
+            print(f"Error: Cannot load dialect '{args.config}': {e}", file=sys.stderr)
+            return 2
+
+    if args.command == "ide":
+        from main import main as ide_main  # tkinter is only imported here
+        ide_main(config)
+        return 0
+    if args.command == "serve":
+        from grah_server import serve
+        try:
+            serve(args.socket, args.workers, args.timeout or None, args.queue)
+        except OSError as e:
+            print(f"Error: Cannot start the GRAH server: {e}", file=sys.stderr)
+            return 1
+        return 0
+    if args.command == "send":
+        return send(args, dialect)
+    if args.command == "batch":
+        return batch(args, config)
+    return run(args, config)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
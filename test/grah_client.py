@@ -0,0 +1,46 @@
+# Client side of the grah_server daemon. Kept free of asyncio and of the
+# interpreter so a submission starts as fast as Python does.
+#
+# The protocol is JSON, one object per line, over a Unix domain socket. A
+# request is
+#   {"code": "...", "backend": "ast", "config": {...}, "optimize": true, "timeout": 5}
+# where everything but "code" may be left out ("config" holds dialect keys
+# over DEFAULT_CONFIG, as in a --config file). The server answers with the
+# messages grah_worker uses, as [kind, payload] lines, "done" last:
+#   ["output", text]  ["error", message]  ["syntax_error", text]  ["done", null]
+# A connection may carry any number of requests, one after another.
+import json
+import os
+import socket
+import tempfile
+
+
+def default_socket_path():
+    directory = os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+    return os.path.join(directory, f"grah-{os.getuid()}.sock")
+
+
+class Client:
+    def __init__(self, path=None):
+        self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.socket.connect(path or default_socket_path())
+        self.reader = self.socket.makefile('r', encoding='utf-8', newline='\n')
+
+    def submit(self, code, backend=None, config=None, optimize=None, timeout=None):
+        # Yields (kind, payload) messages as the server sends them, ending with "done"
+        request = {"code": code}
+        for key, value in (("backend", backend), ("config", config), ("optimize", optimize), ("timeout", timeout)):
+            if value is not None:
+                request[key] = value
+        self.socket.sendall(json.dumps(request).encode('utf-8') + b"\n")
+        for line in self.reader:
+            kind, payload = json.loads(line)
+            yield kind, payload
+            if kind == "done":
+                return
+        yield "error", "Error: Connection closed by the server."
+        yield "done", None
+
+    def close(self):
+        self.reader.close()
+        self.socket.close()
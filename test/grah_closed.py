@@ -0,0 +1,178 @@
+# Closed forms for 'for' loops that only do integer arithmetic. A body made of
+# int declarations and assignments using + - * is run once symbolically, which
+# gives every variable it writes as a polynomial in the loop variable and in
+# the values variables held when the iteration started. A variable whose new
+# value is its old one plus a polynomial free of written variables sums to
+#     start + p(0) + p(1) + ... + p(count - 1)
+# and one whose new value is free of written variables ends as p(count - 1),
+# so the loop's whole effect takes a few multiplications per term, whatever
+# its count. The optimizer attaches a ClosedForm to such loops; each time the
+# loop starts, the backend asks it to run, and it declines (so the loop runs
+# as usual) unless every variable read before being written holds an int.
+# With ints going in, nothing in the body can fail or print, and Python ints
+# do not overflow, so the result is exact.
+from math import comb
+
+from grah_ast import Declaration, Assignment
+from grah_expr import CONST, VAR, OP
+
+MAX_TERMS = 64  # monomials in one polynomial
+MAX_DEGREE = 16
+
+
+def power_sums(count, degree):
+    # sums[k] = 0**k + 1**k + ... + (count - 1)**k, from
+    # count**(k + 1) = sum of comb(k + 1, j) * sums[j] for j <= k
+    sums = []
+    for k in range(degree + 1):
+        total = count ** (k + 1) - sum(comb(k + 1, j) * sums[j] for j in range(k))
+        sums.append(total // (k + 1))
+    return sums
+
+
+# Polynomials are dicts from monomials, sorted tuples of variable names with
+# repeats for powers, to nonzero int coefficients
+
+def add(left, right, sign):
+    result = dict(left)
+    for monomial, coefficient in right.items():
+        value = result.get(monomial, 0) + sign * coefficient
+        if value:
+            result[monomial] = value
+        else:
+            del result[monomial]
+    return result
+
+
+def multiply(left, right):
+    result = {}
+    for first, a in left.items():
+        for second, b in right.items():
+            monomial = tuple(sorted(first + second))
+            value = result.get(monomial, 0) + a * b
+            if value:
+                result[monomial] = value
+            else:
+                del result[monomial]
+    return result
+
+
+def polynomial(program, values, reads):
+    # The program's value over `values` (name -> polynomial written earlier in
+    # the iteration), or None if it is not integer + - * arithmetic. Names read
+    # from before the iteration go into `reads`.
+    stack = []
+    for kind, arg in program:
+        if kind == CONST:
+            if type(arg) is not int:
+                return None
+            stack.append({(): arg} if arg else {})
+        elif kind == VAR:
+            value = values.get(arg)
+            if value is None:
+                reads.add(arg)
+                value = {(arg,): 1}
+            stack.append(value)
+        elif kind == OP and arg[0] in ('+', '-', '*'):
+            right = stack.pop()
+            left = stack.pop()
+            if arg[0] == '*':
+                value = multiply(left, right)
+            else:
+                value = add(left, right, 1 if arg[0] == '+' else -1)
+            if len(value) > MAX_TERMS or any(len(monomial) > MAX_DEGREE for monomial in value):
+                return None
+            stack.append(value)
+        else:
+            return None
+    return stack[0]
+
+
+class ClosedForm:
+    def __init__(self, var, count, inputs, targets):
+        self.var = var
+        self.last = count - 1  # the loop variable's value afterwards
+        self.inputs = inputs  # names that must hold ints as the loop starts
+        self.targets = targets  # (name, input index of its start value or None, ((weight, input indexes), ...))
+        self.slots = None  # the inputs' slots, filled in by resolve()
+        self.target_slots = None
+        self.var_slot = None
+
+    def resolve(self, slot):
+        self.slots = tuple(slot(name) for name in self.inputs)
+        self.target_slots = tuple(slot(name) for name, start, terms in self.targets)
+        self.var_slot = slot(self.var)
+
+    def compute(self, inputs):
+        # The targets' final values from the inputs' values, or None unless all are ints
+        for value in inputs:
+            if type(value) is not int:
+                return None
+        results = []
+        for name, start, terms in self.targets:
+            total = 0 if start is None else inputs[start]
+            for weight, factors in terms:
+                for index in factors:
+                    weight *= inputs[index]
+                total += weight
+            results.append(total)
+        return results
+
+    def run(self, values):
+        # Applies the loop to the slot list; False leaves it to run as usual
+        results = self.compute([values[slot] for slot in self.slots])
+        if results is None:
+            return False
+        for slot, value in zip(self.target_slots, results):
+            values[slot] = value
+        values[self.var_slot] = self.last
+        return True
+
+
+def closed_form(loop, int_type, compile_expression):
+    # A ClosedForm for the loop, or None when its body is anything else
+    if loop.count is None or loop.count < 1 or not loop.body:
+        return None
+    values = {}  # name -> value written earlier in the iteration
+    reads = set()
+    checked = []  # assigned before any declaration in the body: must be declared already
+    for node in loop.body:
+        kind = node.__class__
+        if kind is Assignment:
+            if node.name not in values:
+                checked.append(node.name)
+        elif kind is not Declaration or node.var_type != int_type:
+            return None
+        if node.name == loop.var:
+            return None
+        value = polynomial(compile_expression(node.expr), values, reads)
+        if value is None:
+            return None
+        values[node.name] = value
+    reads.discard(loop.var)
+
+    written = set(values)
+    inputs = sorted(reads | set(checked))
+    index = {name: position for position, name in enumerate(inputs)}
+    degree = max((monomial.count(loop.var) for value in values.values() for monomial in value), default=0)
+    sums = power_sums(loop.count, degree)
+    targets = []
+    for name, value in values.items():
+        own = (name,)
+        start = None
+        if name in reads and value.get(own) == 1:
+            value = add(value, {own: 1}, -1)
+            start = index[name]
+        if any(symbol in written for monomial in value for symbol in monomial):
+            return None  # depends on what the iteration before left behind
+        terms = []
+        for monomial, coefficient in value.items():
+            power = monomial.count(loop.var)
+            if start is None:
+                weight = coefficient * (loop.count - 1) ** power
+            else:
+                weight = coefficient * sums[power]
+            factors = tuple(index[symbol] for symbol in monomial if symbol != loop.var)
+            terms.append((weight, factors))
+        targets.append((name, start, tuple(terms)))
+    return ClosedForm(loop.var, loop.count, tuple(inputs), tuple(targets))
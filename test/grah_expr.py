@@ -0,0 +1,170 @@
+# Expression compiler shared by every backend: turns an expression's tokens into
+# a reverse-Polish program once, with operators resolved to plain functions.
+import operator
+
+from grah_array import Array, index, length, copy
+from grah_lexer import is_name
+
+CONST = 0
+VAR = 1
+OP = 2
+FAIL = 3
+MEMO = 4
+UNARY = 5
+
+PRECEDENCE = {'+': 1, '-': 1, '*': 2, '/': 2, '>': 0, '<': 0, '>=': 0, '<=': 0, '==': 0, '!=': 0}
+OPERATORS = {
+    '+': operator.add, '-': operator.sub, '*': operator.mul, '/': operator.truediv,
+    '>': operator.gt, '<': operator.lt, '>=': operator.ge, '<=': operator.le,
+    '==': operator.eq, '!=': operator.ne,
+}
+COMPARISONS = ('>', '<', '>=', '<=', '==', '!=')
+UNARY_PRECEDENCE = 3  # prefix operators bind tighter than any binary one; '[ ]' tighter still
+
+
+def precedence(symbol):
+    return UNARY_PRECEDENCE if symbol.__class__ is tuple else PRECEDENCE[symbol]
+
+
+class Memo:
+    # A subexpression whose value several evaluations share (see grah_optimize).
+    # A MEMO item stands for it in a program: the first evaluation to reach it
+    # computes and keeps the value, later ones reuse it until the loop that
+    # owns it clears it. `source` is the subexpression's program over names,
+    # `program` the one grah_slots resolved. Nothing an operator returns is
+    # None, so None marks a value not computed yet.
+    __slots__ = ("source", "program", "names", "value")
+
+    def __init__(self, source, names):
+        self.source = source
+        self.program = None
+        self.names = names  # variables the value depends on
+        self.value = None
+
+
+def unary_operators(config):
+    # The dialect's prefix keywords, for compile_expression
+    return {config["length"]: ("length", length)}
+
+
+def stored(program):
+    # The program an assignment runs: when its value may be another variable's
+    # array (or a shared one), it ends in a copy, so assignments keep value
+    # semantics while 'append' changes arrays in place
+    if program and program[-1][0] in (VAR, CONST, MEMO):
+        return program + ((UNARY, ("copy", copy)),)
+    return program
+
+
+def is_string(token):
+    # The lexer only makes tokens that start and end with '"' of string literals
+    return len(token) > 1 and token[0] == '"' and token[-1] == '"'
+
+
+def starts_operand(token):
+    return token.isdecimal() or is_string(token) or token == '[' or is_name(token)
+
+
+def compile_expression(tokens, unary=None):
+    # Takes tokens from grah_lexer and returns a tuple of (kind, arg) items
+    # in evaluation order. OP and UNARY items carry (symbol, function); `unary`
+    # maps the dialect's prefix keywords to theirs. A malformed expression ends
+    # in a FAIL item holding the message, placed after the loads that would
+    # have run before the error.
+    program = []
+    operators = []  # binary symbols, '[' for an open index, (symbol, function) for prefix operators
+    depth = 0
+    operand = True  # whether an operand may come next, which tells a literal '[' from an index
+
+    def apply_operator():
+        nonlocal depth
+        symbol = operators.pop()
+        if symbol.__class__ is tuple:
+            if depth < 1:
+                depth = -1
+                return False
+            program.append((UNARY, symbol))
+            return True
+        if depth < 2:
+            depth = -1
+            return False
+        program.append((OP, (symbol, index if symbol == '[]' else OPERATORS[symbol])))
+        depth -= 1
+        return True
+
+    position = 0
+    while position < len(tokens):
+        token = tokens[position]
+        position += 1
+        if (unary and operand and token in unary and position < len(tokens)
+                and starts_operand(tokens[position])):
+            # A prefix keyword only when an operand follows, so it still works as a name
+            operators.append(unary[token])
+            continue
+        if token.isdecimal():
+            program.append((CONST, int(token)))
+            depth += 1
+        elif is_name(token):
+            program.append((VAR, token))
+            depth += 1
+        elif token in PRECEDENCE:
+            while operators and operators[-1] != '[' and precedence(operators[-1]) >= PRECEDENCE[token]:
+                if not apply_operator():
+                    program.append((FAIL, "Error: Invalid expression."))
+                    return tuple(program)
+            operators.append(token)
+            operand = True
+            continue
+        elif is_string(token):
+            program.append((CONST, token.strip('"')))
+            depth += 1
+        elif token == '[' and operand:
+            # An array literal: integer constants between commas
+            elements = []
+            while position < len(tokens) and tokens[position].isdecimal():
+                elements.append(int(tokens[position]))
+                position += 1
+                if position < len(tokens) and tokens[position] == ',':
+                    position += 1
+                elif position < len(tokens) and tokens[position] == ']':
+                    break
+                else:
+                    position = len(tokens)
+            if position >= len(tokens) or tokens[position] != ']':
+                program.append((FAIL, "Syntax Error: Array literals are integers between commas in '[' ']'."))
+                return tuple(program)
+            position += 1
+            try:
+                program.append((CONST, Array(elements)))
+            except OverflowError:
+                program.append((FAIL, "Error: Array element out of the 64-bit integer range."))
+                return tuple(program)
+            depth += 1
+        elif token == '[':
+            operators.append('[')
+            operand = True
+            continue
+        elif token == ']':
+            while operators and operators[-1] != '[':
+                if not apply_operator():
+                    program.append((FAIL, "Error: Invalid expression."))
+                    return tuple(program)
+            if not operators:
+                program.append((FAIL, "Error: Invalid expression."))
+                return tuple(program)
+            operators[-1] = '[]'
+            if not apply_operator():
+                program.append((FAIL, "Error: Invalid expression."))
+                return tuple(program)
+        else:
+            program.append((FAIL, f"Syntax Error: Unrecognized token '{token}'."))
+            return tuple(program)
+        operand = False
+
+    while operators:
+        if operators[-1] == '[' or not apply_operator():
+            depth = -1
+            break
+    if depth != 1:
+        program.append((FAIL, "Error: Invalid expression."))
+    return tuple(program)
@@ -0,0 +1,87 @@
+# Master lexer: regexes built once from the dialect config. Tokens are plain
+# strings; a token's kind can be told from its text (see is_name and
+# grah_expr), so lines() only has to find the words. scan() also gives each
+# token's kind and 1-based line/column, for the editor's highlighter.
+import re
+
+KEYWORD = "KEYWORD"
+IDENT = "IDENT"
+INT = "INT"
+STRING = "STRING"
+OP = "OP"
+LBRACE = "LBRACE"
+RBRACE = "RBRACE"
+LBRACKET = "LBRACKET"
+RBRACKET = "RBRACKET"
+COMMA = "COMMA"
+PERIOD = "PERIOD"
+OTHER = "OTHER"
+
+IDENTIFIER = re.compile(r'^[a-zA-Z_]\w*$')
+
+# A word ends at whitespace, at a bracket or comma, or at a statement-ending
+# period right before the end of the line
+END = r'(?=\.?[ \t\r\f\v]*(?:\n|\Z)|[ \t\r\f\v\n\[\],])'
+
+
+def is_name(token):
+    # Identifier-shaped keywords can still be used as variable names
+    return IDENTIFIER.match(token) is not None
+
+
+class Lexer:
+    def __init__(self, config):
+        keywords = set(config.get("declare", [])) | set(config.get("display", []))
+        for key in ("for", "print", "if", "else", "switch", "case", "default", "append", "length"):
+            if key in config:
+                keywords.add(config[key])
+        self.keywords = keywords
+        alternatives = "|".join(re.escape(keyword) for keyword in sorted(keywords, key=len, reverse=True))
+        self.pattern = re.compile("|".join([
+            r'(?P<NEWLINE>\n)',
+            r'(?P<SKIP>[ \t\r\f\v]+)',
+            r'(?P<STRING>"[^"\n]*")',
+            r'(?P<PERIOD>\.(?=[ \t\r\f\v]*(?:\n|\Z)))',
+            rf'(?P<KEYWORD>(?:{alternatives}){END})' if keywords else r'(?P<KEYWORD>(?!))',
+            rf'(?P<INT>\d+{END})',
+            rf'(?P<IDENT>[a-zA-Z_]\w*{END})',
+            rf'(?P<OP>(?:>=|<=|==|!=|[-+*/<>=]){END})',
+            rf'(?P<LBRACE>\{{{END})',
+            rf'(?P<RBRACE>\}}{END})',
+            r'(?P<LBRACKET>\[)',
+            r'(?P<RBRACKET>\])',
+            r'(?P<COMMA>,)',
+            rf'(?P<OTHER>\S+?{END})',
+        ]))
+        # The same words without their kinds, matched one line at a time
+        self.words = re.compile("|".join([
+            r'"[^"\n]*"',
+            r'\.(?=[ \t\r\f\v]*\Z)',
+            rf'(?:{alternatives}){END}' if keywords else r'(?!)',
+            r'[\[\],]',
+            rf'\S+?{END}',
+        ]))
+
+    def lines(self, source):
+        # Yields (stripped line text, tokens) for every line
+        words = self.words.findall
+        for text in source.split("\n"):
+            yield text.strip(), words(text)
+
+    def scan(self, source, first_line=1):
+        # Yields (kind, text, line, column) for every token
+        line = first_line
+        line_start = 0
+        for match in self.pattern.finditer(source):
+            kind = match.lastgroup
+            if kind == "NEWLINE":
+                line += 1
+                line_start = match.end()
+            elif kind != "SKIP":
+                yield kind, match.group(), line, match.start() - line_start + 1
+
+    def tokenize(self, text):
+        tokens = []
+        for _, line_tokens in self.lines(text):
+            tokens.extend(line_tokens)
+        return tokens
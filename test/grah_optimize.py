@@ -0,0 +1,478 @@
+# Optimizer pass that runs between parsing and execution, for every backend.
+# It first removes 'if' branches behind constant conditions and 'for' loops
+# over range 0, so nothing in code that can never run is folded or counted as
+# an assignment. It then folds constant sub-expressions in the shared RPN
+# programs and removes 'switch' cases whose label the switched value can never
+# take. Anything whose evaluation could report an error at runtime (division
+# by zero, undefined names, bad operands) is left alone.
+#
+# Inside 'for' loops it then shares subexpressions between evaluations. One
+# that reads no variable the loop body writes (under any 'if' or 'switch'
+# branch, nested loops included) is computed once per entry into the loop; one
+# repeated in the body is computed once per iteration, for as long as no
+# statement in between writes what it reads. Both become grah_expr.Memo items
+# that compute their value where the first evaluation reaches them, so errors
+# come out exactly where and when they did, and a failed computation is simply
+# tried again next time.
+import re
+
+from grah_ast import (Declaration, Display, Print, Assignment, Append, ForLoop, IfStatement,
+                      SwitchStatement)
+from grah_array import Array
+from grah_expr import compile_expression, unary_operators, CONST, VAR, OP, MEMO, UNARY, Memo
+from grah_closed import closed_form
+
+INTEGER_LABEL = re.compile(r'^-?(0|[1-9]\d*)$')
+MAX_DEPTH = 50  # deepest operator nesting looked into for shared subexpressions
+NO_NAMES = frozenset()
+MAX_FOLDED_STRING = 4096  # longest string a constant '*' is folded into; longer ones are built when run
+NOT_CONSTANT = object()  # no constant value can be this, unlike FAIL, which equals 3
+
+
+def repeats_too_much(symbol, left, right):
+    # "a" * 1000000000 is a valid program, but not one to build while optimizing
+    if symbol != '*':
+        return False
+    if isinstance(left, str) and isinstance(right, int):
+        return len(left) * right > MAX_FOLDED_STRING
+    if isinstance(right, str) and isinstance(left, int):
+        return len(right) * left > MAX_FOLDED_STRING
+    return False
+
+
+def fold(program):
+    # Collapses every operator whose operands are both constants. `segments`
+    # mirrors the evaluation stack: (start of the operand in `folded`, True if
+    # it is a single constant).
+    folded = []
+    segments = []
+    for item in program:
+        kind, arg = item
+        if kind == CONST or kind == VAR:
+            segments.append((len(folded), kind == CONST))
+            folded.append(item)
+        elif kind == OP:
+            right_start, right_constant = segments.pop()
+            left_start, left_constant = segments.pop()
+            left, right = folded[left_start][1], folded[right_start][1]
+            if left_constant and right_constant and not repeats_too_much(arg[0], left, right):
+                try:
+                    value = arg[1](left, right)
+                except Exception:
+                    value = NOT_CONSTANT  # e.g. division by zero: keep it for the runtime to report
+                if value is not NOT_CONSTANT:
+                    del folded[left_start:]
+                    folded.append((CONST, value))
+                    segments.append((left_start, True))
+                    continue
+            folded.append(item)
+            segments.append((left_start, False))
+        elif kind == UNARY:
+            start, constant = segments.pop()
+            if constant:
+                try:
+                    value = arg[1](folded[start][1])
+                except Exception:
+                    value = NOT_CONSTANT
+                if value is not NOT_CONSTANT:
+                    del folded[start:]
+                    folded.append((CONST, value))
+                    segments.append((start, True))
+                    continue
+            folded.append(item)
+            segments.append((start, False))
+        else:
+            folded.append(item)
+            break
+    return tuple(folded)
+
+
+class Term:
+    # Node of an expression tree rebuilt from a program. `key` is equal for
+    # terms that compute the same thing, `names` holds the variables it reads.
+    __slots__ = ("item", "left", "right", "key", "names")
+
+    def __init__(self, item, left, right, key, names):
+        self.item = item
+        self.left = left  # operands of an OP item (only `left` for UNARY), None for a leaf
+        self.right = right
+        self.key = key
+        self.names = names
+
+
+def build_tree(program):
+    # Returns the root Term, or None for a program that ends in FAIL or nests
+    # deeper than MAX_DEPTH
+    stack = []
+    depths = []
+    for item in program:
+        kind, arg = item
+        if kind == OP:
+            right = stack.pop()
+            left = stack.pop()
+            stack.append(Term(item, left, right, (arg[0], left.key, right.key), left.names | right.names))
+            depths.append(max(depths.pop(), depths.pop()) + 1)
+            if depths[-1] > MAX_DEPTH:
+                return None
+        elif kind == UNARY:
+            operand = stack[-1]
+            stack[-1] = Term(item, operand, None, (arg[0], operand.key), operand.names)
+            depths[-1] += 1
+            if depths[-1] > MAX_DEPTH:
+                return None
+        elif kind == CONST:
+            value = tuple(arg) if type(arg) is Array else arg  # arrays do not hash
+            stack.append(Term(item, None, None, (CONST, type(arg), value), NO_NAMES))  # True is not 1 here
+            depths.append(0)
+        elif kind == VAR:
+            stack.append(Term(item, None, None, (VAR, arg), frozenset((arg,))))
+            depths.append(0)
+        else:
+            return None
+    return stack[0]
+
+
+def flatten(term, program):
+    if term.left is not None:
+        flatten(term.left, program)
+    if term.right is not None:
+        flatten(term.right, program)
+    program.append(term.item)
+    return program
+
+
+def constant_value(program):
+    # The value of a program that is a single constant, else NOT_CONSTANT
+    if len(program) == 1 and program[0][0] == CONST:
+        return program[0][1]
+    return NOT_CONSTANT
+
+
+class Optimizer:
+    def __init__(self, config, compile_expression, variables):
+        self.int_type = config["int"]
+        self.compile_expression = compile_expression  # tokens -> folded program
+        self.unary = unary_operators(config)
+        self.variables = variables
+        self.closed_forms = True  # off while profiling, which has to see every iteration
+        self.report = False  # collect notes about what was simplified
+        self.notes = []
+
+    def optimize(self, statements):
+        # Returns a new top-level list; the nodes inside are updated in place
+        statements = self.prune(statements)
+        self.assigned = set()
+        self.declared = {}  # name -> set of declared types
+        self.collect(statements)
+        self.loops = {}  # loop variable -> enclosing ForLoop
+        optimized = self.optimize_block(statements)
+        self.trees = {}  # statement in a loop -> Term of its expression
+        self.memos = []  # (Memo, Term it computes)
+        self.hoist(optimized)
+        for node, term in self.trees.items():
+            node.optimized = tuple(flatten(term, []))
+        for memo, term in self.memos:
+            memo.source = tuple(flatten(term, []))
+        return optimized
+
+    def note(self, node, message):
+        if self.report:
+            self.notes.append(f"line {node.line}: {message}")
+
+    def prune(self, statements):
+        # Only the conditions of reachable ifs are compiled (and so folded) here
+        pruned = []
+        for node in statements:
+            kind = node.__class__
+            if kind is ForLoop:
+                if node.count == 0:
+                    self.note(node, "removed 'for' loop over range 0")
+                    continue
+                node.body = self.prune(node.body)
+            elif kind is IfStatement:
+                node.optimized = self.expression(node, node.condition)
+                value = constant_value(node.optimized)
+                if value is not NOT_CONSTANT:
+                    if value:
+                        self.note(node, "condition is always true; removed the 'else' branch")
+                        pruned.extend(self.prune(node.body))
+                    else:
+                        self.note(node, "condition is always false; removed the 'if' branch")
+                        pruned.extend(self.prune(node.else_body))
+                    continue
+                node.body = self.prune(node.body)
+                node.else_body = self.prune(node.else_body)
+            elif kind is SwitchStatement:
+                for label, body in node.cases.items():
+                    node.cases[label] = self.prune(body)
+                node.default = self.prune(node.default)
+            pruned.append(node)
+        return pruned
+
+    def collect(self, statements):
+        for node in statements:
+            kind = node.__class__
+            if kind is Declaration:
+                self.declared.setdefault(node.name, set()).add(node.var_type)
+            elif kind is Assignment or kind is Append:
+                self.assigned.add(node.name)
+            elif kind is ForLoop:
+                self.declared.setdefault(node.var, set()).add(self.int_type)
+                self.collect(node.body)
+            elif kind is IfStatement:
+                self.collect(node.body)
+                self.collect(node.else_body)
+            elif kind is SwitchStatement:
+                for body in node.cases.values():
+                    self.collect(body)
+                self.collect(node.default)
+
+    def optimize_block(self, statements):
+        optimized = []
+        for node in statements:
+            kind = node.__class__
+            if kind is Declaration or kind is Display or kind is Print or kind is Assignment or kind is Append:
+                node.optimized = self.expression(node, node.expr)
+                optimized.append(node)
+            elif kind is ForLoop:
+                outer = self.loops.get(node.var)
+                self.loops[node.var] = node
+                node.body = self.optimize_block(node.body)
+                if outer is None:
+                    del self.loops[node.var]
+                else:
+                    self.loops[node.var] = outer
+                if self.closed_forms:
+                    node.closed = closed_form(node, self.int_type, self.compile_expression)
+                if node.closed is not None:
+                    self.note(node, "loop has a closed form; it runs in one step while its inputs are ints")
+                optimized.append(node)
+            elif kind is IfStatement:
+                # prune() has compiled the condition and removed constant ones
+                node.body = self.optimize_block(node.body)
+                node.else_body = self.optimize_block(node.else_body)
+                optimized.append(node)
+            elif kind is SwitchStatement:
+                if self.optimize_switch(node):
+                    optimized.append(node)
+            else:
+                optimized.append(node)
+        return optimized
+
+    def expression(self, node, tokens):
+        program = self.compile_expression(tokens)
+        if self.report:
+            original = compile_expression(tuple(tokens), self.unary)
+            if len(program) < len(original):
+                value = constant_value(program)
+                text = " ".join(tokens)
+                if value is NOT_CONSTANT:
+                    self.note(node, f"folded constant parts of '{text}'")
+                else:
+                    self.note(node, f"folded '{text}' to {value!r}")
+        return program
+
+    def optimize_switch(self, node):
+        # Returns False when the whole statement can go
+        labels = self.possible_labels(node.var)
+        if labels is not None:
+            dropped = [label for label in node.cases if not labels(label)]
+            for label in dropped:
+                del node.cases[label]
+            if dropped:
+                self.note(node, f"removed unreachable 'switch' cases {', '.join(dropped)}")
+        for label, body in node.cases.items():
+            node.cases[label] = self.optimize_block(body)
+        node.default = self.optimize_block(node.default)
+        if not node.cases and not node.default and node.var in self.loops and not self.rebinds(self.loops[node.var].body, node.var):
+            # Nothing to run and the loop variable is always defined, so no error either
+            self.note(node, "removed 'switch' with no reachable cases")
+            return False
+        return True
+
+    def possible_labels(self, name):
+        # Returns a predicate telling whether str(value) can equal a label, or
+        # None when nothing is known about the variable's values
+        if name in self.assigned:
+            return None
+        loop = self.loops.get(name)
+        if loop is not None and not self.rebinds(loop.body, name):
+            if loop.source is not None:
+                return lambda label: INTEGER_LABEL.match(label) is not None  # array elements
+            count = loop.count
+            return lambda label: INTEGER_LABEL.match(label) is not None and 0 <= int(label) < count
+        types = self.declared.get(name)
+        if not types or types != {self.int_type}:
+            return None
+        if name in self.variables and type(self.variables[name]) is not int:
+            return None
+        return lambda label: INTEGER_LABEL.match(label) is not None
+
+    def rebinds(self, statements, name):
+        for node in statements:
+            kind = node.__class__
+            if (kind is Declaration or kind is Assignment or kind is Append) and node.name == name:
+                return True
+            if kind is ForLoop and (node.var == name or self.rebinds(node.body, name)):
+                return True
+            if kind is IfStatement and (self.rebinds(node.body, name) or self.rebinds(node.else_body, name)):
+                return True
+            if kind is SwitchStatement and (any(self.rebinds(body, name) for body in node.cases.values())
+                                            or self.rebinds(node.default, name)):
+                return True
+        return False
+
+    def written(self, statements, names=None):
+        # Every variable a statement in `statements` may assign or declare
+        names = set() if names is None else names
+        for node in statements:
+            kind = node.__class__
+            if kind is Declaration or kind is Assignment or kind is Append:
+                names.add(node.name)
+            elif kind is ForLoop:
+                names.add(node.var)
+                self.written(node.body, names)
+            elif kind is IfStatement:
+                self.written(node.body, names)
+                self.written(node.else_body, names)
+            elif kind is SwitchStatement:
+                for body in node.cases.values():
+                    self.written(body, names)
+                self.written(node.default, names)
+        return names
+
+    # Shared subexpressions
+
+    def hoist(self, statements):
+        for node in statements:
+            kind = node.__class__
+            if kind is ForLoop:
+                self.hoist_loop(node)
+            elif kind is IfStatement:
+                self.hoist(node.body)
+                self.hoist(node.else_body)
+            elif kind is SwitchStatement:
+                for body in node.cases.values():
+                    self.hoist(body)
+                self.hoist(node.default)
+
+    def hoist_loop(self, loop):
+        # Outer loops go first, so a nested loop sees what they hoisted as a
+        # single operand it can hoist further
+        written = self.written(loop.body, {loop.var})
+        invariants = {}
+        self.hoist_block(loop.body, written, invariants)
+        loop.invariants = tuple(invariants.values())
+        common = []
+        self.share_block(loop.body, {}, common)
+        loop.common = tuple(common)
+        if loop.invariants:
+            count = len(loop.invariants)
+            self.note(loop, f"computes {count} loop-invariant subexpression{'s' * (count > 1)} once per loop")
+        if loop.common:
+            count = len(loop.common)
+            self.note(loop, f"computes {count} repeated subexpression{'s' * (count > 1)} once per iteration")
+        self.hoist(loop.body)
+
+    def tree(self, node):
+        term = self.trees.get(node)
+        if term is None and node.optimized is not None:
+            term = build_tree(node.optimized)
+            if term is not None:
+                self.trees[node] = term
+        return term
+
+    def memo(self, term):
+        # Turns `term` into a MEMO item computing what it computed
+        memo = Memo(None, term.names)
+        self.memos.append((memo, Term(term.item, term.left, term.right, term.key, term.names)))
+        term.item = (MEMO, memo)
+        term.left = term.right = None
+        return memo
+
+    def hoist_block(self, statements, written, invariants):
+        for node in statements:
+            kind = node.__class__
+            if kind is ForLoop:
+                self.hoist_block(node.body, written, invariants)
+                continue
+            if kind is IfStatement:
+                self.hoist_block(node.body, written, invariants)
+                self.hoist_block(node.else_body, written, invariants)
+            elif kind is SwitchStatement:
+                for body in node.cases.values():
+                    self.hoist_block(body, written, invariants)
+                self.hoist_block(node.default, written, invariants)
+                continue
+            elif (kind is not Declaration and kind is not Display and kind is not Print and kind is not Assignment
+                  and kind is not Append):
+                continue
+            term = self.tree(node)
+            if term is not None:
+                self.hoist_term(term, written, invariants)
+
+    def hoist_term(self, term, written, invariants):
+        # Largest operator subexpressions reading variables, none of them written
+        if term.left is None:
+            return
+        if term.names and term.names.isdisjoint(written):
+            memo = invariants.get(term.key)
+            if memo is None:
+                invariants[term.key] = self.memo(term)
+            else:
+                term.item = (MEMO, memo)
+                term.left = term.right = None
+            return
+        self.hoist_term(term.left, written, invariants)
+        if term.right is not None:
+            self.hoist_term(term.right, written, invariants)
+
+    def share_block(self, statements, available, common):
+        # `available`: key -> [Memo or None, first Term with that key] for the
+        # subexpressions already evaluated in this iteration whose variables
+        # were not written since. Branches start from a copy; a nested loop is
+        # a region of its own.
+        for node in statements:
+            kind = node.__class__
+            if kind is ForLoop:
+                self.kill(available, self.written(node.body, {node.var}))
+                continue
+            if (kind is Declaration or kind is Display or kind is Print or kind is Assignment or kind is Append
+                    or kind is IfStatement):
+                term = self.tree(node)
+                if term is not None:
+                    self.share_term(term, available, common)
+            if kind is Declaration or kind is Assignment or kind is Append:
+                self.kill(available, {node.name})
+            elif kind is IfStatement:
+                self.share_block(node.body, dict(available), common)
+                self.share_block(node.else_body, dict(available), common)
+                self.kill(available, self.written(node.body, self.written(node.else_body)))
+            elif kind is SwitchStatement:
+                bodies = list(node.cases.values()) + [node.default]
+                for body in bodies:
+                    self.share_block(body, dict(available), common)
+                written = set()
+                for body in bodies:
+                    self.written(body, written)
+                self.kill(available, written)
+
+    def share_term(self, term, available, common):
+        if term.left is None or not term.names:
+            return
+        entry = available.get(term.key)
+        if entry is not None:
+            if entry[0] is None:
+                entry[0] = self.memo(entry[1])
+                common.append(entry[0])
+            term.item = (MEMO, entry[0])
+            term.left = term.right = None
+            return
+        self.share_term(term.left, available, common)
+        if term.right is not None:
+            self.share_term(term.right, available, common)
+        available[term.key] = [None, term]
+
+    def kill(self, available, written):
+        for key in [key for key, entry in available.items() if not entry[1].names.isdisjoint(written)]:
+            del available[key]
@@ -0,0 +1,90 @@
+# Output sinks for the interpreter. Everything a GRAH program shows, including
+# error messages, goes through sink.write(text); the interpreter calls flush()
+# when a run finishes.
+import sys
+
+
+class BufferedSink:
+    def __init__(self, stream=None, flush_threshold=8192):
+        self.stream = stream  # None means whatever sys.stdout is when flushing
+        self.flush_threshold = flush_threshold  # characters held before writing through
+        self.parts = []
+        self.size = 0
+
+    def write(self, text):
+        self.parts.append(text)
+        self.size += len(text)
+        if self.size >= self.flush_threshold:
+            self.flush()
+
+    def flush(self):
+        if self.parts:
+            stream = self.stream if self.stream is not None else sys.stdout
+            stream.write("".join(self.parts))
+            stream.flush()
+            self.parts.clear()
+            self.size = 0
+
+
+class CollectorSink:
+    # Keeps everything in memory, e.g. for the IDE's output pane
+    def __init__(self):
+        self.parts = []
+
+    def write(self, text):
+        self.parts.append(text)
+
+    def flush(self):
+        pass
+
+    def getvalue(self):
+        return "".join(self.parts)
+
+    def clear(self):
+        self.parts.clear()
+
+
+class NullSink:
+    # Discards everything, e.g. when only timing matters
+    def write(self, text):
+        pass
+
+    def flush(self):
+        pass
+
+
+class QueueSink:
+    # Sends output to another process as ("output", text) messages. Writes are
+    # batched; flush() may also be called from a timer thread so held output
+    # still shows up while a program runs quietly for a while.
+    def __init__(self, queue, flush_threshold=4096):
+        self.queue = queue
+        self.flush_threshold = flush_threshold
+        self.parts = []
+        self.size = 0
+        import threading  # only worker processes need it; keeps plain runs from loading it
+        self.lock = threading.Lock()
+
+    def write(self, text):
+        with self.lock:
+            self.parts.append(text)
+            self.size += len(text)
+            if self.size < self.flush_threshold:
+                return
+        self.flush()
+
+    def flush(self):
+        with self.lock:  # held across put() so chunks from two threads stay in order
+            if self.parts:
+                self.queue.put(("output", "".join(self.parts)))
+                self.parts.clear()
+                self.size = 0
+
+
+class FileSink(BufferedSink):
+    def __init__(self, path, flush_threshold=65536):
+        super().__init__(open(path, 'w'), flush_threshold)
+
+    def close(self):
+        self.flush()
+        self.stream.close()
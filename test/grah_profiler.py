@@ -0,0 +1,117 @@
+# Opt-in per-line profiler. When enabled the interpreter wraps its statement
+# executors and run_expression with the functions below; when disabled
+# nothing is wrapped, so there is no overhead at all.
+import json
+import time
+
+
+class LineStats:
+    __slots__ = ("count", "total", "own", "expression")
+
+    def __init__(self):
+        self.count = 0  # times a statement on this line ran
+        self.total = 0.0  # wall time including nested bodies
+        self.own = 0.0  # wall time excluding nested bodies
+        self.expression = 0.0  # part of the time spent in run_expression
+
+
+class Profiler:
+    def __init__(self, clock=time.perf_counter):
+        self.clock = clock
+        self.lines = {}  # line number -> LineStats
+        self.stacks = {}  # tuple of enclosing line numbers -> own time, for flamegraphs
+        self.frames = []  # [line, time spent in nested statements] for each running statement
+        self.source = {}  # line number -> source text, for reports
+
+    def add_source(self, program, first_line=1):
+        for offset, text in enumerate(program.split('\n')):
+            self.source[first_line + offset] = text.strip()
+
+    def wrap_statement(self, handler):
+        lines = self.lines
+        stacks = self.stacks
+        frames = self.frames
+        clock = self.clock
+
+        def profiled(node):
+            frame = [node.line, 0.0]
+            frames.append(frame)
+            start = clock()
+            try:
+                handler(node)
+            finally:
+                elapsed = clock() - start
+                frames.pop()
+                if frames:
+                    frames[-1][1] += elapsed
+                stats = lines.get(node.line)
+                if stats is None:
+                    stats = lines[node.line] = LineStats()
+                stats.count += 1
+                stats.total += elapsed
+                stats.own += elapsed - frame[1]
+                key = tuple(parent[0] for parent in frames) + (node.line,)
+                stacks[key] = stacks.get(key, 0.0) + elapsed - frame[1]
+        return profiled
+
+    def wrap_expression(self, evaluate):
+        lines = self.lines
+        frames = self.frames
+        clock = self.clock
+
+        def profiled(program):
+            start = clock()
+            try:
+                return evaluate(program)
+            finally:
+                if frames:
+                    line = frames[-1][0]
+                    stats = lines.get(line)
+                    if stats is None:
+                        stats = lines[line] = LineStats()
+                    stats.expression += clock() - start
+        return profiled
+
+    def rows(self):
+        # Hottest lines first
+        rows = []
+        for line, stats in self.lines.items():
+            rows.append({
+                "line": line,
+                "source": self.source.get(line, ""),
+                "count": stats.count,
+                "total": stats.total,
+                "own": stats.own,
+                "expression": stats.expression,
+            })
+        rows.sort(key=lambda row: row["total"], reverse=True)
+        return rows
+
+    def report_table(self):
+        lines = [f"{'line':>6} {'count':>10} {'total ms':>10} {'own ms':>10} {'expr ms':>10}  source"]
+        for row in self.rows():
+            lines.append(f"{row['line']:>6} {row['count']:>10} {row['total'] * 1000:>10.3f} "
+                         f"{row['own'] * 1000:>10.3f} {row['expression'] * 1000:>10.3f}  {row['source']}")
+        return "\n".join(lines)
+
+    def report_json(self):
+        return json.dumps(self.rows(), indent=2)
+
+    def report_collapsed(self):
+        # One "frame;frame;frame microseconds" line per distinct stack (flamegraph.pl, speedscope)
+        lines = []
+        for stack, own in sorted(self.stacks.items()):
+            frames = ";".join(self.frame_name(line) for line in stack)
+            lines.append(f"{frames} {round(own * 1000000)}")
+        return "\n".join(lines)
+
+    def frame_name(self, line):
+        source = self.source.get(line, "")
+        return f"line {line}: {source}".replace(";", ",").strip()
+
+    def report(self, style="table"):
+        if style == "json":
+            return self.report_json()
+        if style == "collapsed":
+            return self.report_collapsed()
+        return self.report_table()
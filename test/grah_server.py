@@ -0,0 +1,356 @@
+# Interpreter daemon: runs GRAH programs sent over a Unix domain socket (see
+# grah_client for the protocol) in a pool of long-lived worker processes, so
+# a request pays for neither Python's startup nor, when the program was seen
+# before, the parser and compiler.
+#
+#   python grah_cli.py serve [--socket PATH] [--workers N] [--timeout S]
+#   python grah_cli.py send script.GRAH
+#
+# The asyncio side only routes messages. Each worker runs one program at a
+# time and keeps, per dialect and backend, an interpreter and its prepared
+# programs; every request still starts from an empty variable scope. A
+# program that outlives its timeout has its worker killed and replaced.
+import asyncio
+import json
+import os
+import signal
+import socket
+import sys
+from collections import OrderedDict
+
+from grah_client import default_socket_path
+
+PROGRAM_CACHE_SIZE = 256  # prepared programs a worker keeps per session
+SESSION_CACHE_SIZE = 16  # dialect/backend combinations a worker keeps warm
+MAX_SLOTS = 1 << 16  # variable names a session may collect before it is rebuilt
+MESSAGE_LIMIT = 1 << 24  # longest line accepted from a client or a worker
+BACKENDS = ("ast", "vm", "python")
+
+
+# Worker process
+
+class Channel:
+    # Writes [kind, payload] lines to the server; put() mirrors Queue.put so a
+    # QueueSink can write to it
+    def __init__(self, stream):
+        import threading
+        self.stream = stream
+        self.lock = threading.Lock()
+
+    def put(self, message):
+        line = json.dumps(message).encode('utf-8') + b"\n"
+        with self.lock:
+            self.stream.write(line)
+            self.stream.flush()
+
+
+class Session:
+    # An interpreter for one dialect and backend, with the programs it has prepared
+    def __init__(self, config, backend, optimize):
+        from Interpreter import Interpreter
+        from grah_output import NullSink
+
+        self.interpreter = Interpreter(config, backend=backend, output=NullSink(), optimize=optimize)
+        self.programs = OrderedDict()  # source -> prepared program, least recently used first
+
+    def run(self, code, sink):
+        interpreter = self.interpreter
+        interpreter.output = sink
+        interpreter.reset()  # before prepare(): the optimizer and resolver look at what is defined
+        prepared = self.programs.get(code)
+        if prepared is None:
+            prepared = interpreter.prepare(interpreter.parser.parse(code))
+            self.programs[code] = prepared
+            if len(self.programs) > PROGRAM_CACHE_SIZE:
+                self.programs.popitem(last=False)
+        else:
+            self.programs.move_to_end(code)
+        interpreter.execute(prepared)
+
+
+def worker_main():
+    import threading
+    from grah_output import QueueSink
+    from grah_worker import FLUSH_INTERVAL
+    import Interpreter  # loaded before the first request arrives, not during it
+
+    channel = Channel(sys.stdout.buffer)
+    sys.stdout = sys.stderr  # a stray print() must not corrupt the protocol
+    sessions = OrderedDict()  # (dialect JSON, backend, optimize) -> Session
+
+    for line in sys.stdin.buffer:
+        job = json.loads(line)
+        key = (json.dumps(job["config"], sort_keys=True), job["backend"], job["optimize"])
+        session = sessions.get(key)
+        if session is None or len(session.interpreter.variables.names) > MAX_SLOTS:
+            session = sessions[key] = Session(job["config"], job["backend"], job["optimize"])
+            if len(sessions) > SESSION_CACHE_SIZE:
+                sessions.popitem(last=False)
+        else:
+            sessions.move_to_end(key)
+
+        sink = QueueSink(channel)
+        stop = threading.Event()
+
+        def flush_periodically():
+            while not stop.wait(FLUSH_INTERVAL):
+                sink.flush()
+
+        flusher = threading.Thread(target=flush_periodically, daemon=True)
+        flusher.start()
+        try:
+            session.run(job["code"], sink)
+        except SyntaxError as e:
+            sink.flush()
+            channel.put(("syntax_error", str(e)))
+        except Exception as e:
+            sink.flush()
+            channel.put(("error", f"Error: {e}"))
+        finally:
+            stop.set()
+            flusher.join()
+            sink.flush()
+            channel.put(("done", None))
+
+
+# Server process
+
+class Worker:
+    def __init__(self):
+        self.process = None
+        self.programs = OrderedDict()  # what the worker has prepared, to route repeats back to it
+
+    async def start(self):
+        self.process = await asyncio.create_subprocess_exec(
+            sys.executable, os.path.abspath(__file__), "--worker",
+            stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE, limit=MESSAGE_LIMIT)
+        return self
+
+    def remember(self, key):
+        self.programs[key] = True
+        self.programs.move_to_end(key)
+        if len(self.programs) > PROGRAM_CACHE_SIZE * SESSION_CACHE_SIZE:
+            self.programs.popitem(last=False)
+
+    async def run(self, job, send, deadline):
+        # Forwards the worker's messages to send() up to and including "done".
+        # Raises asyncio.TimeoutError past the deadline and EOFError if the
+        # worker dies; either way the worker is unusable afterwards.
+        loop = asyncio.get_running_loop()
+        self.process.stdin.write(json.dumps(job).encode('utf-8') + b"\n")
+        await self.process.stdin.drain()
+        while True:
+            if deadline is None:
+                line = await self.process.stdout.readline()
+            else:
+                line = await asyncio.wait_for(self.process.stdout.readline(), max(deadline - loop.time(), 0))
+            if not line:
+                raise EOFError
+            await send(line)
+            if json.loads(line)[0] == "done":
+                return
+
+    async def kill(self):
+        if self.process.returncode is None:
+            self.process.kill()
+        return await self.process.wait()
+
+
+class Pool:
+    # Hands out idle workers, first come first served, preferring one that
+    # has already prepared the program
+    def __init__(self, size):
+        self.size = size
+        self.workers = set()
+        self.idle = []
+        self.waiters = []
+        self.closed = False
+
+    async def start(self):
+        for _ in range(self.size):
+            await self.spawn()
+
+    async def spawn(self):
+        worker = await Worker().start()
+        self.workers.add(worker)
+        self.release(worker)
+
+    async def acquire(self, key):
+        for worker in self.idle:
+            if key in worker.programs:
+                self.idle.remove(worker)
+                return worker
+        if self.idle:
+            return self.idle.pop()
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters.append(waiter)
+        try:
+            return await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Handed a worker just before the client went away; pass it on
+                self.release(waiter.result())
+            elif waiter in self.waiters:
+                self.waiters.remove(waiter)
+            raise
+
+    def release(self, worker):
+        while self.waiters:
+            waiter = self.waiters.pop(0)
+            if not waiter.done():
+                waiter.set_result(worker)
+                return
+        self.idle.append(worker)
+
+    async def replace(self, worker):
+        # Kills a worker that cannot finish its job, starts a fresh one in its
+        # place and returns the old one's exit code
+        self.workers.discard(worker)
+        code = await worker.kill()
+        if not self.closed:
+            await self.spawn()
+        return code
+
+    async def close(self):
+        self.closed = True
+        for worker in list(self.workers):
+            await worker.kill()
+        self.workers.clear()
+        self.idle = []
+
+
+class Server:
+    def __init__(self, path=None, workers=None, timeout=30.0, queue=64):
+        self.path = path or default_socket_path()
+        self.pool = Pool(workers or os.cpu_count() or 1)
+        self.timeout = timeout  # seconds a program may run; None for no limit
+        self.queue = queue  # requests that may wait for a worker before new ones are turned away
+        self.waiting = 0
+
+    def request(self, line):
+        # Returns (job, timeout) for a request line, or raises ValueError
+        from Interpreter import DEFAULT_CONFIG
+        from grah_cli import merge_dialect
+
+        try:
+            request = json.loads(line)
+        except ValueError:
+            raise ValueError("a request must be one line of JSON")
+        if not isinstance(request, dict) or not isinstance(request.get("code"), str):
+            raise ValueError("a request needs the program as a string in 'code'")
+        backend = request.get("backend", "ast")
+        if backend not in BACKENDS:
+            raise ValueError(f"unknown backend '{backend}'")
+        config = request.get("config")
+        config = DEFAULT_CONFIG if config is None else merge_dialect(config)
+        timeout = request.get("timeout")
+        if timeout is not None:
+            if isinstance(timeout, bool) or not isinstance(timeout, (int, float)) or timeout <= 0:
+                raise ValueError("'timeout' must be a positive number of seconds")
+            if self.timeout is not None:
+                timeout = min(timeout, self.timeout)
+        else:
+            timeout = self.timeout
+        job = {"code": request["code"], "config": config, "backend": backend,
+               "optimize": bool(request.get("optimize", True))}
+        return job, timeout
+
+    async def handle(self, reader, writer):
+        async def send(line):
+            writer.write(line)
+            await writer.drain()
+
+        async def answer(*messages):
+            for message in messages:
+                await send(json.dumps(message).encode('utf-8') + b"\n")
+
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    job, timeout = self.request(line)
+                except ValueError as e:
+                    await answer(("error", f"Error: Bad request: {e}."), ("done", None))
+                    continue
+                if self.waiting >= self.queue:
+                    await answer(("error", "Error: Server busy, try again later."), ("done", None))
+                    continue
+                await self.execute(job, timeout, send, answer)
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass  # the client went away, or sent a line over MESSAGE_LIMIT
+        finally:
+            writer.close()
+
+    async def execute(self, job, timeout, send, answer):
+        key = hash((json.dumps(job["config"], sort_keys=True), job["backend"], job["optimize"], job["code"]))
+        self.waiting += 1
+        try:
+            worker = await self.pool.acquire(key)
+        finally:
+            self.waiting -= 1
+        deadline = None if timeout is None else asyncio.get_running_loop().time() + timeout
+        try:
+            await worker.run(job, send, deadline)
+        except asyncio.TimeoutError:
+            await self.pool.replace(worker)
+            await answer(("error", f"Error: Program stopped after {timeout:g} seconds."), ("done", None))
+        except EOFError:
+            code = await self.pool.replace(worker)
+            await answer(("error", f"Error: Program exited with code {code}."), ("done", None))
+        except BaseException:
+            # Client gone mid-run (or the server shutting down): the rest of
+            # the program's output has nowhere to go
+            await self.pool.replace(worker)
+            raise
+        else:
+            worker.remember(key)
+            self.pool.release(worker)
+
+    def claim_socket(self):
+        # A socket file nobody answers on is left over from a crashed server
+        if not os.path.exists(self.path):
+            return
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(self.path)
+        except OSError:
+            os.remove(self.path)
+        else:
+            raise OSError(f"a server is already listening on {self.path}")
+        finally:
+            probe.close()
+
+    async def serve(self):
+        self.claim_socket()
+        await self.pool.start()
+        # The socket is created owner-only; other users could otherwise run code as us
+        umask = os.umask(0o177)
+        try:
+            server = await asyncio.start_unix_server(self.handle, self.path, limit=MESSAGE_LIMIT)
+        finally:
+            os.umask(umask)
+        stopped = asyncio.get_running_loop().create_future()
+        for number in (signal.SIGINT, signal.SIGTERM):
+            asyncio.get_running_loop().add_signal_handler(number, stopped.cancel)
+        print(f"GRAH server listening on {self.path} with {self.pool.size} workers", file=sys.stderr)
+        try:
+            await stopped
+        except asyncio.CancelledError:
+            pass
+        finally:
+            server.close()
+            await self.pool.close()
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+
+def serve(path=None, workers=None, timeout=30.0, queue=64):
+    asyncio.run(Server(path, workers, timeout, queue).serve())
+
+
+if __name__ == "__main__" and sys.argv[1:] == ["--worker"]:
+    worker_main()
@@ -0,0 +1,171 @@
+# Slot-indexed variable storage. Every GRAH variable name gets a fixed index
+# into a flat list the first time a program mentions it; the resolver rewrites
+# statement nodes and expression programs to use those indexes, so execution
+# never hashes a name. Variables also behaves like a dict of the variables
+# that currently hold a value, for debugging and for code that works by name.
+from grah_ast import (Declaration, Display, Print, Assignment, Append, ForLoop, IfStatement,
+                      SwitchStatement)
+from grah_expr import VAR, FAIL, MEMO, stored
+from grah_switch import SwitchTable
+
+
+class Unset:
+    # Marks a slot whose variable has not been declared yet
+    __slots__ = ()
+
+    def __repr__(self):
+        return "UNSET"
+
+
+UNSET = Unset()
+
+
+class Variables:
+    def __init__(self):
+        self.slots = {}  # name -> slot index
+        self.names = []  # slot index -> name
+        self.values = []  # slot index -> value, or UNSET
+
+    def slot(self, name):
+        index = self.slots.get(name)
+        if index is None:
+            index = self.slots[name] = len(self.names)
+            self.names.append(name)
+            self.values.append(UNSET)
+        return index
+
+    def __contains__(self, name):
+        index = self.slots.get(name)
+        return index is not None and self.values[index] is not UNSET
+
+    def __getitem__(self, name):
+        index = self.slots.get(name)
+        if index is None or self.values[index] is UNSET:
+            raise KeyError(name)
+        return self.values[index]
+
+    def __setitem__(self, name, value):
+        self.values[self.slot(name)] = value
+
+    def __delitem__(self, name):
+        if name not in self:
+            raise KeyError(name)
+        self.values[self.slots[name]] = UNSET
+
+    def get(self, name, default=None):
+        return self[name] if name in self else default
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def keys(self):
+        return [name for name, value in zip(self.names, self.values) if value is not UNSET]
+
+    def items(self):
+        return [(name, value) for name, value in zip(self.names, self.values) if value is not UNSET]
+
+    def clear(self):
+        # In place: executors hold on to the values list
+        self.values[:] = [UNSET] * len(self.names)
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+
+class Resolver:
+    # Assigns slots for a parsed program and attaches resolved expression
+    # programs to its nodes. A name that no statement in the program declares
+    # and that holds no value yet can never be read successfully, so its
+    # error is settled here instead of being checked on every evaluation.
+    def __init__(self, variables, compile_expression):
+        self.variables = variables
+        self.compile_expression = compile_expression
+
+    def resolve(self, statements):
+        # Only this program's own names are collected; the ones holding a value
+        # are looked up as needed, so a streamed chunk costs no more when many
+        # variables already exist
+        self.bound = set()
+        self.collect_bound(statements)
+        self.resolve_block(statements)
+        return statements
+
+    def collect_bound(self, statements):
+        for node in statements:
+            kind = node.__class__
+            if kind is Declaration:
+                self.bound.add(node.name)
+            elif kind is ForLoop:
+                self.bound.add(node.var)
+                self.collect_bound(node.body)
+            elif kind is IfStatement:
+                self.collect_bound(node.body)
+                self.collect_bound(node.else_body)
+            elif kind is SwitchStatement:
+                for body in node.cases.values():
+                    self.collect_bound(body)
+                self.collect_bound(node.default)
+
+    def is_bound(self, name):
+        return name in self.bound or name in self.variables
+
+    def slot(self, name):
+        return self.variables.slot(name) if self.is_bound(name) else None
+
+    def resolve_block(self, statements):
+        for node in statements:
+            kind = node.__class__
+            if kind is Declaration:
+                node.slot = self.variables.slot(node.name)
+                node.program = self.expression(node, node.expr)
+            elif kind is Assignment:
+                node.slot = self.slot(node.name)
+                node.program = stored(self.expression(node, node.expr))
+            elif kind is Append:
+                node.slot = self.slot(node.name)
+                node.program = self.expression(node, node.expr)
+            elif kind is Display or kind is Print:
+                node.program = self.expression(node, node.expr)
+            elif kind is ForLoop:
+                node.slot = self.variables.slot(node.var)
+                if node.source is not None:
+                    node.source_slot = self.slot(node.source)
+                if node.closed is not None:
+                    node.closed.resolve(self.variables.slot)
+                self.resolve_block(node.body)
+            elif kind is IfStatement:
+                node.program = self.expression(node, node.condition)
+                self.resolve_block(node.body)
+                self.resolve_block(node.else_body)
+            elif kind is SwitchStatement:
+                node.slot = self.slot(node.var)
+                node.table = SwitchTable(node.cases)
+                node.bodies = list(node.cases.values())
+                for body in node.bodies:
+                    self.resolve_block(body)
+                self.resolve_block(node.default)
+
+    def expression(self, node, tokens):
+        # Starts from the optimizer's program when there is one
+        if node.optimized is not None:
+            return self.resolve_program(node.optimized)
+        return self.resolve_program(self.compile_expression(tokens))
+
+    def resolve_program(self, program):
+        # VAR items carry a slot index instead of a name; reading a name that is
+        # never bound becomes the FAIL item that reports it
+        resolved = []
+        for kind, arg in program:
+            if kind == VAR:
+                if not self.is_bound(arg):
+                    resolved.append((FAIL, f"Error: Variable '{arg}' is not defined."))
+                    break
+                resolved.append((VAR, self.variables.slot(arg)))
+            else:
+                if kind == MEMO:
+                    arg.program = self.resolve_program(arg.source)
+                resolved.append((kind, arg))
+        return tuple(resolved)
@@ -0,0 +1,43 @@
+# Switch dispatch table, built once per switch statement instead of comparing
+# labels on every execution. A value selects the case whose label equals
+# str(value); ints and strings are looked up by their own type (ints through a
+# dense list when the labels are close together), anything else by its text.
+
+
+class SwitchTable:
+    __slots__ = ("strings", "ints", "low", "dense")
+
+    def __init__(self, labels):
+        # labels: case labels as written, in order; lookups return their positions
+        self.strings = {}
+        self.ints = {}
+        for index, label in enumerate(labels):
+            self.strings.setdefault(label, index)
+            try:
+                number = int(label)
+            except ValueError:
+                continue
+            if str(number) == label:  # '007' or '+7' can never be str() of an int
+                self.ints.setdefault(number, index)
+        self.low = 0
+        self.dense = None
+        if self.ints:
+            low, high = min(self.ints), max(self.ints)
+            if high - low + 1 <= 2 * len(self.ints):
+                self.low = low
+                self.dense = [None] * (high - low + 1)
+                for number, index in self.ints.items():
+                    self.dense[number - low] = index
+
+    def lookup(self, value):
+        # Position of the case for `value`, or None for the default body
+        kind = type(value)
+        if kind is int:
+            dense = self.dense
+            if dense is not None:
+                offset = value - self.low
+                return dense[offset] if 0 <= offset < len(dense) else None
+            return self.ints.get(value)
+        if kind is str:
+            return self.strings.get(value)
+        return self.strings.get(str(value))
@@ -0,0 +1,584 @@
+# Second execution tier for the tree walker. The interpreter counts how often
+# each 'for' loop iterates and each 'if' is entered; once a statement passes
+# its threshold it is compiled, with everything nested in it, into a tree of
+# Python closures with slots, operators and error messages bound in advance,
+# and later executions call the closure instead of dispatching on nodes and
+# walking expression programs. The closure is kept on the node, which stands
+# for one source line of one parsed program, so it is reused for as long as
+# the program is (e.g. across runs of a daemon's prepared program).
+# Operator closures are specialized to operand types only by CPython 3.11+'s
+# adaptive interpreter (see TEMPLATES); this module has no type guards or
+# fallback paths of its own, so below 3.11 nothing specializes.
+from grah_ast import (Declaration, Display, Print, Assignment, Append, ForLoop, IfStatement,
+                      SwitchStatement, SyntaxErrorStatement, Halt)
+from grah_array import ArrayError, index, declared, append as append_value
+from grah_expr import CONST, VAR, OP, MEMO, UNARY
+from grah_slots import UNSET
+
+LOOP_THRESHOLD = 64  # iterations, over all entries, before a loop is compiled
+BRANCH_THRESHOLD = 64  # entries before an 'if' is compiled
+MAX_DEPTH = 50  # deepest operator nesting compiled to nested closures
+MAX_NESTING = 50  # deepest block nesting compiled into one statement's closure
+
+
+class Abort(Exception):
+    # An expression wrote its error message; the statement goes on with None
+    pass
+
+
+def run_nothing():
+    pass
+
+
+class Tiering:
+    def __init__(self, interpreter, loop_threshold=LOOP_THRESHOLD, branch_threshold=BRANCH_THRESHOLD):
+        # A threshold of None keeps that kind of statement in the tree walker
+        self.interpreter = interpreter
+        self.loop_threshold = loop_threshold
+        self.branch_threshold = branch_threshold
+        self.promoted = {}  # source line -> (statement kind, count when promoted)
+        self.promotions = 0
+        self.expressions = 0  # expression closures built
+
+    def enter_loop(self, node, count):
+        # Called as a loop starts with its iterations; True once node.compiled is set
+        node.hits += count
+        if self.loop_threshold is None or node.hits < self.loop_threshold:
+            return False
+        self.promote(node, "for")
+        return True
+
+    def enter_branch(self, node):
+        node.hits += 1
+        if self.branch_threshold is None or node.hits < self.branch_threshold:
+            return False
+        self.promote(node, "if")
+        return True
+
+    def promote(self, node, kind):
+        node.compiled = self.statement(node)
+        self.promoted[node.line] = (kind, node.hits)
+        self.promotions += 1
+
+    def stats(self):
+        return {
+            "loop_threshold": self.loop_threshold,
+            "branch_threshold": self.branch_threshold,
+            "promotions": self.promotions,
+            "promoted": [{"line": line, "kind": kind, "count": count}
+                         for line, (kind, count) in sorted(self.promoted.items())],
+            "compiled_expressions": self.expressions,
+        }
+
+    def report(self):
+        stats = self.stats()
+        lines = [f"tiering: {stats['promotions']} statements compiled "
+                 f"(loops after {stats['loop_threshold']} iterations, ifs after {stats['branch_threshold']} entries)"]
+        for entry in stats["promoted"]:
+            unit = "iterations" if entry["kind"] == "for" else "entries"
+            lines.append(f"  line {entry['line']}: '{entry['kind']}' after {entry['count']} {unit}")
+        return "\n".join(lines)
+
+    # Statements
+
+    def block(self, statements, depth):
+        parts = tuple(self.statement(node, depth) for node in statements)
+        if not parts:
+            return run_nothing
+        if len(parts) == 1:
+            return parts[0]
+        if len(parts) == 2:
+            first, second = parts
+
+            def run_pair():
+                first()
+                second()
+            return run_pair
+
+        def run_block():
+            for part in parts:
+                part()
+        return run_block
+
+    def statement(self, node, depth=0):
+        # `depth` counts the blocks between this statement and the one being
+        # promoted. Past MAX_NESTING the tree walker runs the statement again,
+        # so very deep nesting cannot exhaust the stack while compiling.
+        kind = node.__class__
+        if depth > MAX_NESTING and (kind is ForLoop or kind is IfStatement or kind is SwitchStatement):
+            execute = self.interpreter.executors[kind]
+            return lambda: execute(node)
+        if kind is ForLoop:
+            return self.for_loop(node, depth + 1)
+        if kind is IfStatement:
+            return self.if_statement(node, depth + 1)
+        if kind is Assignment:
+            return self.assignment(node)
+        if kind is Display:
+            return self.display(node)
+        if kind is Print:
+            return self.print(node)
+        if kind is Declaration:
+            return self.declaration(node)
+        if kind is Append:
+            return self.append(node)
+        if kind is SwitchStatement:
+            return self.switch(node, depth + 1)
+        if kind is SyntaxErrorStatement or kind is Halt:
+            return self.message(f"{node.message}\n")
+        raise TypeError(f"cannot compile {kind.__name__}")
+
+    def message(self, text):
+        interpreter = self.interpreter
+
+        def run_message():
+            interpreter.output.write(text)
+        return run_message
+
+    def for_loop(self, node, depth):
+        values = self.interpreter.variables.values
+        slot = node.slot
+        count = node.count
+        body = self.block(node.body, depth)
+        invariants = node.invariants
+        common = node.common
+        if node.source is not None:
+            return self.for_each(node, body)
+        if common:
+            def run_for():
+                for memo in invariants:
+                    memo.value = None
+                for j in range(count):
+                    values[slot] = j
+                    for memo in common:
+                        memo.value = None
+                    body()
+        elif invariants:
+            def run_for():
+                for memo in invariants:
+                    memo.value = None
+                for j in range(count):
+                    values[slot] = j
+                    body()
+        else:
+            def run_for():
+                for j in range(count):
+                    values[slot] = j
+                    body()
+        if node.closed is not None:
+            closed = node.closed
+            run_loop = run_for
+
+            def run_for():
+                if not closed.run(values):
+                    run_loop()
+        return run_for
+
+    def for_each(self, node, body):
+        array = self.interpreter.array
+        values = self.interpreter.variables.values
+        slot = node.slot
+        source_slot = node.source_slot
+        source = node.source
+        invariants = node.invariants
+        common = node.common
+
+        def run_for():
+            elements = array(source_slot, source)
+            if elements is None:
+                return
+            for memo in invariants:
+                memo.value = None
+            for j in elements.copy():
+                values[slot] = j
+                for memo in common:
+                    memo.value = None
+                body()
+        return run_for
+
+    def if_statement(self, node, depth):
+        root = self.tree(node.program)
+        body = self.block(node.body, depth)
+        else_body = self.block(node.else_body, depth)
+        if root[0] == "op":
+            return self.generated("if", root[1], body, else_body)
+        condition = self.closure(root)
+
+        def run_if():
+            try:
+                value = condition()
+            except Abort:
+                value = None
+            if value:
+                body()
+            else:
+                else_body()
+        return run_if
+
+    def assignment(self, node):
+        interpreter = self.interpreter
+        message = (f"Error: Variable '{node.name}' is used before being declared with "
+                   f"'{interpreter.config['declare']}'.\n")
+        if node.slot is None:
+            return self.message(message)
+        values = interpreter.variables.values
+        slot = node.slot
+        root = self.tree(node.program)
+        if root[0] == "op":
+            return self.generated("assignment", root[1], interpreter, slot, message)
+        expression = self.closure(root)
+
+        def run_assignment():
+            if values[slot] is UNSET:
+                interpreter.output.write(message)
+                return
+            try:
+                values[slot] = expression()
+            except Abort:
+                values[slot] = None
+        return run_assignment
+
+    def display(self, node):
+        interpreter = self.interpreter
+        expression = self.expression(node.program)
+
+        def run_display():
+            try:
+                value = expression()
+            except Abort:
+                value = None
+            if value is not None:
+                output = interpreter.output
+                if not interpreter.last_print_was_newline:
+                    output.write("\n")
+                output.write(f"{value}\n")
+            interpreter.last_print_was_newline = True
+        return run_display
+
+    def print(self, node):
+        interpreter = self.interpreter
+        expression = self.expression(node.program)
+
+        def run_print():
+            try:
+                value = expression()
+            except Abort:
+                value = None
+            if value is not None:
+                interpreter.output.write(str(value))
+            interpreter.last_print_was_newline = False
+        return run_print
+
+    def declaration(self, node):
+        interpreter = self.interpreter
+        config = interpreter.config
+        values = interpreter.variables.values
+        slot = node.slot
+        expression = self.expression(node.program)
+
+        def evaluate():
+            try:
+                return expression()
+            except Abort:
+                return None
+
+        if node.var_type == config["int"]:
+            def run_declaration():
+                values[slot] = int(evaluate())
+        elif node.var_type == config["string"]:
+            def run_declaration():
+                values[slot] = str(evaluate().strip('"'))
+        elif node.var_type == config["array"]:
+            name = node.name
+
+            def run_declaration():
+                value = evaluate()
+                if value is not None:
+                    try:
+                        values[slot] = declared(value, name)
+                    except ArrayError as e:
+                        interpreter.output.write(f"{e}\n")
+        else:
+            message = f"Syntax Error: Unknown type '{node.var_type}' for declaration.\n"
+
+            def run_declaration():
+                evaluate()
+                interpreter.output.write(message)
+        return run_declaration
+
+    def append(self, node):
+        interpreter = self.interpreter
+        array = interpreter.array
+        slot = node.slot
+        name = node.name
+        expression = self.expression(node.program)
+
+        def run_append():
+            values = array(slot, name)
+            if values is None:
+                return
+            try:
+                value = expression()
+            except Abort:
+                return
+            try:
+                append_value(values, value)
+            except ArrayError as e:
+                interpreter.output.write(f"{e}\n")
+        return run_append
+
+    def switch(self, node, depth):
+        message = f"Error: Variable '{node.var}' is not defined.\n"
+        if node.slot is None:
+            return self.message(message)
+        interpreter = self.interpreter
+        values = interpreter.variables.values
+        slot = node.slot
+        lookup = node.table.lookup
+        bodies = tuple(self.block(body, depth) for body in node.bodies)
+        default = self.block(node.default, depth)
+
+        def run_switch():
+            value = values[slot]
+            if value is UNSET:
+                interpreter.output.write(message)
+                return
+            index = lookup(value)
+            if index is None:
+                default()
+            else:
+                bodies[index]()
+        return run_switch
+
+    # Expressions
+
+    def expression(self, program):
+        # Returns a closure computing a resolved program's value, raising Abort
+        # after writing the message wherever run_expression would return None
+        return self.closure(self.tree(program))
+
+    def tree(self, program):
+        # Rebuilds the expression tree from the reverse-Polish program as
+        # ("const", value), ("var", slot), ("op", (symbol, left, right)),
+        # ("unary", ((symbol, function), operand)), ("memo", Memo) and
+        # ("call", closure) operands. Leaves stay unwrapped so the closure
+        # around them can read them inline.
+        self.expressions += 1
+        stack = []
+        depths = []  # nesting depth of each operand on the stack
+        for kind, arg in program:
+            if kind == VAR:
+                stack.append(("var", arg))
+                depths.append(0)
+            elif kind == CONST:
+                stack.append(("const", arg))
+                depths.append(0)
+            elif kind == MEMO:
+                stack.append(("memo", arg))
+                depths.append(0)
+            elif kind == OP:
+                right = stack.pop()
+                left = stack.pop()
+                stack.append(("op", (arg[0], left, right)))
+                depths.append(max(depths.pop(), depths.pop()) + 1)
+                if depths[-1] > MAX_DEPTH:
+                    return ("call", self.flat(program))
+            elif kind == UNARY:
+                stack[-1] = ("unary", (arg, stack[-1]))
+                depths[-1] += 1
+                if depths[-1] > MAX_DEPTH:
+                    return ("call", self.flat(program))
+            else:
+                return ("call", self.failure(arg, stack))
+        return stack[0]
+
+    def flat(self, program):
+        # For expressions nested too deeply to become closures calling closures
+        # without hitting the recursion limit; None stands for an error here
+        run_expression = self.interpreter.run_expression
+        return lambda: run_expression(program)
+
+    def operand(self, operand):
+        # Operator closures take constants and slots as they are, a memo as
+        # the Memo with a closure computing its value, and everything else as
+        # a closure
+        if operand[0] == "op" or operand[0] == "unary":
+            return ("call", self.closure(operand))
+        if operand[0] == "memo":
+            return ("memo", (operand[1], self.compute(operand[1])))
+        return operand
+
+    def generated(self, kind, operation, *extra):
+        # Closure from a generated template with `operation` written inline
+        symbol, left, right = operation
+        left = self.operand(left)
+        right = self.operand(right)
+        factory = template_factory(kind, symbol, left[0], right[0])
+        return factory(self.interpreter.variables.values, UNSET, Abort, self.undefined, self.division_by_zero,
+                       self.array_error, left[1], right[1], *extra)
+
+    def undefined(self, slot):
+        interpreter = self.interpreter
+        interpreter.output.write(f"Error: Variable '{interpreter.variables.names[slot]}' is not defined.\n")
+        raise Abort()
+
+    def division_by_zero(self):
+        output = self.interpreter.output
+        output.write("Error: Division by zero.\n")
+        output.write("Error: Invalid expression.\n")
+        raise Abort()
+
+    def array_error(self, error):
+        self.interpreter.output.write(f"{error}\n")
+        raise Abort()
+
+    def compute(self, memo):
+        expression = self.expression(memo.program)
+
+        def compute_memo():
+            value = memo.value = expression()
+            return value
+        return compute_memo
+
+    def closure(self, operand):
+        kind, arg = operand
+        if kind == "call":
+            return arg
+        if kind == "op":
+            return self.generated("operator", arg)
+        if kind == "unary":
+            (symbol, function), inner = arg
+            inner = self.closure(inner)
+            array_error = self.array_error
+
+            def run_unary():
+                try:
+                    return function(inner())
+                except ArrayError as e:
+                    array_error(e)
+            return run_unary
+        if kind == "const":
+            return lambda: arg
+        if kind == "memo":
+            compute = self.compute(arg)
+
+            def load_memo():
+                value = arg.value
+                if value is None:
+                    value = compute()
+                return value
+            return load_memo
+        values = self.interpreter.variables.values
+        undefined = self.undefined
+
+        def load():
+            value = values[arg]
+            if value is UNSET:
+                undefined(arg)
+            return value
+        return load
+
+    def failure(self, message, pending):
+        # The operands already on the stack are evaluated first, as they would
+        # be by run_expression, so their own errors come out before this one
+        parts = tuple(self.closure(operand) for operand in pending)
+        interpreter = self.interpreter
+        text = f"{message}\n"
+
+        def fail():
+            for part in parts:
+                part()
+            interpreter.output.write(text)
+            raise Abort()
+        return fail
+
+
+# Templates for the closures that evaluate an operator. The operator is written
+# inline rather than called through grah_expr.OPERATORS, so CPython's
+# specializing interpreter quickens each one to the operand types it meets
+# (int + int, str + str, int comparison and so on) behind its own type guard,
+# and goes back to the generic operation by itself when the types change.
+# Assignments and ifs whose expression is an operator get it inline too, which
+# saves a call per execution. @operands stands for the code loading the
+# operands and @result for the expression computing the value.
+TEMPLATES = {
+    "operator": """
+def factory(values, UNSET, Abort, undefined, division_by_zero, array_error, a, b):
+    def run_operator():
+        @operands
+        return @result
+    return run_operator
+""",
+    "assignment": """
+def factory(values, UNSET, Abort, undefined, division_by_zero, array_error, a, b, interpreter, slot, message):
+    def run_assignment():
+        if values[slot] is UNSET:
+            interpreter.output.write(message)
+            return
+        try:
+            @operands
+            values[slot] = @result
+        except Abort:
+            values[slot] = None
+    return run_assignment
+""",
+    "if": """
+def factory(values, UNSET, Abort, undefined, division_by_zero, array_error, a, b, body, else_body):
+    def run_if():
+        try:
+            @operands
+            value = @result
+        except Abort:
+            value = None
+        if value:
+            body()
+        else:
+            else_body()
+    return run_if
+""",
+}
+ARRAY_OPERATORS = ('+', '-', '*', '/', '[]', '>', '<', '>=', '<=')  # those that can raise ArrayError
+FACTORIES = {}  # (template, symbol, left operand kind, right operand kind) -> factory
+
+
+def template_factory(kind, symbol, left_kind, right_kind):
+    # Generates and compiles each template once per operator and operand kinds
+    key = (kind, symbol, left_kind, right_kind)
+    factory = FACTORIES.get(key)
+    if factory is None:
+        lines = []
+        operands = []
+        for operand_kind, name, local in ((left_kind, "a", "first"), (right_kind, "b", "second")):
+            if operand_kind == "var":
+                lines += [f"{local} = values[{name}]", f"if {local} is UNSET:", f"    undefined({name})"]
+                operands.append(local)
+            elif operand_kind == "call":
+                lines.append(f"{local} = {name}()")
+                operands.append(local)
+            elif operand_kind == "memo":
+                lines += [f"{local} = {name}[0].value", f"if {local} is None:", f"    {local} = {name}[1]()"]
+                operands.append(local)
+            else:
+                operands.append(name)
+        result = f"{operands[0]} {symbol} {operands[1]}"
+        if symbol == "[]":
+            result = f"index({operands[0]}, {operands[1]})"
+        handlers = []
+        if symbol == "/":  # the only operator that can raise ZeroDivisionError
+            handlers += ["except ZeroDivisionError:", "    division_by_zero()"]
+        if symbol in ARRAY_OPERATORS:
+            handlers += ["except ArrayError as error:", "    array_error(error)"]
+        if handlers:
+            lines += ["try:", f"    result = {result}"] + handlers
+            result = "result"
+        source = []
+        for line in TEMPLATES[kind].strip("\n").split("\n"):
+            if line.strip() == "@operands":
+                indent = line[:len(line) - len(line.lstrip())]
+                source += [indent + operand_line for operand_line in lines]
+            else:
+                source.append(line.replace("@result", result))
+        namespace = {"ArrayError": ArrayError, "index": index}
+        exec("\n".join(source), namespace)
+        factory = FACTORIES[key] = namespace["factory"]
+    return factory
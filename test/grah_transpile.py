@@ -0,0 +1,380 @@
+# Python backend: lowers the statement tree from grah_ast to a Python ast.Module
+# and runs it with compile()/exec so CPython's own eval loop executes GRAH loops.
+# GRAH variables become function locals named 'v_<name>'; everything the
+# generated code needs from the interpreter goes through a Runtime object.
+import ast
+
+from grah_ast import (Declaration, Display, Print, Assignment, Append, ForLoop, IfStatement,
+                      SwitchStatement, SyntaxErrorStatement, Halt)
+from grah_array import Array, ArrayError, index, declared, target, append
+from grah_expr import compile_expression, CONST, VAR, OP, MEMO, UNARY, COMPARISONS, stored
+from grah_switch import SwitchTable
+
+ARITHMETIC_NODES = {'+': ast.Add, '-': ast.Sub, '*': ast.Mult, '/': ast.Div}
+COMPARE_NODES = {'>': ast.Gt, '<': ast.Lt, '>=': ast.GtE, '<=': ast.LtE, '==': ast.Eq, '!=': ast.NotEq}
+PREFIX = "v_"
+
+
+class ExpressionFailed(Exception):
+    pass
+
+
+class Runtime:
+    Failed = ExpressionFailed
+    ArrayError = ArrayError
+
+    def __init__(self, interpreter):
+        self.interpreter = interpreter
+
+    def display(self, value):
+        if value is not None:
+            if not self.interpreter.last_print_was_newline:
+                self.interpreter.output.write("\n")
+            self.interpreter.output.write(f"{value}\n")
+        self.interpreter.last_print_was_newline = True
+
+    def print(self, value):
+        if value is not None:
+            self.interpreter.output.write(str(value))
+        self.interpreter.last_print_was_newline = False
+
+    def switch_table(self, labels):
+        return SwitchTable(labels).lookup
+
+    def report(self, message):
+        self.interpreter.output.write(f"{message}\n")
+
+    def division_by_zero(self):
+        self.interpreter.output.write("Error: Division by zero.\n")
+        self.interpreter.output.write("Error: Invalid expression.\n")
+        return None
+
+    def array_error(self, error):
+        self.interpreter.output.write(f"{error}\n")
+        return None
+
+    def declared(self, value, name):
+        # The value for an array declaration, or None to leave the variable alone
+        if value is None:
+            return None
+        try:
+            return declared(value, name)
+        except ArrayError as e:
+            return self.array_error(e)
+
+    def array(self, value, name):
+        # What 'append' and 'for ... in' work on, or None after reporting why not
+        try:
+            return target(value, name)
+        except ArrayError as e:
+            return self.array_error(e)
+
+    def not_defined(self, name):
+        self.interpreter.output.write(f"Error: Variable '{name}' is not defined.\n")
+        return None
+
+    def append(self, values, value):
+        if value is not None:
+            try:
+                append(values, value)
+            except ArrayError as e:
+                self.array_error(e)
+
+    def fail(self, message, operands):
+        self.interpreter.output.write(f"{message}\n")
+        raise ExpressionFailed()
+
+    def undefined(self, scope, names):
+        for name in names:
+            if PREFIX + name not in scope:
+                self.interpreter.output.write(f"Error: Variable '{name}' is not defined.\n")
+                break
+        return None
+
+    def store(self, scope, variables):
+        for name, value in scope.items():
+            if name.startswith(PREFIX):
+                variables[name[len(PREFIX):]] = value
+
+
+def name(identifier, store=False):
+    return ast.Name(id=identifier, ctx=ast.Store() if store else ast.Load())
+
+
+def runtime_call(method, *args):
+    return ast.Call(func=ast.Attribute(value=name("_rt"), attr=method, ctx=ast.Load()),
+                    args=list(args), keywords=[])
+
+
+class Transpiler:
+    def __init__(self, config, compile_expression=compile_expression):
+        self.config = config
+        self.compile_expression = compile_expression  # tokens -> RPN program, e.g. cached and folded
+
+    def transpile(self, statements):
+        self.names = set()
+        self.memos = {}  # grah_expr.Memo -> the local holding its value, None until computed
+        self.globals = {}  # objects the generated code uses by name, e.g. closed forms
+        self.prologue = []  # run once per call, before the program body
+        body = self.lower_block(statements)
+        loads = []
+        for identifier in sorted(self.names):
+            loads.append(ast.If(
+                test=ast.Compare(left=ast.Constant(identifier), ops=[ast.In()], comparators=[name("_vars")]),
+                body=[ast.Assign(targets=[name(PREFIX + identifier, True)],
+                                 value=ast.Subscript(value=name("_vars"), slice=ast.Constant(identifier),
+                                                     ctx=ast.Load()))],
+                orelse=[]))
+        function = ast.FunctionDef(
+            name="_grah_main",
+            args=ast.arguments(posonlyargs=[], args=[ast.arg(arg="_rt"), ast.arg(arg="_vars")],
+                               vararg=None, kwonlyargs=[], kw_defaults=[], kwarg=None, defaults=[]),
+            body=loads + self.prologue + [ast.Try(body=body, handlers=[], orelse=[],
+                                  finalbody=[ast.Expr(runtime_call("store", ast.Call(
+                                      func=name("locals"), args=[], keywords=[]), name("_vars")))])],
+            decorator_list=[], returns=None, type_params=[])
+        module = ast.Module(body=[function], type_ignores=[])
+        return ast.fix_missing_locations(module)
+
+    def compile(self, statements):
+        module = self.transpile(statements)
+        namespace = dict(self.globals)
+        exec(compile(module, "<grah>", "exec"), namespace)
+        return namespace["_grah_main"]
+
+    def lower_block(self, statements):
+        body = []
+        for node in statements:
+            for statement in self.lower_statement(node):
+                statement.lineno = statement.end_lineno = node.line
+                body.append(statement)
+        return body or [ast.Pass()]
+
+    def lower_statement(self, node):
+        kind = node.__class__
+        if kind is Declaration and node.var_type == self.config["array"]:
+            self.names.add(node.name)
+            return [self.evaluate(node, node.expr),
+                    ast.Assign(targets=[name("_t", True)],
+                               value=runtime_call("declared", name("_t"), ast.Constant(node.name))),
+                    ast.If(test=ast.Compare(left=name("_t"), ops=[ast.IsNot()], comparators=[ast.Constant(None)]),
+                           body=[ast.Assign(targets=[name(PREFIX + node.name, True)], value=name("_t"))],
+                           orelse=[])]
+        if kind is Declaration:
+            self.names.add(node.name)
+            if node.var_type == self.config["int"]:
+                value = ast.Call(func=name("int"), args=[name("_t")], keywords=[])
+            else:
+                strip = ast.Call(func=ast.Attribute(value=name("_t"), attr="strip", ctx=ast.Load()),
+                                 args=[ast.Constant('"')], keywords=[])
+                value = ast.Call(func=name("str"), args=[strip], keywords=[])
+            return [self.evaluate(node, node.expr), ast.Assign(targets=[name(PREFIX + node.name, True)], value=value)]
+        if kind is Assignment:
+            self.names.add(node.name)
+            message = f"Error: Variable '{node.name}' is used before being declared with '{self.config['declare']}'."
+            return [ast.Try(
+                body=[ast.Expr(name(PREFIX + node.name))],
+                handlers=[ast.ExceptHandler(type=name("NameError"), name=None,
+                                            body=[ast.Expr(runtime_call("report", ast.Constant(message)))])],
+                orelse=[self.evaluate(node, node.expr, assignment=True),
+                        ast.Assign(targets=[name(PREFIX + node.name, True)], value=name("_t"))],
+                finalbody=[])]
+        if kind is Append:
+            self.names.add(node.name)
+            return self.lower_array(node.name, "_a", [
+                ast.If(test=ast.Compare(left=name("_a"), ops=[ast.IsNot()], comparators=[ast.Constant(None)]),
+                       body=[self.evaluate(node, node.expr), ast.Expr(runtime_call("append", name("_a"), name("_t")))],
+                       orelse=[])])
+        if kind is Display:
+            return [self.evaluate(node, node.expr), ast.Expr(runtime_call("display", name("_t")))]
+        if kind is Print:
+            return [self.evaluate(node, node.expr), ast.Expr(runtime_call("print", name("_t")))]
+        if kind is ForLoop:
+            self.names.add(node.var)
+            body = self.lower_block(node.body)
+            if node.common:
+                body[:0] = [self.clear(node.common)]
+            if node.source is not None:
+                # A snapshot, so appending in the body does not change what the loop walks
+                self.names.add(node.source)
+                elements = ast.Call(func=ast.Attribute(value=name("_e"), attr="copy", ctx=ast.Load()),
+                                    args=[], keywords=[])
+            else:
+                elements = ast.Call(func=name("range"), args=[ast.Constant(node.count)], keywords=[])
+            loop = ast.For(target=name(PREFIX + node.var, True), iter=elements, body=body, orelse=[])
+            loop = [self.clear(node.invariants), loop] if node.invariants else [loop]
+            if node.source is not None:
+                return self.lower_array(node.source, "_e", [
+                    ast.If(test=ast.Compare(left=name("_e"), ops=[ast.IsNot()], comparators=[ast.Constant(None)]),
+                           body=loop, orelse=[])])
+            if node.closed is not None:
+                return self.lower_closed(node.closed, loop)
+            return loop
+        if kind is IfStatement:
+            return [self.evaluate(node, node.condition),
+                    ast.If(test=name("_t"), body=self.lower_block(node.body),
+                           orelse=self.lower_block(node.else_body) if node.else_body else [])]
+        if kind is SwitchStatement:
+            return [self.lower_switch(node)]
+        if kind is SyntaxErrorStatement or kind is Halt:
+            return [ast.Expr(runtime_call("report", ast.Constant(node.message)))]
+        raise TypeError(f"Cannot transpile {kind.__name__}")
+
+    def lower_closed(self, closed, loop):
+        # try:
+        #     _c = _closed0((v_a, v_b))
+        # except NameError:
+        #     _c = None
+        # if _c is not None:
+        #     v_total, = _c
+        #     v_i = <count - 1>
+        # else:
+        #     <loop>
+        compute = f"_closed{len(self.globals)}"
+        self.globals[compute] = closed.compute
+        self.names.update(closed.inputs)
+        self.names.update(target for target, start, terms in closed.targets)
+        inputs = ast.Tuple(elts=[name(PREFIX + identifier) for identifier in closed.inputs], ctx=ast.Load())
+        targets = ast.Tuple(elts=[name(PREFIX + target, True) for target, start, terms in closed.targets],
+                            ctx=ast.Store())
+        return [
+            ast.Try(body=[ast.Assign(targets=[name("_c", True)],
+                                     value=ast.Call(func=name(compute), args=[inputs], keywords=[]))],
+                    handlers=[ast.ExceptHandler(type=name("NameError"), name=None, body=[
+                        ast.Assign(targets=[name("_c", True)], value=ast.Constant(None))])],
+                    orelse=[], finalbody=[]),
+            ast.If(test=ast.Compare(left=name("_c"), ops=[ast.IsNot()], comparators=[ast.Constant(None)]),
+                   body=[ast.Assign(targets=[targets], value=name("_c")),
+                         ast.Assign(targets=[name(PREFIX + closed.var, True)], value=ast.Constant(closed.last))],
+                   orelse=loop)]
+
+    def lower_array(self, identifier, local, statements):
+        # try:
+        #     <local> = _rt.array(v_<identifier>, '<identifier>')
+        # except NameError:
+        #     <local> = _rt.not_defined('<identifier>')
+        # <statements>, which go on only when <local> is not None
+        return [ast.Try(
+            body=[ast.Assign(targets=[name(local, True)],
+                             value=runtime_call("array", name(PREFIX + identifier), ast.Constant(identifier)))],
+            handlers=[ast.ExceptHandler(type=name("NameError"), name=None, body=[
+                ast.Assign(targets=[name(local, True)], value=runtime_call("not_defined", ast.Constant(identifier)))])],
+            orelse=[], finalbody=[])] + statements
+
+    def lower_switch(self, node):
+        self.names.add(node.var)
+        # Same dispatch as the tree walker: a SwitchTable built once in the
+        # prologue maps the value to a case position, then a binary search over
+        # the positions reaches the case body in log2(cases) comparisons.
+        table = f"_switch{len(self.prologue)}"
+        self.prologue.append(ast.Assign(targets=[name(table, True)], value=runtime_call(
+            "switch_table", ast.Tuple(elts=[ast.Constant(label) for label in node.cases], ctx=ast.Load()))))
+        bodies = [self.lower_block(body) for body in node.cases.values()]
+        dispatch = self.lower_block(node.default)
+        if bodies:
+            dispatch = [ast.If(test=ast.Compare(left=name("_s"), ops=[ast.Is()], comparators=[ast.Constant(None)]),
+                               body=dispatch, orelse=self.lower_cases(bodies, 0, len(bodies)))]
+        message = f"Error: Variable '{node.var}' is not defined."
+        return ast.Try(
+            body=[ast.Assign(targets=[name("_s", True)],
+                             value=ast.Call(func=name(table), args=[name(PREFIX + node.var)], keywords=[]))],
+            handlers=[ast.ExceptHandler(type=name("NameError"), name=None,
+                                        body=[ast.Expr(runtime_call("report", ast.Constant(message)))])],
+            orelse=dispatch,
+            finalbody=[])
+
+    def lower_cases(self, bodies, low, high):
+        if high - low == 1:
+            return bodies[low]
+        middle = (low + high) // 2
+        return [ast.If(test=ast.Compare(left=name("_s"), ops=[ast.Lt()], comparators=[ast.Constant(middle)]),
+                       body=self.lower_cases(bodies, low, middle), orelse=self.lower_cases(bodies, middle, high))]
+
+    def clear(self, memos):
+        # _m0 = _m1 = None
+        return ast.Assign(targets=[name(self.memo(memo), True) for memo in memos], value=ast.Constant(None))
+
+    def memo(self, memo):
+        local = self.memos.get(memo)
+        if local is None:
+            local = self.memos[memo] = f"_m{len(self.memos)}"
+        return local
+
+    def constant(self, value):
+        # Global holding a constant the module cannot, like an array
+        identifier = f"_constant{len(self.globals)}"
+        self.globals[identifier] = value
+        return identifier
+
+    def function(self, symbol, function):
+        # Global for an operator's function, e.g. _length or _index
+        identifier = "_index" if symbol == '[]' else f"_{symbol}"
+        self.globals[identifier] = function
+        return identifier
+
+    def evaluate(self, node, tokens, assignment=False):
+        # _t = <expression>, with undefined names and failed operations giving None
+        program = node.optimized if node.optimized is not None else self.compile_expression(tokens)
+        if assignment:
+            program = stored(program)
+        identifiers = identifiers_read(program, [])
+        self.names.update(identifiers)
+        return ast.Try(
+            body=[ast.Assign(targets=[name("_t", True)], value=self.lower_expression(program))],
+            handlers=[
+                ast.ExceptHandler(type=name("NameError"), name=None, body=[ast.Assign(
+                    targets=[name("_t", True)],
+                    value=runtime_call("undefined", ast.Call(func=name("locals"), args=[], keywords=[]),
+                                       ast.Tuple(elts=[ast.Constant(i) for i in identifiers], ctx=ast.Load())))]),
+                ast.ExceptHandler(type=name("ZeroDivisionError"), name=None, body=[ast.Assign(
+                    targets=[name("_t", True)], value=runtime_call("division_by_zero"))]),
+                ast.ExceptHandler(type=ast.Attribute(value=name("_rt"), attr="ArrayError", ctx=ast.Load()),
+                                  name="_error", body=[ast.Assign(
+                                      targets=[name("_t", True)], value=runtime_call("array_error", name("_error")))]),
+                ast.ExceptHandler(type=ast.Attribute(value=name("_rt"), attr="Failed", ctx=ast.Load()),
+                                  name=None, body=[ast.Assign(targets=[name("_t", True)], value=ast.Constant(None))]),
+            ],
+            orelse=[], finalbody=[])
+
+    def lower_expression(self, program):
+        values = []
+        loaded = []
+        for kind, arg in program:
+            if kind == CONST:
+                values.append(ast.Constant(arg) if type(arg) is not Array else name(self.constant(arg)))
+            elif kind == VAR:
+                values.append(name(PREFIX + arg))
+                loaded.append(name(PREFIX + arg))
+            elif kind == OP:
+                right = values.pop()
+                left = values.pop()
+                symbol = arg[0]
+                if symbol in COMPARISONS:
+                    values.append(ast.Compare(left=left, ops=[COMPARE_NODES[symbol]()], comparators=[right]))
+                elif symbol == '[]':
+                    values.append(ast.Call(func=name(self.function(symbol, index)), args=[left, right], keywords=[]))
+                else:
+                    values.append(ast.BinOp(left=left, op=ARITHMETIC_NODES[symbol](), right=right))
+            elif kind == UNARY:
+                values.append(ast.Call(func=name(self.function(*arg)), args=[values.pop()], keywords=[]))
+            elif kind == MEMO:
+                # (_m0 if _m0 is not None else (_m0 := <subexpression>))
+                local = self.memo(arg)
+                values.append(ast.IfExp(
+                    test=ast.Compare(left=name(local), ops=[ast.IsNot()], comparators=[ast.Constant(None)]),
+                    body=name(local),
+                    orelse=ast.NamedExpr(target=name(local, True), value=self.lower_expression(arg.source))))
+            else:
+                # `loaded` goes in first so undefined variables are reported before the message
+                return runtime_call("fail", ast.Constant(arg), ast.Tuple(elts=loaded, ctx=ast.Load()))
+        return values[0]
+
+
+def identifiers_read(program, identifiers):
+    # Variable names in the order evaluating the program reads them
+    for kind, arg in program:
+        if kind == VAR:
+            identifiers.append(arg)
+        elif kind == MEMO:
+            identifiers_read(arg.source, identifiers)
+    return identifiers
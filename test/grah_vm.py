@@ -0,0 +1,569 @@
+# Bytecode backend: lowers the statement tree from grah_ast into a flat list of
+# (opcode, argument) pairs, links each pair to a closure and runs those. The tree must
+# have been through grah_slots.Resolver: variables are addressed by slot.
+from grah_ast import (Declaration, Display, Print, Assignment, Append, ForLoop, IfStatement,
+                      SwitchStatement, SyntaxErrorStatement, Halt)
+from grah_array import ArrayError, declared, target, append
+from grah_expr import CONST, VAR, OP, MEMO, UNARY, COMPARISONS
+from grah_slots import UNSET
+
+LOAD_CONST = 0
+LOAD_VAR = 1
+STORE_VAR = 2
+BINARY_OP = 3
+COMPARE = 4
+JUMP_IF_FALSE = 5
+JUMP = 6
+SETUP_RANGE = 7
+FOR_RANGE = 8
+PRINT = 9
+DISPLAY = 10
+CAST_INT = 11
+CAST_STR = 12
+CHECK_DECLARED = 13
+SWITCH_VAR = 14
+REPORT = 15
+FAIL = 16
+LOAD_MEMO = 17
+STORE_MEMO = 18
+CLEAR_MEMOS = 19
+RUN_CLOSED = 20
+UNARY_OP = 21
+CAST_ARRAY = 22
+CHECK_ARRAY = 23
+APPEND = 24
+SETUP_EACH = 25
+
+OPNAMES = {
+    LOAD_CONST: "LOAD_CONST", LOAD_VAR: "LOAD_VAR", STORE_VAR: "STORE_VAR", BINARY_OP: "BINARY_OP",
+    COMPARE: "COMPARE", JUMP_IF_FALSE: "JUMP_IF_FALSE", JUMP: "JUMP", SETUP_RANGE: "SETUP_RANGE",
+    FOR_RANGE: "FOR_RANGE", PRINT: "PRINT", DISPLAY: "DISPLAY", CAST_INT: "CAST_INT",
+    CAST_STR: "CAST_STR", CHECK_DECLARED: "CHECK_DECLARED", SWITCH_VAR: "SWITCH_VAR",
+    REPORT: "REPORT", FAIL: "FAIL", LOAD_MEMO: "LOAD_MEMO", STORE_MEMO: "STORE_MEMO",
+    CLEAR_MEMOS: "CLEAR_MEMOS", RUN_CLOSED: "RUN_CLOSED", UNARY_OP: "UNARY_OP", CAST_ARRAY: "CAST_ARRAY",
+    CHECK_ARRAY: "CHECK_ARRAY", APPEND: "APPEND", SETUP_EACH: "SETUP_EACH",
+}
+
+class Compiler:
+    def __init__(self, config):
+        self.config = config
+
+    def compile(self, statements):
+        code = []
+        self.compile_block(statements, code)
+        return code
+
+    def compile_block(self, statements, code):
+        for node in statements:
+            kind = node.__class__
+            if kind is Declaration and node.var_type == self.config["array"]:
+                self.compile_expression(node.program, code)
+                code.append((CAST_ARRAY, (node.name, len(code) + 2)))
+                code.append((STORE_VAR, node.slot))
+            elif kind is Declaration:
+                self.compile_expression(node.program, code)
+                code.append((CAST_INT if node.var_type == self.config["int"] else CAST_STR, None))
+                code.append((STORE_VAR, node.slot))
+            elif kind is Assignment:
+                check = len(code)
+                code.append(None)
+                self.compile_expression(node.program, code)
+                code.append((STORE_VAR, node.slot))
+                message = f"Error: Variable '{node.name}' is used before being declared with '{self.config['declare']}'."
+                code[check] = (CHECK_DECLARED, (node.slot, message, len(code)))
+            elif kind is Append:
+                check = len(code)
+                code.append(None)
+                self.compile_expression(node.program, code)
+                code.append((APPEND, node.slot))
+                code[check] = (CHECK_ARRAY, (node.slot, node.name, len(code)))
+            elif kind is Display:
+                self.compile_expression(node.program, code)
+                code.append((DISPLAY, None))
+            elif kind is Print:
+                self.compile_expression(node.program, code)
+                code.append((PRINT, None))
+            elif kind is ForLoop:
+                closed = len(code)
+                if node.closed is not None:
+                    code.append(None)
+                if node.invariants:
+                    code.append((CLEAR_MEMOS, node.invariants))
+                setup = len(code)
+                code.append((SETUP_RANGE, node.count))
+                top = len(code)
+                code.append(None)
+                if node.common:
+                    code.append((CLEAR_MEMOS, node.common))
+                self.compile_block(node.body, code)
+                code.append((JUMP, top))
+                code[top] = (FOR_RANGE, (node.slot, len(code)))
+                if node.source is not None:
+                    code[setup] = (SETUP_EACH, (node.source_slot, node.source, len(code)))
+                if node.closed is not None:
+                    code[closed] = (RUN_CLOSED, (node.closed, len(code)))
+            elif kind is IfStatement:
+                self.compile_expression(node.program, code)
+                branch = len(code)
+                code.append(None)
+                self.compile_block(node.body, code)
+                skip = len(code)
+                code.append(None)
+                code[branch] = (JUMP_IF_FALSE, len(code))
+                self.compile_block(node.else_body, code)
+                code[skip] = (JUMP, len(code))
+            elif kind is SwitchStatement:
+                self.compile_switch(node, code)
+            elif kind is SyntaxErrorStatement or kind is Halt:
+                code.append((REPORT, node.message))
+        return code
+
+    def compile_switch(self, node, code):
+        # SWITCH_VAR looks the value up in the switch's table and jumps straight
+        # to the case body; the default body comes first, right after it.
+        start = len(code)
+        code.append(None)
+        exits = []
+        targets = []
+        for body in [node.default] + node.bodies:
+            targets.append(len(code))
+            self.compile_block(body, code)
+            exits.append(len(code))
+            code.append(None)
+        end = len(code)
+        for exit in exits:
+            code[exit] = (JUMP, end)
+        code[start] = (SWITCH_VAR, (node.slot, node.var, node.table.lookup, tuple(targets[1:]), targets[0], end))
+
+    def compile_expression(self, program, code, end=None):
+        # Lowers a resolved RPN program. Every failure jumps to `end`, the
+        # instruction right after the expression, with None as the result.
+        if end is None:
+            end = len(code) + code_size(program)
+        for kind, arg in program:
+            if kind == CONST:
+                code.append((LOAD_CONST, arg))
+            elif kind == VAR:
+                code.append((LOAD_VAR, (arg, end)))
+            elif kind == OP:
+                if arg[0] in COMPARISONS:
+                    code.append((COMPARE, arg + (end,)))
+                else:
+                    code.append((BINARY_OP, arg + (end,)))
+            elif kind == UNARY:
+                code.append((UNARY_OP, (arg[1], end)))
+            elif kind == MEMO:
+                # LOAD_MEMO pushes a value already computed and skips computing it
+                load = len(code)
+                code.append(None)
+                self.compile_expression(arg.program, code, end)
+                code.append((STORE_MEMO, arg))
+                code[load] = (LOAD_MEMO, (arg, len(code)))
+            else:
+                code.append((FAIL, (arg, end)))
+
+
+def code_size(program):
+    # Instructions compile_expression emits for a program
+    size = len(program)
+    for kind, arg in program:
+        if kind == MEMO:
+            size += 1 + code_size(arg.program)
+    return size
+
+
+class Machine:
+    # What the instructions of one run share
+    def __init__(self, interpreter):
+        self.interpreter = interpreter
+        self.variables = interpreter.variables.values
+        self.names = interpreter.variables.names
+        self.write = interpreter.output.write
+        self.stack = []
+        self.loops = []  # iterators of the loops being run, innermost last
+
+
+class VM:
+    # Runs compiled code threaded through closures: before a run every
+    # instruction becomes a function with its operands already unpacked that
+    # does its work and returns the index of the next instruction, so the
+    # loop itself is one call per instruction instead of a chain of opcode
+    # tests
+    def __init__(self, interpreter):
+        self.interpreter = interpreter
+
+    def run(self, code):
+        steps = link(code, Machine(self.interpreter))
+        pc = 0
+        end = len(steps)
+        while pc < end:
+            pc = steps[pc]()
+
+
+def link(code, machine):
+    return [LINKERS[op](machine, arg, pc + 1) for pc, (op, arg) in enumerate(code)]
+
+
+def failure(machine):
+    # Ends an expression that reported its error: it yields None
+    stack = machine.stack
+
+    def fail(target):
+        stack.clear()
+        stack.append(None)
+        return target
+    return fail
+
+
+def link_load_const(machine, value, following):
+    push = machine.stack.append
+
+    def load_const():
+        push(value)
+        return following
+    return load_const
+
+
+def link_load_var(machine, arg, following):
+    slot, target = arg
+    variables = machine.variables
+    push = machine.stack.append
+    write = machine.write
+    fail = failure(machine)
+    message = f"Error: Variable '{machine.names[slot]}' is not defined.\n"
+
+    def load_var():
+        value = variables[slot]
+        if value is not UNSET:
+            push(value)
+            return following
+        write(message)
+        return fail(target)
+    return load_var
+
+
+def link_store_var(machine, slot, following):
+    variables = machine.variables
+    pop = machine.stack.pop
+
+    def store_var():
+        variables[slot] = pop()
+        return following
+    return store_var
+
+
+def link_binary_op(machine, arg, following):
+    _, function, target = arg
+    stack = machine.stack
+    pop = stack.pop
+    write = machine.write
+    fail = failure(machine)
+
+    def binary_op():
+        right = pop()
+        try:
+            stack[-1] = function(stack[-1], right)
+        except ZeroDivisionError:
+            write("Error: Division by zero.\n")
+            write("Error: Invalid expression.\n")
+            return fail(target)
+        except ArrayError as e:
+            write(f"{e}\n")
+            return fail(target)
+        return following
+    return binary_op
+
+
+def link_compare(machine, arg, following):
+    _, function, target = arg
+    stack = machine.stack
+    pop = stack.pop
+    write = machine.write
+    fail = failure(machine)
+
+    def compare():
+        right = pop()
+        try:
+            stack[-1] = function(stack[-1], right)
+        except ArrayError as e:
+            write(f"{e}\n")
+            return fail(target)
+        return following
+    return compare
+
+
+def link_jump(machine, target, following):
+    def jump():
+        return target
+    return jump
+
+
+def link_jump_if_false(machine, target, following):
+    pop = machine.stack.pop
+
+    def jump_if_false():
+        if pop():
+            return following
+        return target
+    return jump_if_false
+
+
+def link_setup_range(machine, count, following):
+    push = machine.loops.append
+
+    def setup_range():
+        push(iter(range(count)))
+        return following
+    return setup_range
+
+
+def link_for_range(machine, arg, following):
+    slot, target = arg
+    variables = machine.variables
+    loops = machine.loops
+
+    def for_range():
+        j = next(loops[-1], None)
+        if j is None:
+            loops.pop()
+            return target
+        variables[slot] = j
+        return following
+    return for_range
+
+
+def link_check_array(machine, arg, following, each=False):
+    # CHECK_ARRAY and SETUP_EACH skip their statement unless the variable holds an array
+    slot, name, skip = arg
+    variables = machine.variables
+    write = machine.write
+    loops = machine.loops
+    message = f"Error: Variable '{name}' is not defined.\n"
+
+    def check_array():
+        value = variables[slot] if slot is not None else UNSET
+        if value is UNSET:
+            write(message)
+            return skip
+        try:
+            target(value, name)
+        except ArrayError as e:
+            write(f"{e}\n")
+            return skip
+        if each:
+            loops.append(iter(value.copy()))
+        return following
+    return check_array
+
+
+def link_setup_each(machine, arg, following):
+    return link_check_array(machine, arg, following, each=True)
+
+
+def link_append(machine, slot, following):
+    variables = machine.variables
+    pop = machine.stack.pop
+    write = machine.write
+
+    def append_value():
+        value = pop()
+        if value is not None:
+            try:
+                append(variables[slot], value)
+            except ArrayError as e:
+                write(f"{e}\n")
+        return following
+    return append_value
+
+
+def link_display(machine, arg, following):
+    interpreter = machine.interpreter
+    pop = machine.stack.pop
+    write = machine.write
+
+    def display():
+        value = pop()
+        if value is not None:
+            if not interpreter.last_print_was_newline:
+                write("\n")
+            write(f"{value}\n")
+        interpreter.last_print_was_newline = True
+        return following
+    return display
+
+
+def link_print(machine, arg, following):
+    interpreter = machine.interpreter
+    pop = machine.stack.pop
+    write = machine.write
+
+    def print_value():
+        value = pop()
+        if value is not None:
+            write(str(value))
+        interpreter.last_print_was_newline = False
+        return following
+    return print_value
+
+
+def link_cast_int(machine, arg, following):
+    stack = machine.stack
+
+    def cast_int():
+        stack[-1] = int(stack[-1])
+        return following
+    return cast_int
+
+
+def link_cast_str(machine, arg, following):
+    stack = machine.stack
+
+    def cast_str():
+        stack[-1] = str(stack[-1].strip('"'))
+        return following
+    return cast_str
+
+
+def link_check_declared(machine, arg, following):
+    slot, message, skip = arg
+    variables = machine.variables
+    write = machine.write
+    message += "\n"
+
+    def check_declared():
+        if slot is None or variables[slot] is UNSET:
+            write(message)
+            return skip
+        return following
+    return check_declared
+
+
+def link_switch_var(machine, arg, following):
+    slot, name, lookup, targets, default, skip = arg
+    variables = machine.variables
+    write = machine.write
+    message = f"Error: Variable '{name}' is not defined.\n"
+
+    def switch_var():
+        if slot is not None and variables[slot] is not UNSET:
+            index = lookup(variables[slot])
+            return targets[index] if index is not None else default
+        write(message)
+        return skip
+    return switch_var
+
+
+def link_fail(machine, arg, following):
+    message, target = arg
+    write = machine.write
+    fail = failure(machine)
+    message += "\n"
+
+    def report_failure():
+        write(message)
+        return fail(target)
+    return report_failure
+
+
+def link_report(machine, message, following):
+    write = machine.write
+    message += "\n"
+
+    def report():
+        write(message)
+        return following
+    return report
+
+
+def link_load_memo(machine, arg, following):
+    memo, skip = arg
+    push = machine.stack.append
+
+    def load_memo():
+        if memo.value is not None:
+            push(memo.value)
+            return skip
+        return following
+    return load_memo
+
+
+def link_store_memo(machine, memo, following):
+    stack = machine.stack
+
+    def store_memo():
+        memo.value = stack[-1]
+        return following
+    return store_memo
+
+
+def link_clear_memos(machine, memos, following):
+    def clear_memos():
+        for memo in memos:
+            memo.value = None
+        return following
+    return clear_memos
+
+
+def link_run_closed(machine, arg, following):
+    closed, skip = arg
+    variables = machine.variables
+
+    def run_closed():
+        if closed.run(variables):
+            return skip
+        return following
+    return run_closed
+
+
+def link_unary_op(machine, arg, following):
+    function, target = arg
+    stack = machine.stack
+    write = machine.write
+    fail = failure(machine)
+
+    def unary_op():
+        try:
+            stack[-1] = function(stack[-1])
+        except ArrayError as e:
+            write(f"{e}\n")
+            return fail(target)
+        return following
+    return unary_op
+
+
+def link_cast_array(machine, arg, following):
+    name, skip = arg
+    stack = machine.stack
+    pop = stack.pop
+    write = machine.write
+
+    def cast_array():
+        value = pop()
+        if value is not None:
+            try:
+                stack.append(declared(value, name))
+                return following
+            except ArrayError as e:
+                write(f"{e}\n")
+        return skip
+    return cast_array
+
+
+LINKERS = {
+    LOAD_CONST: link_load_const, LOAD_VAR: link_load_var, STORE_VAR: link_store_var,
+    BINARY_OP: link_binary_op, COMPARE: link_compare, JUMP_IF_FALSE: link_jump_if_false,
+    JUMP: link_jump, SETUP_RANGE: link_setup_range, FOR_RANGE: link_for_range, PRINT: link_print,
+    DISPLAY: link_display, CAST_INT: link_cast_int, CAST_STR: link_cast_str,
+    CHECK_DECLARED: link_check_declared, SWITCH_VAR: link_switch_var, REPORT: link_report,
+    FAIL: link_fail, LOAD_MEMO: link_load_memo, STORE_MEMO: link_store_memo,
+    CLEAR_MEMOS: link_clear_memos, RUN_CLOSED: link_run_closed, UNARY_OP: link_unary_op,
+    CAST_ARRAY: link_cast_array, CHECK_ARRAY: link_check_array, APPEND: link_append,
+    SETUP_EACH: link_setup_each,
+}
+
+
+def disassemble(code):
+    lines = []
+    for index, (op, arg) in enumerate(code):
+        lines.append(f"{index:5} {OPNAMES[op]:<15} {'' if arg is None else arg!r}")
+    return "\n".join(lines)
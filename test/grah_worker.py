@@ -0,0 +1,96 @@
+# Runs a GRAH program in a separate process so the IDE stays responsive. The
+# child reports over a multiprocessing queue:
+#   ("output", text)        program output, in order, while it runs
+#   ("error", message)      the interpreter raised; message is for the user
+#   ("syntax_error", text)  the interpreter raised SyntaxError
+#   ("done", None)          always last, unless the process was killed
+# Each run gets a fresh process and so a fresh interpreter: nothing leaks from
+# one run into the next, and a hung program can be killed without touching
+# the editor.
+import multiprocessing
+import threading
+import time
+
+FLUSH_INTERVAL = 0.05  # seconds output may sit in the child before being sent
+
+
+def run_program(config, code, queue, backend="ast"):
+    # Process entry point
+    from Interpreter import Interpreter
+    from grah_output import QueueSink
+
+    sink = QueueSink(queue)
+    stop = threading.Event()
+
+    def flush_periodically():
+        while not stop.wait(FLUSH_INTERVAL):
+            sink.flush()
+
+    flusher = threading.Thread(target=flush_periodically, daemon=True)
+    flusher.start()
+    try:
+        Interpreter(config, backend=backend, output=sink).interpret(code)
+    except SyntaxError as e:
+        sink.flush()
+        queue.put(("syntax_error", str(e)))
+    except Exception as e:
+        sink.flush()
+        queue.put(("error", f"Error: {e}"))
+    finally:
+        stop.set()
+        flusher.join()
+        sink.flush()
+        queue.put(("done", None))
+
+
+class Run:
+    # One program running in a child process. The caller polls it (e.g. from
+    # Tk's after()) and never blocks on it.
+    def __init__(self, config, code, backend="ast", timeout=None):
+        context = multiprocessing.get_context("spawn")  # no Tk state copied into the child
+        self.queue = context.Queue()
+        self.process = context.Process(target=run_program, args=(config, code, self.queue, backend), daemon=True)
+        self.timeout = timeout  # seconds, or None for no limit
+        self.started = time.monotonic()
+        self.finished = False
+        self.process.start()
+
+    def poll(self, limit=200):
+        # Returns up to `limit` pending messages. Ends the run itself when the
+        # child has finished, died or gone past the timeout.
+        messages = []
+        while len(messages) < limit:
+            try:
+                message = self.queue.get_nowait()
+            except Exception:  # queue.Empty, or a queue broken by a killed child
+                break
+            messages.append(message)
+            if message[0] == "done":
+                self.finish()
+                return messages
+        if self.finished:
+            return messages
+        if self.timeout is not None and time.monotonic() - self.started > self.timeout:
+            self.stop()
+            messages.append(("error", f"Error: Program stopped after {self.timeout:g} seconds."))
+            messages.append(("done", None))
+        elif not self.process.is_alive() and not messages:
+            # Exited without saying goodbye, e.g. killed from outside
+            self.finish()
+            messages.append(("error", f"Error: Program exited with code {self.process.exitcode}."))
+            messages.append(("done", None))
+        return messages
+
+    def stop(self):
+        if not self.finished:
+            self.process.terminate()
+            self.process.join(1)
+            if self.process.is_alive():
+                self.process.kill()
+                self.process.join()
+            self.finish()
+
+    def finish(self):
+        self.finished = True
+        self.process.join(1)
+        self.queue.close()
@@ -1,24 +1,34 @@
 import tkinter as tk
 from tkinter import scrolledtext, Toplevel
 from tkinter import ttk
-from PIL import Image, ImageTk
-from interpreter import Interpreter
+from grah_worker import Run
+from grah_lexer import Lexer, KEYWORD, INT, STRING
+import os
 import re
 
 class TextLineNumbers(tk.Canvas):
     def __init__(self, *args, **kwargs):
         tk.Canvas.__init__(self, *args, **kwargs)
         self.textwidget = None
+        self.visible = None  # (first line index, its y, last line index) at the last redraw
 
     def attach(self, text_widget):
         self.textwidget = text_widget
 
-    def redraw(self, *args):
+    def redraw(self, *args, force=False):
         if not self.textwidget:
             return
+        # Only redraw when the visible lines moved
+        top = self.textwidget.index("@0,0")
+        dline = self.textwidget.dlineinfo(top)
+        visible = (top, dline[1] if dline else None,
+                   self.textwidget.index(f"@0,{self.textwidget.winfo_height()}"))
+        if visible == self.visible and not force:
+            return
+        self.visible = visible
         self.delete("all")
 
-        i = self.textwidget.index("@0,0")
+        i = top
         while True:
             dline = self.textwidget.dlineinfo(i)
             if dline is None: break
@@ -28,16 +38,29 @@ class TextLineNumbers(tk.Canvas):
             i = self.textwidget.index("%s+1line" % i)
 
 class CustomText(scrolledtext.ScrolledText):
-    def __init__(self, *args, **kwargs):
+    HIGHLIGHT_DELAY = 150  # ms without edits before the changed lines are re-highlighted
+    TOKEN_TAGS = {KEYWORD: "keyword", INT: "integer", STRING: "string"}
+
+    def __init__(self, *args, lexer=None, **kwargs):
         scrolledtext.ScrolledText.__init__(self, *args, **kwargs)
 
         self.linenumbers = None
+        self.lexer = lexer  # the interpreter's lexer, so the active dialect's keywords are highlighted
+        self.dirty = None  # [first, last] lines edited since the last highlight
+        self.highlight_job = None
+
+        # Route the widget's Tcl command through _proxy to see every edit, whether
+        # it comes from typing, pasting, undo or code
+        self._orig = self._w + "_orig"
+        self.tk.call("rename", self._w, self._orig)
+        self.tk.createcommand(self._w, self._proxy)
+
         self.bind("<<Change>>", self._on_change)
         self.bind("<Configure>", self._on_change)
-        self.bind("<KeyRelease>", self._on_key_release)
         self.bind("<Return>", self._handle_return)
 
 
+        self.tag_configure("keyword", foreground="blue")
         self.tag_configure("integer", foreground="red")
         self.tag_configure("string", foreground="yellow")
         self.tag_configure("error", background="lightcoral")
@@ -46,33 +69,74 @@ class CustomText(scrolledtext.ScrolledText):
         self.linenumbers = linenumbers
         self.linenumbers.attach(self)
 
+    def _proxy(self, command, *args):
+        if command == "insert" and args:
+            line = self.line_of(args[0])
+            result = self.tk.call((self._orig, command) + args)
+            added = sum(text.count("\n") for text in args[1::2])
+            self.mark_dirty(line, line + added, added)
+        elif command in ("delete", "replace") and args:
+            first = self.line_of(args[0])
+            last = self.line_of(args[1]) if len(args) > 1 else first
+            result = self.tk.call((self._orig, command) + args)
+            added = sum(text.count("\n") for text in args[2::2])
+            self.mark_dirty(first, first + added, added - (last - first))
+        else:
+            result = self.tk.call((self._orig, command) + args)
+            if command not in ("xview", "yview"):
+                return result
+        self.event_generate("<<Change>>", when="tail")
+        return result
+
+    def line_of(self, index):
+        return int(self.tk.call(self._orig, "index", index).split(".")[0])
+
+    def mark_dirty(self, first, last, shift):
+        # Grows the pending range to cover lines first..last; `shift` is the
+        # number of lines the edit added (negative when it removed some)
+        if self.dirty is None:
+            self.dirty = [first, last]
+        else:
+            low, high = self.dirty
+            if high > first:
+                high = max(first, high + shift)
+            self.dirty = [min(low, first), max(high, last)]
+        if self.highlight_job is not None:
+            self.after_cancel(self.highlight_job)
+        self.highlight_job = self.after(self.HIGHLIGHT_DELAY, self.highlight_dirty)
+
     def _on_change(self, event):
         if self.linenumbers:
             self.linenumbers.redraw()
-        self.highlight_syntax()
 
-    def _on_key_release(self, event):
-        self.event_generate("<<Change>>", when="tail")
+    def highlight_dirty(self):
+        self.highlight_job = None
+        if self.dirty is None:
+            return
+        first, last = self.dirty
+        self.dirty = None
+        self.highlight_lines(first, min(last, self.line_of("end-1c")))
 
     def highlight_syntax(self):
-        self.remove_tags()
-        code = self.get("1.0", tk.END)
-
-        # Highlight integers
-        for match in re.finditer(r'\b\d+\b', code):
-            start, end = match.span()
-            start_index = self.index(f"1.0 + {start}c")
-            end_index = self.index(f"1.0 + {end}c")
-            self.tag_add("integer", start_index, end_index)
-
-        # Highlight strings
-        for match in re.finditer(r'".*?"', code):
-            start, end = match.span()
-            start_index = self.index(f"1.0 + {start}c")
-            end_index = self.index(f"1.0 + {end}c")
-            self.tag_add("string", start_index, end_index)
-            
+        # Re-highlights the whole buffer at once
+        self.dirty = None
+        self.highlight_lines(1, self.line_of("end-1c"))
+
+    def highlight_lines(self, first, last):
+        start, end = f"{first}.0", f"{last}.end"
+        self.tag_remove("keyword", start, end)
+        self.tag_remove("integer", start, end)
+        self.tag_remove("string", start, end)
+        self.tag_remove("error", "1.0", tk.END)
+        if self.lexer is None:
+            return
+        for kind, text, line, column in self.lexer.scan(self.get(start, end), first):
+            tag = self.TOKEN_TAGS.get(kind)
+            if tag is not None:
+                self.tag_add(tag, f"{line}.{column - 1}", f"{line}.{column - 1 + len(text)}")
+
     def remove_tags(self):
+        self.tag_remove("keyword", "1.0", tk.END)
         self.tag_remove("integer", "1.0", tk.END)
         self.tag_remove("string", "1.0", tk.END)
         self.tag_remove("error", "1.0", tk.END)
@@ -96,13 +160,17 @@ class CustomText(scrolledtext.ScrolledText):
 
 
 class IDE:
-    def __init__(self, root, config):
+    POLL_INTERVAL = 50  # ms between checks on a running program
+
+    def __init__(self, root, config, timeout=30.0):
         self.root = root
         self.config = config
-        self.interpreter = Interpreter(config)
+        self.timeout = timeout  # seconds a run may take before it is stopped; None for no limit
+        self.run = None  # the program running in a worker process, if any
         self.root.title("Custom Programming Language IDE")
         self.create_widgets()
         self.dark_mode = False
+        self.root.protocol("WM_DELETE_WINDOW", self.close)
 
     def create_widgets(self):
         style = ttk.Style()
@@ -119,11 +187,10 @@ class IDE:
 
         self.logo_frame = ttk.Frame(main_frame)
         self.logo_frame.grid(row=0, column=0, sticky="w", pady=30, padx=10)
-        self.logo_image = Image.open("path_to_logo.png")  # Change the path to your logo image
-        self.logo_image = self.logo_image.resize((100, 100), Image.LANCZOS)
-        self.logo_photo = ImageTk.PhotoImage(self.logo_image)
-        self.logo_label = ttk.Label(self.logo_frame, image=self.logo_photo)
-        self.logo_label.pack()
+        self.logo_photo = self.load_logo("path_to_logo.png", 100)  # Change the path to your logo image
+        if self.logo_photo is not None:
+            self.logo_label = ttk.Label(self.logo_frame, image=self.logo_photo)
+            self.logo_label.pack()
 
         self.editor_frame = ttk.Frame(main_frame)
         self.editor_frame.grid(row=1, column=0, sticky="nsew")
@@ -131,7 +198,8 @@ class IDE:
         self.linenumbers = TextLineNumbers(self.editor_frame, width=30, background='#f0f0f0')
         self.linenumbers.grid(row=0, column=0, sticky="ns")
 
-        self.editor = CustomText(self.editor_frame, width=80, height=20, font=("Consolas", 12, "bold"))
+        self.editor = CustomText(self.editor_frame, width=80, height=20, font=("Consolas", 12, "bold"),
+                                 lexer=Lexer(self.config))
         self.editor.grid(row=0, column=1, sticky="nsew")
         self.editor.attach(self.linenumbers)
 
@@ -141,11 +209,14 @@ class IDE:
         self.run_button = ttk.Button(button_frame, text="Run", command=self.run_code)
         self.run_button.grid(row=0, column=0, padx=(0, 5))
 
+        self.stop_button = ttk.Button(button_frame, text="Stop", command=self.stop_code, state='disabled')
+        self.stop_button.grid(row=0, column=1, padx=(0, 5))
+
         self.doc_button = ttk.Button(button_frame, text="Documentation", command=self.show_documentation)
-        self.doc_button.grid(row=0, column=1, padx=(0, 5))
+        self.doc_button.grid(row=0, column=2, padx=(0, 5))
 
         self.dark_mode_button = ttk.Button(button_frame, text="Toggle Dark Mode", command=self.toggle_dark_mode)
-        self.dark_mode_button.grid(row=0, column=2)
+        self.dark_mode_button.grid(row=0, column=3)
 
         self.output_frame = ttk.Frame(main_frame)
         self.output_frame.grid(row=3, column=0, sticky="nsew")
@@ -156,6 +227,42 @@ class IDE:
         main_frame.rowconfigure(1, weight=1)
         main_frame.columnconfigure(0, weight=1)
 
+    def load_logo(self, path, size):
+        # The scaled logo is kept in __grahcache__ next to the original, so later
+        # launches load a small PNG with Tk alone instead of resizing with PIL
+        stem = os.path.splitext(os.path.basename(path))[0]
+        cached = os.path.join(os.path.dirname(os.path.abspath(path)), "__grahcache__", f"{stem}-{size}.png")
+        try:
+            if os.path.getmtime(cached) >= os.path.getmtime(path):
+                return tk.PhotoImage(file=cached)
+        except (OSError, tk.TclError):
+            pass
+
+        try:
+            from PIL import Image, ImageTk
+        except ImportError:
+            Image = None
+        try:
+            if Image is not None:
+                image = Image.open(path).resize((size, size), Image.LANCZOS)
+                try:
+                    os.makedirs(os.path.dirname(cached), exist_ok=True)
+                    image.save(cached)
+                except OSError:
+                    pass
+                return ImageTk.PhotoImage(image)
+            # Without PIL, shrink by a whole factor with Tk itself
+            photo = tk.PhotoImage(file=path)
+            photo = photo.subsample(max(1, photo.width() // size), max(1, photo.height() // size))
+            try:
+                os.makedirs(os.path.dirname(cached), exist_ok=True)
+                photo.write(cached, format="png")
+            except (OSError, tk.TclError):
+                pass
+            return photo
+        except (OSError, tk.TclError):
+            return None  # No logo rather than no IDE
+
     def toggle_dark_mode(self):
         self.dark_mode = not self.dark_mode
         bg_color = '#2e2e2e' if self.dark_mode else '#f0f0f0'
@@ -169,30 +276,58 @@ class IDE:
         self.output_frame.configure(background=bg_color)
 
     def run_code(self):
+        # Starts the program in a worker process; poll_run streams its output in
+        if self.run is not None:
+            return
         code = self.editor.get("1.0", tk.END)
         self.output.config(state='normal')
         self.output.delete("1.0", tk.END)
+        self.output.config(state='disabled')
         self.editor.remove_tags()
 
-        import sys
-        from io import StringIO
-        old_stdout = sys.stdout
-        sys.stdout = mystdout = StringIO()
-
-        try:
-            self.interpreter.interpret(code)
-            output = mystdout.getvalue()
-            self.output.insert(tk.END, output)
-        except SyntaxError as e:
-            line_num = self.extract_line_number(str(e))
-            self.editor.highlight_error(line_num)
-            self.output.insert(tk.END, f"Syntax Error: {e}\n")
-        except Exception as e:
-            self.output.insert(tk.END, f"Error: {e}\n")
-        finally:
-            sys.stdout = old_stdout
+        self.run = Run(self.config, code, timeout=self.timeout)
+        self.run_button.config(state='disabled')
+        self.stop_button.config(state='normal')
+        self.root.after(self.POLL_INTERVAL, self.poll_run)
 
+    def poll_run(self):
+        if self.run is None:
+            return
+        self.output.config(state='normal')
+        for kind, text in self.run.poll():
+            if kind == "output":
+                self.output.insert(tk.END, text)
+            elif kind == "syntax_error":
+                line_num = self.extract_line_number(text)
+                self.editor.highlight_error(line_num)
+                self.output.insert(tk.END, f"Syntax Error: {text}\n")
+            elif kind == "error":
+                self.output.insert(tk.END, f"{text}\n")
+            elif kind == "done":
+                self.run = None
+        self.output.see(tk.END)
         self.output.config(state='disabled')
+        if self.run is not None:
+            self.root.after(self.POLL_INTERVAL, self.poll_run)
+        else:
+            self.run_button.config(state='normal')
+            self.stop_button.config(state='disabled')
+
+    def stop_code(self):
+        if self.run is not None:
+            self.run.stop()
+            self.run = None
+            self.output.config(state='normal')
+            self.output.insert(tk.END, "\nProgram stopped.\n")
+            self.output.see(tk.END)
+            self.output.config(state='disabled')
+            self.run_button.config(state='normal')
+            self.stop_button.config(state='disabled')
+
+    def close(self):
+        if self.run is not None:
+            self.run.stop()
+        self.root.destroy()
 
     def extract_line_number(self, error_message):
         match = re.search(r'line (\d+)', error_message)
@@ -213,7 +348,8 @@ class IDE:
             "Custom Programming Language Documentation\n\n"
             "Variable Declarations:\n"
             f"  {self.config['declare'][0]} {self.config['int']} <variable_name> = <integer>.\n"
-            f"  {self.config['declare'][0]} {self.config['string']} <variable_name> = <string>.\n\n"
+            f"  {self.config['declare'][0]} {self.config['string']} <variable_name> = <string>.\n"
+            f"  {self.config['declare'][0]} {self.config['array']} <variable_name> = [<integer>, <integer>, ...].\n\n"
             "Display Statements:\n"
             f"  {self.config['display'][0]} <expression>.\n\n"
             "For Loops:\n"
@@ -225,28 +361,38 @@ class IDE:
             "    <statements>\n"
             f"  {self.config['else']}:\n"
             "    <statements>\n"
-            f"  {self.config['for']}.\n"
+            f"  {self.config['for']}.\n\n"
+            "Arrays:\n"
+            f"  {self.config['append']} <array> <expression>.\n"
+            f"  <array> [ <index> ]    {self.config['length']} <array>\n"
+            "  <array> + <array>, <array> * <integer> (element by element)\n"
+            f"  {self.config['for']} <variable> in <array> {{\n"
+            "    <statements>\n"
+            "  }\n"
         )
 
 # CONFIG OF SYNTAXES
 
-def main():
-    config = {
-        "declare": ["grah", "hero", "eulen"],   # Change this keyword to anything you want for variable declaration
-        "display": ["display-", "println"],       # Change this keyword to anything you want for display
-        "int": "int",                  # Change this keyword to anything you want for integer type
-        "string": "string",            # Change this keyword to anything you want for string type
-        "for": "for",                  # Change this keyword to anything you want for 'for' loop
-        "print": "print",  
-        "if"  : "if",
-        "else" : "else",
-        "switch": "switch",    # Add this keyword for 'switch' statement
-        "case": "case",        # Add this keyword for 'case' statement
-        "default": "default",  # Add this keyword for 'default' case
-    }
-
+IDE_CONFIG = {
+    "declare": ["grah", "hero", "eulen"],   # Change this keyword to anything you want for variable declaration
+    "display": ["display-", "println"],       # Change this keyword to anything you want for display
+    "int": "int",                  # Change this keyword to anything you want for integer type
+    "string": "string",            # Change this keyword to anything you want for string type
+    "for": "for",                  # Change this keyword to anything you want for 'for' loop
+    "print": "print",  
+    "if"  : "if",
+    "else" : "else",
+    "switch": "switch",    # Add this keyword for 'switch' statement
+    "case": "case",        # Add this keyword for 'case' statement
+    "default": "default",  # Add this keyword for 'default' case
+    "array": "array",      # Change this keyword to anything you want for the array type
+    "append": "append",    # Change this keyword to anything you want for appending to an array
+    "length": "length",    # Change this keyword to anything you want for an array's length
+}
+
+def main(config=None):
     root = tk.Tk()
-    ide = IDE(root, config)
+    ide = IDE(root, config or IDE_CONFIG)
     root.mainloop()
 
 if __name__ == "__main__":
@@ -0,0 +1,78 @@
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+
+import grah_cli
+from Interpreter import DEFAULT_CONFIG
+from grah_batch import find_programs, run_batch
+
+
+class BatchTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.root = self.directory.name
+        self.write("a.GRAH", "grah int x = 3.\ndisplay- x * 2.\n")
+        self.write("sub/b.grah", "display- x.\n")  # x must not survive from a.GRAH
+        self.write("sub/deeper/c.GRAH", 'display- "c".\ndisplay- 1 + "a".\n')
+        self.write("notes.txt", "display- 1.\n")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write(self, name, text):
+        path = os.path.join(self.root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as file:
+            file.write(text)
+        return path
+
+    def path(self, name):
+        return os.path.join(self.root, name)
+
+    def test_find_programs(self):
+        everything = [self.path("a.GRAH"), self.path("sub/b.grah"), self.path("sub/deeper/c.GRAH")]
+        self.assertEqual(find_programs([self.root]), everything)
+        self.assertEqual(find_programs([os.path.join(self.root, "**", "*.GRAH")]),
+                         [self.path("a.GRAH"), self.path("sub/deeper/c.GRAH")])
+        self.assertEqual(find_programs([self.path("a.GRAH"), self.root, self.path("missing.GRAH")]),
+                         everything + [self.path("missing.GRAH")])
+
+    def test_run_batch(self):
+        paths = find_programs([self.root]) + [self.path("missing.GRAH")]
+        results = list(run_batch(paths, DEFAULT_CONFIG, workers=2))
+        self.assertEqual([result.path for result in results], paths)
+        self.assertEqual([result.status for result in results], ["ok", "ok", "failed", "unreadable"])
+        self.assertEqual([result.output for result in results],
+                         ["6\n", "Error: Variable 'x' is not defined.\n", "c\n", ""])
+        self.assertTrue(results[2].error.startswith("TypeError: "))
+
+    def test_command(self):
+        output = os.path.join(self.root, "out")
+        report = os.path.join(self.root, "report.json")
+        stderr = io.StringIO()
+        with contextlib.redirect_stderr(stderr):
+            status = grah_cli.main(["batch", self.root, "--workers", "1", "--output-dir", output,
+                                    "--report", report])
+        self.assertEqual(status, 1)
+        with open(os.path.join(output, "sub", "b.grah.out")) as file:
+            self.assertEqual(file.read(), "Error: Variable 'x' is not defined.\n")
+        with open(report) as file:
+            records = json.load(file)
+        self.assertEqual([record["status"] for record in records["programs"]], ["ok", "ok", "failed"])
+        self.assertEqual({key: records["totals"][key] for key in ("ok", "failed", "unreadable")},
+                         {"ok": 2, "failed": 1, "unreadable": 0})
+        self.assertIn("3 programs: 2 ok, 1 failed in ", stderr.getvalue())
+
+    def test_nothing_to_run(self):
+        stderr = io.StringIO()
+        with contextlib.redirect_stderr(stderr):
+            self.assertEqual(grah_cli.main(["batch", os.path.join(self.root, "*.none")]), 1)
+        self.assertEqual(stderr.getvalue(), "Error: No programs found.\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+import unittest
+
+import grah_bench
+from Interpreter import Interpreter, DEFAULT_CONFIG
+from grah_output import CollectorSink
+
+
+def result(ops_per_sec, peak_bytes):
+    return {"ops_per_sec": ops_per_sec, "peak_bytes": peak_bytes}
+
+
+class CompareTest(unittest.TestCase):
+
+    def test_within_threshold(self):
+        baseline = {"a/ast": result(1000, 100)}
+        self.assertEqual(grah_bench.compare({"a/ast": result(800, 124)}, baseline, 0.25), [])
+
+    def test_slower_and_bigger(self):
+        baseline = {"a/ast": result(1000, 100)}
+        regressions = grah_bench.compare({"a/ast": result(700, 200)}, baseline, 0.25)
+        self.assertEqual(regressions, ["a/ast: 700 ops/s, baseline 1,000 ops/s",
+                                       "a/ast: peak 200 bytes, baseline 100 bytes"])
+
+    def test_runs_missing_from_the_baseline_are_ignored(self):
+        self.assertEqual(grah_bench.compare({"b/vm": result(1, 1)}, {"a/ast": result(1000, 100)}, 0.25), [])
+
+
+class WorkloadTest(unittest.TestCase):
+
+    def test_workloads_agree_on_every_backend(self):
+        for name in grah_bench.WORKLOADS:
+            source, ops = grah_bench.generate(name, 0.01)
+            self.assertGreater(ops, 0)
+            outputs = set()
+            for backend in grah_bench.BACKENDS:
+                for mode in grah_bench.MODES.values():
+                    sink = CollectorSink()
+                    Interpreter(DEFAULT_CONFIG, backend=backend, output=sink, **mode).interpret(source)
+                    outputs.add(sink.getvalue())
+            with self.subTest(workload=name):
+                self.assertEqual(len(outputs), 1)
+                self.assertNotIn("Error", outputs.pop())
+
+    def test_branchy_loop_has_no_closed_form(self):
+        source, _ = grah_bench.generate("branchy_loop", 0.01)
+        interpreter = Interpreter(DEFAULT_CONFIG)
+        loop = interpreter.optimizer.optimize(interpreter.parser.parse(source))[2]
+        self.assertIsNone(loop.closed)
+
+    def test_modes_for(self):
+        modes = list(grah_bench.MODES)
+        self.assertEqual(grah_bench.modes_for("ast", modes), modes)
+        self.assertEqual(grah_bench.modes_for("vm", modes), ["opt", "plain"])
+        self.assertEqual(grah_bench.modes_for("python", ["tier"]), ["plain"])
+
+    def test_run_suite(self):
+        results = grah_bench.run_suite(["string_building"], ["ast", "vm"], scale=0.01, repeat=1)
+        self.assertEqual(sorted(results), [
+            "string_building/ast/opt", "string_building/ast/opt+tier", "string_building/ast/plain",
+            "string_building/ast/tier", "string_building/vm/opt", "string_building/vm/plain",
+        ])
+        for entry in results.values():
+            self.assertEqual(entry["ops"], 3 + 50)
+            self.assertGreater(entry["ops_per_sec"], 0)
+            self.assertGreater(entry["peak_bytes"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+import os
+import tempfile
+import unittest
+
+from Interpreter import Interpreter
+from grah_cache import ProgramCache
+from grah_output import CollectorSink
+
+CONFIG = {
+    "declare": ["grah", "hero"], "display": ["display-"], "int": "int", "string": "string",
+    "for": "for", "if": "if", "else": "else", "print": "print",
+    "switch": "switch", "case": "case", "default": "default",
+}
+
+# Long enough for the command line's cache threshold
+PROGRAM = "grah int x = 0.\n" + "x = x + 1.\n" * 2000 + "for i in range 3 {\n    display- x + i.\n}\n"
+EXPECTED = "2000\n2001\n2002\n"
+
+
+def shape(statements):
+    return [(node.__class__.__name__, node.line) for node in statements]
+
+
+class ProgramCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "prog.GRAH")
+        self.module = os.path.join(self.directory.name, "frontend.py")
+        with open(self.module, 'w') as file:
+            file.write("# front end\n")
+        self.statements = Interpreter(CONFIG).parser.parse(PROGRAM)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def cache(self, config=CONFIG, directory=None):
+        return ProgramCache(config, directory, (self.module,))
+
+    def test_round_trip(self):
+        self.cache().store(self.path, PROGRAM, self.statements)
+        self.assertTrue(os.path.exists(os.path.join(self.directory.name, "__grahcache__", "prog.grahc")))
+        self.assertEqual(shape(self.cache().load(self.path, PROGRAM)), shape(self.statements))
+
+    def test_stale_entries_are_ignored(self):
+        self.cache().store(self.path, PROGRAM, self.statements)
+        self.assertIsNone(self.cache().load(self.path, PROGRAM + "display- 1.\n"))
+        self.assertIsNone(self.cache(dict(CONFIG, declare=["let"])).load(self.path, PROGRAM))
+        status = os.stat(self.module)
+        os.utime(self.module, ns=(status.st_atime_ns, status.st_mtime_ns + 10 ** 9))
+        self.assertIsNone(self.cache().load(self.path, PROGRAM))
+
+    def test_truncated_file(self):
+        cache = self.cache()
+        cache.store(self.path, PROGRAM, self.statements)
+        with open(cache.path_for(self.path), 'r+b') as file:
+            file.truncate(len(cache.header(PROGRAM)) + 10)
+        self.assertIsNone(cache.load(self.path, PROGRAM))
+
+    def test_corrupt_file(self):
+        cache = self.cache()
+        for garbage in (b"garbage\n", b"\x80\x05\x8c\x03abc\x94)R."):
+            with self.subTest(garbage=garbage):
+                cache.store(self.path, PROGRAM, self.statements)
+                with open(cache.path_for(self.path), 'r+b') as file:
+                    file.seek(len(cache.header(PROGRAM)))
+                    file.write(garbage)
+                    file.truncate()
+                self.assertIsNone(cache.load(self.path, PROGRAM))
+
+    def test_shared_directory_keeps_programs_apart(self):
+        cache = self.cache(directory=os.path.join(self.directory.name, "cache"))
+        other = os.path.join(self.directory.name, "sub", "prog.GRAH")
+        self.assertNotEqual(cache.path_for(self.path), cache.path_for(other))
+        cache.store(self.path, PROGRAM, self.statements)
+        self.assertIsNone(cache.load(other, PROGRAM))
+        self.assertIsNotNone(cache.load(self.path, PROGRAM))
+
+    def test_unwritable_location(self):
+        blocker = os.path.join(self.directory.name, "file")
+        open(blocker, 'w').close()
+        cache = self.cache(directory=os.path.join(blocker, "cache"))
+        cache.store(self.path, PROGRAM, self.statements)  # no exception
+        self.assertIsNone(cache.load(self.path, PROGRAM))
+
+
+class InterpreterCacheTest(unittest.TestCase):
+
+    def test_second_run_skips_the_parser(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "prog.GRAH")
+            for parsed in (True, False):
+                sink = CollectorSink()
+                interpreter = Interpreter(CONFIG, output=sink, cache=True)
+                if not parsed:
+                    interpreter.parser.parse = None  # would fail if called
+                interpreter.interpret(PROGRAM, path)
+                self.assertEqual(sink.getvalue(), EXPECTED)
+
+
+if __name__ == "__main__":
+    unittest.main()
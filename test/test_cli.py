@@ -0,0 +1,87 @@
+import contextlib
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+import grah_cli
+
+HERE = os.path.dirname(os.path.abspath(grah_cli.__file__))
+PROGRAM = 'grah int x = 2.\ndisplay- x * 21.\ndisplay- "done".\n'
+
+
+class CliTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = self.write("prog.GRAH", PROGRAM)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write(self, name, text):
+        path = os.path.join(self.directory.name, name)
+        with open(path, 'w') as file:
+            file.write(text)
+        return path
+
+    def main(self, *argv):
+        stdout, stderr = io.StringIO(), io.StringIO()
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+            status = grah_cli.main(list(argv))
+        return status, stdout.getvalue(), stderr.getvalue()
+
+    def test_run(self):
+        for options in ([], ["--backend", "vm"], ["--stream"], ["--no-optimize", "--no-cache"]):
+            with self.subTest(options=options):
+                self.assertEqual(self.main("run", self.path, *options), (0, "42\ndone\n", ""))
+
+    def test_output_file(self):
+        target = os.path.join(self.directory.name, "out.txt")
+        self.assertEqual(self.main("run", self.path, "--output", target), (0, "", ""))
+        with open(target) as file:
+            self.assertEqual(file.read(), "42\ndone\n")
+
+    def test_dialect(self):
+        dialect = self.write("dialect.json", json.dumps({"declare": "let", "display": ["say", "show"]}))
+        program = self.write("dialect.GRAH", "let int x = 4.\nsay x.\nshow x + 1.\n")
+        self.assertEqual(self.main("run", program, "--config", dialect), (0, "4\n5\n", ""))
+
+    def test_bad_dialects(self):
+        cases = {
+            "missing.json": None,
+            "list.json": "[]",
+            "unknown.json": '{"while": "loop"}',
+            "empty.json": '{"declare": []}',
+            "broken.json": "{",
+        }
+        for name, text in cases.items():
+            with self.subTest(name=name):
+                path = self.write(name, text) if text is not None else os.path.join(self.directory.name, name)
+                status, stdout, stderr = self.main("run", self.path, "--config", path)
+                self.assertEqual((status, stdout), (2, ""))
+                self.assertTrue(stderr.startswith(f"Error: Cannot load dialect '{path}': "))
+
+    def test_missing_file(self):
+        missing = os.path.join(self.directory.name, "missing.GRAH")
+        self.assertEqual(self.main("run", missing), (1, "File not found.\n", ""))
+
+    def test_interpreter_script_exit_status(self):
+        for path, status in ((self.path, 0), (os.path.join(self.directory.name, "missing.GRAH"), 1)):
+            with self.subTest(path=path):
+                result = subprocess.run([sys.executable, "Interpreter.py", path], cwd=HERE,
+                                        capture_output=True, text=True, timeout=60)
+                self.assertEqual(result.returncode, status)
+
+    def test_headless_from_stdin(self):
+        check = "import sys, grah_cli; grah_cli.main(['run', '-']); sys.exit('tkinter' in sys.modules)"
+        result = subprocess.run([sys.executable, "-c", check], cwd=HERE, input=PROGRAM,
+                                capture_output=True, text=True, timeout=60)
+        self.assertEqual((result.returncode, result.stdout), (0, "42\ndone\n"))
+
+
+if __name__ == "__main__":
+    unittest.main()
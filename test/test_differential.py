@@ -0,0 +1,376 @@
+# Differential tests: every program must print exactly the same thing, errors
+# included, on each backend with the optimizer on and off, and in the tree
+# walker with hot statements compiled early, late or never. The plain tree
+# walker is the reference.
+#
+#   python -m unittest test_differential      (from this directory)
+#   python -m pytest test_differential.py
+import io
+import unittest
+from contextlib import redirect_stdout
+
+from Interpreter import Interpreter
+
+CONFIG = {
+    "declare": ["grah", "hero"], "display": ["display-"], "int": "int", "string": "string",
+    "for": "for", "if": "if", "else": "else", "print": "print",
+    "switch": "switch", "case": "case", "default": "default",
+}
+
+# Interpreter options for each run; "threshold" sets both tiering thresholds
+# and None turns tiering off
+REFERENCE = {"backend": "ast", "optimize": False, "threshold": None}
+CONFIGURATIONS = [
+    {"backend": "ast", "optimize": True, "threshold": None},
+    {"backend": "ast", "optimize": False, "threshold": 64}, {"backend": "ast", "optimize": True, "threshold": 64},
+    {"backend": "ast", "optimize": False, "threshold": 1}, {"backend": "ast", "optimize": True, "threshold": 1},
+    {"backend": "vm", "optimize": False}, {"backend": "vm", "optimize": True},
+    {"backend": "python", "optimize": False}, {"backend": "python", "optimize": True},
+]
+
+BASICS = """
+grah int n = 7.
+hero string s = "ab".
+display- n * 3 + 1.
+display- n / 2.
+display- n - 10 * 2.
+display- s + "c".
+display- n > 3.
+display- n == 7.
+for i in range 3 {
+    print i.
+    print s.
+    for j in range 2 {
+        n = n + i * j.
+    }
+}
+display- "".
+display- n.
+if n > 8 {
+    display- "big".
+} else {
+    display- "small".
+}
+if n < 8 {
+    display- "never".
+}
+for i in range 5 {
+    switch i {
+        case 1:
+            display- "one".
+        case 3:
+            display- "three".
+        default:
+            display- i * 10.
+    }
+}
+switch s {
+    case ab:
+        display- "matched".
+    default:
+        display- "missed".
+}
+display- q + 1.
+display- n / 0.
+z = 4.
+"""
+
+FOLDING = """
+grah int n = 2 * 3 + 1.
+display- n + 4 * 5.
+display- 10 / 4 + n.
+display- 1 / 0 + n.
+display- "a" + "b".
+if 2 > 1 {
+    display- "taken".
+} else {
+    display- "not taken".
+}
+if 1 == 2 {
+    display- 5 / 0.
+    n = 0.
+}
+for i in range 0 {
+    display- i.
+}
+for i in range 4 {
+    switch i {
+        case 2:
+            display- "two".
+        case 7:
+            display- "seven".
+        case x:
+            display- "x".
+        default:
+            display- i.
+    }
+}
+grah int k = 5.
+switch k {
+    case 5:
+        display- "five".
+    case abc:
+        display- "abc".
+}
+display- n.
+"""
+
+HOT = """
+grah int total = 0.
+grah string s = "".
+for i in range 200 {
+    total = total + i * 2.
+    if i > 190 {
+        display- total.
+    } else {
+        s = s + "x".
+    }
+    switch i {
+        case 5:
+            display- "five".
+        case 150:
+            display- 10 / 0.
+        default:
+            total = total - 1.
+    }
+    for j in range 3 {
+        total = total + j.
+    }
+}
+display- total.
+display- s == "x".
+for i in range 100 {
+    if i == 50 {
+        display- q * 2.
+        display- i.
+    }
+}
+"""
+
+MEMOS = """
+grah int base = 3.
+grah int offset = 4.
+grah int total = 0.
+grah int zero = 0.
+for i in range 70 {
+    total = total + base * 100 + offset + i * i.
+    if i * i > 4700 {
+        display- i * i + base * 100.
+    }
+    offset = offset + 0.
+    total = total - i * i.
+}
+display- total.
+for i in range 3 {
+    display- base * 2 + i.
+    base = base + 1.
+    display- base * 2 + i.
+}
+for i in range 0 {
+    display- 1 / zero.
+}
+for i in range 3 {
+    if i > 5 {
+        display- base / zero.
+    }
+    display- i + base / zero.
+    display- missing + base.
+}
+for i in range 2 {
+    for j in range 2 {
+        display- offset * 2 + j.
+        offset = offset + 1.
+    }
+    display- offset * 2.
+}
+"""
+
+CLOSED_FORMS = """
+grah int total = 0.
+grah int k = 3.
+for i in range 1000 {
+    grah int t = i * k.
+    total = total + t * t - i.
+}
+display- total.
+grah int last = 0.
+for i in range 2005 {
+    last = i + 1.
+}
+display- last.
+display- i.
+grah int x = 0.
+grah int y = 1.
+for i in range 10 {
+    x = x + y.
+    y = y + 2.
+}
+display- x.
+display- y.
+for i in range 0 {
+    total = total * 2.
+}
+display- total.
+grah string w = "ab".
+for i in range 3 {
+    w = w * 2.
+}
+display- w.
+for i in range 3 {
+    x = x + nope.
+}
+display- x.
+for i in range 4 {
+    grah int fresh = i * 2.
+}
+display- fresh.
+"""
+
+ARRAYS = """
+grah array a = [1, 2, 3].
+grah array b = [10, 20, 30].
+display- a + b.
+display- a * 3.
+display- 3 - a.
+grah array c = a.
+append c 5.
+display- a.
+display- c.
+c = a.
+append c a.
+display- c.
+display- a.
+grah int s = 0.
+for x in c {
+    s = s + x.
+    append c x.
+}
+display- s.
+display- length c.
+display- a + c.
+display- a [ 9 ].
+append a "hi".
+grah array big = [9223372036854775807].
+display- big + 1.
+grah array acc = [].
+for i in range 100 {
+    grah array u = a * i.
+    append u i.
+    append acc u [ 3 ] + length u.
+}
+display- acc.
+display- length acc.
+"""
+
+ARRAY_ERRORS = """
+grah array a = [1, 2].
+grah int h = 0.
+display- a / 2.
+display- 2 / a.
+display- a + "x".
+display- "x" + a.
+display- a > 1.
+display- a <= a.
+h = 3 / 2.
+display- a * h.
+display- h - a.
+h = 1 < 2.
+display- a * h.
+display- a == a.
+display- a != a.
+for i in range 3 {
+    if a > i {
+        display- "never".
+    }
+}
+display- "done".
+"""
+
+
+def nested(depth):
+    # A hot loop around `depth` nested loops
+    lines = ["grah int n = 0.", "for i in range 100 {"]
+    lines += [f"for v{level} in range 1 {{" for level in range(depth)]
+    lines += ["n = n + i."] + ["}"] * (depth + 1) + ["display- n."]
+    return "\n".join(lines)
+
+
+def long_expression(terms):
+    # A hot loop around one expression `terms` operators deep
+    return "\n".join(["grah int n = 0.", "for i in range 100 {",
+                      "n = n" + " + 1" * terms + " - i.", "}", "display- n."])
+
+
+def run(program, threshold=None, **options):
+    output = io.StringIO()
+    with redirect_stdout(output):
+        interpreter = Interpreter(CONFIG, tiering=threshold is not None, **options)
+        if interpreter.tiering is not None:
+            interpreter.tiering.loop_threshold = interpreter.tiering.branch_threshold = threshold
+        interpreter.interpret(program.strip())
+    return output.getvalue()
+
+
+class DifferentialTest(unittest.TestCase):
+
+    def check(self, program, configurations=CONFIGURATIONS):
+        expected = run(program, **REFERENCE)
+        self.assertTrue(expected)
+        for options in configurations:
+            with self.subTest(**options):
+                self.assertEqual(run(program, **options), expected)
+        return expected
+
+    def test_basics(self):
+        output = self.check(BASICS)
+        self.assertTrue(output.startswith("22\n3.5\n-13\nabc\nTrue\nTrue\n"))
+        self.assertIn("Error: Variable 'q' is not defined.\n", output)
+
+    def test_constant_folding(self):
+        output = self.check(FOLDING)
+        self.assertTrue(output.startswith("27\n9.5\nError: Division by zero.\n"))
+
+    def test_hot_statements(self):
+        output = self.check(HOT)
+        self.assertTrue(output.startswith("five\nError: Division by zero.\n"))
+        self.assertIn("Error: Variable 'q' is not defined.\n", output)
+
+    def test_shared_subexpressions(self):
+        output = self.check(MEMOS)
+        self.assertTrue(output.startswith("5061\n21280\n6\n8\n9\n11\n12\n14\nError: Division by zero.\n"))
+
+    def test_closed_forms(self):
+        output = self.check(CLOSED_FORMS)
+        self.assertTrue(output.startswith("2995002000\n2005\n"))
+
+    def test_arrays(self):
+        output = self.check(ARRAYS)
+        # Assignments copy arrays; appending through one name never shows through another
+        self.assertIn("[1, 2, 3]\n[1, 2, 3, 5]\n[1, 2, 3, 1, 2, 3]\n[1, 2, 3]\n", output)
+
+    def test_arrays_hold_ints_not_bools(self):
+        output = self.check("grah array a = [1].\nappend a 1 < 2.\ndisplay- a.")
+        self.assertEqual(output, "Error: Arrays hold integers only.\n[1]\n")
+
+    def test_array_operator_errors(self):
+        output = self.check(ARRAY_ERRORS)
+        self.assertEqual(output, "\n".join([
+            "Error: Cannot apply '/' to an array.",
+            "Error: Cannot apply '/' to an array.",
+            "Error: Cannot apply '+' to an array and a string.",
+            "Error: Cannot apply '+' to an array and a string.",
+            "Error: Arrays can only be compared with '==' and '!='.",
+            "Error: Arrays can only be compared with '==' and '!='.",
+            "Error: Cannot apply '*' to an array and a fraction.",
+            "Error: Cannot apply '-' to an array and a fraction.",
+            "Error: Cannot apply '*' to an array and a comparison result.",
+            "True", "False",
+        ] + ["Error: Arrays can only be compared with '==' and '!='."] * 3 + ["done", ""]))
+
+    def test_deep_programs(self):
+        self.assertEqual(self.check(nested(400)), "4950\n")
+        self.assertEqual(self.check(long_expression(2000)), "195050\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
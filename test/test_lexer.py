@@ -0,0 +1,82 @@
+import re
+import time
+import unittest
+
+from grah_lexer import Lexer, KEYWORD, IDENT, INT, STRING, OP, LBRACE, RBRACE, PERIOD, OTHER
+
+CONFIG = {
+    "declare": ["grah", "hero"], "display": ["display-"], "int": "int", "string": "string",
+    "for": "for", "if": "if", "else": "else", "print": "print",
+    "switch": "switch", "case": "case", "default": "default",
+}
+
+
+class LexerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.lexer = Lexer(CONFIG)
+
+    def test_lines(self):
+        lines = list(self.lexer.lines('grah int x = 5.\n\n  display- "a  b" + x.  '))
+        self.assertEqual([text for text, _ in lines], ["grah int x = 5.", "", 'display- "a  b" + x.'])
+        self.assertEqual(lines[0][1], ["grah", "int", "x", "=", "5", "."])
+        self.assertEqual(lines[1][1], [])
+        self.assertEqual(lines[2][1], ["display-", '"a  b"', "+", "x", "."])
+
+    def test_tokens_are_plain_strings(self):
+        self.assertEqual({type(token) for token in self.lexer.tokenize('grah int x = [1, 2] + "a".')}, {str})
+
+    def test_kinds_and_positions(self):
+        tokens = list(self.lexer.scan('for i in range 3 {\n  x = "s" >= 10.\n}'))
+        self.assertEqual([(text, kind, line, column) for kind, text, line, column in tokens], [
+            ("for", KEYWORD, 1, 1), ("i", IDENT, 1, 5), ("in", IDENT, 1, 7), ("range", IDENT, 1, 10),
+            ("3", INT, 1, 16), ("{", LBRACE, 1, 18),
+            ("x", IDENT, 2, 3), ("=", OP, 2, 5), ('"s"', STRING, 2, 7), (">=", OP, 2, 11),
+            ("10", INT, 2, 14), (".", PERIOD, 2, 16),
+            ("}", RBRACE, 3, 1),
+        ])
+
+    def test_words_end_at_whitespace(self):
+        # As with the old whitespace split, 'x+1' is one (unrecognised) word
+        self.assertEqual(self.lexer.tokenize("display- x+1 . y."), ["display-", "x+1", ".", "y", "."])
+        kinds = [kind for kind, _, _, _ in self.lexer.scan("display- x+1 . y.")]
+        self.assertEqual(kinds, [KEYWORD, OTHER, OTHER, IDENT, PERIOD])
+
+    def test_scan_finds_the_same_words(self):
+        source = '\n'.join([
+            'grah array a = [1,2 ,3].',
+            'display- a [ 0 ]+ "x, [y]" ab"c d" 1.. x . y.',
+            '  \t if x>=1 {  ',
+            'length a, "unterminated',
+            '',
+        ])
+        texts = [text for _, text, _, _ in self.lexer.scan(source)]
+        self.assertEqual(texts, self.lexer.tokenize(source))
+        self.assertEqual(len(list(self.lexer.lines(source))), 5)
+
+    def test_dialect_keywords(self):
+        lexer = Lexer(dict(CONFIG, declare=["let"], display=["show"]))
+        kinds = [kind for kind, _, _, _ in lexer.scan("let show grah display-")]
+        self.assertEqual(kinds, [KEYWORD, KEYWORD, IDENT, OTHER])
+
+    def test_throughput(self):
+        # Lexing stays within a small factor of splitting the same lines with
+        # a bare regex; building an object per token costs several times more
+        source = ('grah int x = 0.\nfor i in range 10 {\n    x = x + i * 2.\n'
+                  '    display- "x is" + x.\n}\n') * 2000
+        words = re.compile(r'\S+').findall
+
+        def best(function):
+            times = []
+            for _ in range(5):
+                started = time.perf_counter()
+                function()
+                times.append(time.perf_counter() - started)
+            return min(times)
+
+        lexing = best(lambda: list(self.lexer.lines(source)))
+        splitting = best(lambda: [words(line) for line in source.split("\n")])
+        self.assertLess(lexing, 8 * splitting)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+import unittest
+
+from Interpreter import Interpreter
+from grah_expr import compile_expression, CONST, VAR
+from grah_optimize import fold
+from grah_output import CollectorSink
+
+CONFIG = {
+    "declare": ["grah", "hero"], "display": ["display-"], "int": "int", "string": "string",
+    "for": "for", "if": "if", "else": "else", "print": "print",
+    "switch": "switch", "case": "case", "default": "default",
+}
+
+
+class FoldTest(unittest.TestCase):
+
+    def setUp(self):
+        self.lexer = Interpreter(CONFIG).lexer
+
+    def fold(self, text):
+        return fold(compile_expression(self.lexer.tokenize(text)))
+
+    def test_constant_operators_collapse(self):
+        self.assertEqual(self.fold("2 * 3 + 4"), ((CONST, 10),))
+        self.assertEqual(self.fold('"a" + "b"'), ((CONST, "ab"),))
+
+    def test_variables_stop_folding(self):
+        program = self.fold("x + 2 * 3")
+        self.assertEqual(program[:2], ((VAR, "x"), (CONST, 6)))
+        self.assertEqual(len(program), 3)
+
+    def test_failing_operators_are_left_for_the_runtime(self):
+        self.assertEqual(len(self.fold("1 / 0")), 3)
+
+    def test_three_is_a_constant(self):
+        # The value 3 once doubled as the "not constant" marker
+        self.assertEqual(self.fold("1 + 2"), ((CONST, 3),))
+        self.assertEqual(self.fold("1 + 2 * 1 + 4"), ((CONST, 7),))
+
+    def test_long_string_repetition_is_left_for_the_runtime(self):
+        self.assertEqual(self.fold('"ab" * 3'), ((CONST, "ababab"),))
+        self.assertEqual(len(self.fold('"a" * 1000000000')), 3)
+        self.assertEqual(len(self.fold('1000000000 * "a"')), 3)
+        program = self.fold('"ab" * 1000 * 1000')
+        self.assertEqual(program[:2], ((CONST, "ab" * 1000), (CONST, 1000)))
+        self.assertEqual(len(program), 3)
+
+
+class ReportTest(unittest.TestCase):
+
+    def test_notes(self):
+        interpreter = Interpreter(CONFIG, output=CollectorSink())
+        interpreter.optimizer.report = True
+        interpreter.interpret("\n".join([
+            "display- 2 + 5.",
+            "if 1 > 2 {",
+            "    display- 3.",
+            "}",
+            "for i in range 0 {",
+            "    display- i.",
+            "}",
+            "for i in range 3 {",
+            "    switch i {",
+            "        case 9:",
+            "            display- i.",
+            "        case 1:",
+            "            display- 0.",
+            "    }",
+            "}",
+        ]))
+        self.assertEqual(interpreter.output.getvalue(), "7\n0\n")
+        notes = interpreter.optimizer.notes
+        self.assertIn("line 1: folded '2 + 5' to 7", notes)
+        self.assertIn("line 2: condition is always false; removed the 'if' branch", notes)
+        self.assertIn("line 5: removed 'for' loop over range 0", notes)
+        self.assertIn("line 9: removed unreachable 'switch' cases 9", notes)
+
+    def test_condition_of_three(self):
+        interpreter = Interpreter(CONFIG, output=CollectorSink())
+        interpreter.optimizer.report = True
+        interpreter.interpret("if 1 + 2 {\n    display- 1.\n} else {\n    display- 0.\n}")
+        self.assertEqual(interpreter.output.getvalue(), "1\n")
+        self.assertIn("line 1: condition is always true; removed the 'else' branch", interpreter.optimizer.notes)
+
+    def test_unreachable_code_is_never_folded(self):
+        interpreter = Interpreter(CONFIG, output=CollectorSink())
+        interpreter.optimizer.report = True
+        interpreter.interpret("\n".join([
+            "grah int k = 1.",
+            "if 1 > 2 {",
+            "    display- 2 * 3.",
+            "    k = 5.",
+            "}",
+            "switch k {",
+            "    case 1:",
+            '        display- "one".',
+            "    case abc:",
+            '        display- "abc".',
+            "}",
+        ]))
+        self.assertEqual(interpreter.output.getvalue(), "one\n")
+        notes = interpreter.optimizer.notes
+        self.assertFalse([note for note in notes if note.startswith("line 3:")])
+        self.assertIn("line 6: removed unreachable 'switch' cases abc", notes)
+
+    def test_off(self):
+        self.assertIsNone(Interpreter(CONFIG, optimize=False).optimizer)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+import io
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+
+from Interpreter import Interpreter
+from grah_output import BufferedSink, CollectorSink, FileSink
+
+CONFIG = {
+    "declare": ["grah", "hero"], "display": ["display-"], "int": "int", "string": "string",
+    "for": "for", "if": "if", "else": "else", "print": "print",
+    "switch": "switch", "case": "case", "default": "default",
+}
+
+PROGRAM = """print 1.
+print "a".
+display- 2.
+display- q.
+for i in range 2 {
+    print i.
+}
+display- 3 / 0.
+"""
+EXPECTED = "1a\n2\nError: Variable 'q' is not defined.\n01Error: Division by zero.\nError: Invalid expression.\n"
+
+
+class SinkTest(unittest.TestCase):
+
+    def test_buffered_sink_holds_writes_until_threshold(self):
+        stream = io.StringIO()
+        sink = BufferedSink(stream, flush_threshold=5)
+        sink.write("ab")
+        sink.write("c")
+        self.assertEqual(stream.getvalue(), "")
+        sink.write("de")
+        self.assertEqual(stream.getvalue(), "abcde")
+        sink.write("f")
+        sink.flush()
+        self.assertEqual(stream.getvalue(), "abcdef")
+
+    def test_buffered_sink_writes_to_current_stdout(self):
+        sink = BufferedSink()
+        sink.write("x")
+        output = io.StringIO()
+        with redirect_stdout(output):
+            sink.flush()
+        self.assertEqual(output.getvalue(), "x")
+
+    def test_collector_sink(self):
+        sink = CollectorSink()
+        sink.write("a")
+        sink.write("b")
+        self.assertEqual(sink.getvalue(), "ab")
+        sink.clear()
+        self.assertEqual(sink.getvalue(), "")
+
+    def test_file_sink(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "out.txt")
+            sink = FileSink(path)
+            sink.write("hello\n")
+            sink.close()
+            with open(path) as file:
+                self.assertEqual(file.read(), "hello\n")
+
+
+class InterpreterOutputTest(unittest.TestCase):
+
+    def test_every_backend_writes_only_to_its_sink(self):
+        for backend in ("ast", "vm", "python"):
+            with self.subTest(backend=backend):
+                sink = CollectorSink()
+                stdout = io.StringIO()
+                with redirect_stdout(stdout):
+                    Interpreter(CONFIG, backend=backend, output=sink).interpret(PROGRAM)
+                self.assertEqual(sink.getvalue(), EXPECTED)
+                self.assertEqual(stdout.getvalue(), "")
+
+    def test_output_is_flushed_when_a_run_ends(self):
+        stream = io.StringIO()
+        Interpreter(CONFIG, output=BufferedSink(stream)).interpret("display- 1.")
+        self.assertEqual(stream.getvalue(), "1\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+import unittest
+
+from Interpreter import Interpreter
+from grah_ast import ForLoop, IfStatement, SwitchStatement, Display, SyntaxErrorStatement
+from grah_output import CollectorSink
+
+CONFIG = {
+    "declare": ["grah", "hero"], "display": ["display-"], "int": "int", "string": "string",
+    "for": "for", "if": "if", "else": "else", "print": "print",
+    "switch": "switch", "case": "case", "default": "default",
+}
+
+
+def run(program, backend="ast"):
+    sink = CollectorSink()
+    Interpreter(CONFIG, backend=backend, output=sink).interpret(program)
+    return sink.getvalue()
+
+
+class BlockTest(unittest.TestCase):
+
+    def setUp(self):
+        self.parser = Interpreter(CONFIG).parser
+
+    def test_block_structure(self):
+        statements = self.parser.parse("\n".join([
+            "for i in range 2 {",
+            "    if i > 0 {",
+            "        display- i.",
+            "    } else {",
+            "        display- 0.",
+            "        display- 1.",
+            "    }",
+            "    switch i {",
+            "        case 1:",
+            "            display- 1.",
+            "        default:",
+            "            display- 2.",
+            "    }",
+            "}",
+            "display- 3.",
+        ]))
+        self.assertEqual([node.__class__ for node in statements], [ForLoop, Display])
+        loop = statements[0]
+        self.assertEqual([node.__class__ for node in loop.body], [IfStatement, SwitchStatement])
+        branch = loop.body[0]
+        self.assertEqual((len(branch.body), len(branch.else_body)), (1, 2))
+        self.assertEqual(statements[1].line, 15)
+
+    def test_deep_nesting(self):
+        depth = 400
+        lines = [f"for v{level} in range 1 {{" for level in range(depth)] + ["display- 1."] + ["}"] * depth
+        node = self.parser.parse("\n".join(lines))[0]
+        for _ in range(depth - 1):
+            self.assertEqual(len(node.body), 1)
+            node = node.body[0]
+        self.assertEqual(node.body[0].__class__, Display)
+
+
+class MismatchTest(unittest.TestCase):
+
+    PROGRAM = "\n".join([
+        "display- 1.",
+        "}",
+        "for i in range 2 {",
+        "    display- i.",
+        "if 1 > 0 {",
+        '    display- "yes".',
+        "} else {",
+        '    display- "no".',
+        "}",
+        "display- 2.",
+    ])
+
+    def test_reported_once_before_anything_runs(self):
+        expected = ("Syntax Error: Mismatched braces: '}' on line 2 has no matching '{'.\n"
+                    "Syntax Error: Mismatched braces: '{' on line 3 is never closed.\n"
+                    "1\nError: Variable 'i' is not defined.\nyes\n2\n")
+        for backend in ("ast", "vm", "python"):
+            with self.subTest(backend=backend):
+                self.assertEqual(run(self.PROGRAM, backend), expected)
+
+    def test_errors_carry_their_lines(self):
+        errors = [node for node in Interpreter(CONFIG).parser.parse(self.PROGRAM)
+                  if node.__class__ is SyntaxErrorStatement]
+        self.assertEqual([error.line for error in errors], [2, 3])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+import json
+import unittest
+
+from Interpreter import Interpreter
+from grah_output import CollectorSink
+from grah_profiler import Profiler
+
+CONFIG = {
+    "declare": ["grah", "hero"], "display": ["display-"], "int": "int", "string": "string",
+    "for": "for", "if": "if", "else": "else", "print": "print",
+    "switch": "switch", "case": "case", "default": "default",
+}
+
+PROGRAM = """grah int n = 0.
+for i in range 5 {
+    n = n + i.
+    if i > 2 {
+        display- n.
+    }
+}
+"""
+
+
+class Node:
+    def __init__(self, line):
+        self.line = line
+
+
+class ProfilerTest(unittest.TestCase):
+
+    def test_total_and_own_time(self):
+        ticks = iter([0.0, 1.0, 3.0, 10.0])  # outer starts, inner starts, inner ends, outer ends
+        profiler = Profiler(clock=lambda: next(ticks))
+        inner = profiler.wrap_statement(lambda node: None)
+        outer = profiler.wrap_statement(lambda node: inner(Node(2)))
+        outer(Node(1))
+        self.assertEqual((profiler.lines[1].count, profiler.lines[1].total, profiler.lines[1].own), (1, 10.0, 8.0))
+        self.assertEqual((profiler.lines[2].count, profiler.lines[2].total, profiler.lines[2].own), (1, 2.0, 2.0))
+        self.assertEqual(profiler.stacks, {(1,): 8.0, (1, 2): 2.0})
+
+    def profile(self, backend="ast"):
+        sink = CollectorSink()
+        interpreter = Interpreter(CONFIG, backend=backend, output=sink, profile=True)
+        interpreter.interpret(PROGRAM)
+        self.assertEqual(sink.getvalue(), "6\n10\n")
+        return interpreter.profiler
+
+    def test_counts_every_line_on_every_backend(self):
+        for backend in ("ast", "vm", "python"):
+            with self.subTest(backend=backend):
+                rows = json.loads(self.profile(backend).report("json"))
+                counts = {row["line"]: row["count"] for row in rows}
+                self.assertEqual(counts, {1: 1, 2: 1, 3: 5, 4: 5, 5: 2})
+                for row in rows:
+                    self.assertGreaterEqual(row["total"], row["own"])
+                    self.assertGreaterEqual(row["own"], 0)
+
+    def test_closed_form_loops_run_every_iteration(self):
+        program = "grah int n = 0.\nfor i in range 50 {\n    n = n + i.\n}\ndisplay- n.\n"
+        for backend in ("ast", "vm", "python"):
+            with self.subTest(backend=backend):
+                sink = CollectorSink()
+                interpreter = Interpreter(CONFIG, backend=backend, output=sink, profile=True)
+                interpreter.interpret(program)
+                self.assertEqual(sink.getvalue(), "1225\n")
+                rows = json.loads(interpreter.profiler.report("json"))
+                self.assertEqual({row["line"]: row["count"] for row in rows}, {1: 1, 2: 1, 3: 50, 5: 1})
+
+    def test_reports(self):
+        profiler = self.profile()
+        table = profiler.report("table").split("\n")
+        self.assertEqual(table[0].split(), ["line", "count", "total", "ms", "own", "ms", "expr", "ms", "source"])
+        self.assertEqual(len(table), 6)
+        stacks = [line.rsplit(" ", 1)[0] for line in profiler.report("collapsed").split("\n")]
+        self.assertIn("line 2: for i in range 5 {;line 4: if i > 2 {;line 5: display- n.", stacks)
+
+
+if __name__ == "__main__":
+    unittest.main()
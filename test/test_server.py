@@ -0,0 +1,150 @@
+import asyncio
+import os
+import signal
+import socket
+import stat
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+
+import grah_cli
+import grah_server
+from grah_client import Client
+
+HERE = os.path.dirname(os.path.abspath(grah_cli.__file__))
+
+# Runs far longer than any test waits for
+FOREVER = """grah int n = 0.
+for i in range 1000000000 {
+    if n > 5 {
+        n = 0.
+    } else {
+        n = n + 1.
+    }
+}
+"""
+
+
+class ServerTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.path = os.path.join(cls.directory.name, "grah.sock")
+        cls.server = subprocess.Popen(
+            [sys.executable, "grah_cli.py", "serve", "--socket", cls.path, "--workers", "2", "--timeout", "10"],
+            cwd=HERE, stderr=subprocess.PIPE, text=True)
+        cls.server.stderr.readline()  # printed once the socket is listening
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.send_signal(signal.SIGTERM)
+        cls.server.wait(10)
+        cls.server.stderr.close()
+        cls.directory.cleanup()
+
+    def submit(self, code, **options):
+        client = Client(self.path)
+        try:
+            return list(client.submit(code, **options))
+        finally:
+            client.close()
+
+    def test_round_trip(self):
+        for backend in ("ast", "vm", "python"):
+            with self.subTest(backend=backend):
+                messages = self.submit('display- 6 * 7.\ndisplay- "x".\n', backend=backend)
+                self.assertEqual("".join(text for kind, text in messages if kind == "output"), "42\nx\n")
+                self.assertEqual(messages[-1], ("done", None))
+
+    def test_dialect_and_fresh_scope(self):
+        code = "let int x = 1.\nsay x.\n"
+        for _ in range(2):  # the second run reuses the prepared program
+            self.assertEqual(self.submit(code, config={"declare": "let", "display": "say"}),
+                             [("output", "1\n"), ("done", None)])
+        self.assertEqual(self.submit("display- x.\n"), [("output", "Error: Variable 'x' is not defined.\n"),
+                                                        ("done", None)])
+
+    def test_bad_requests(self):
+        self.assertEqual(self.submit("display- 1.", backend="jit"),
+                         [("error", "Error: Bad request: unknown backend 'jit'."), ("done", None)])
+        self.assertEqual(self.submit("display- 1.", timeout=-1),
+                         [("error", "Error: Bad request: 'timeout' must be a positive number of seconds."),
+                          ("done", None)])
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        connection.connect(self.path)
+        with connection, connection.makefile('rb') as reader:
+            connection.sendall(b"not json\n")
+            self.assertEqual(reader.readline(), b'["error", "Error: Bad request: a request must be one line of JSON."]\n')
+            self.assertEqual(reader.readline(), b'["done", null]\n')
+
+    def test_timeout_replaces_the_worker(self):
+        started = time.monotonic()
+        self.assertEqual(self.submit(FOREVER, timeout=0.5),
+                         [("error", "Error: Program stopped after 0.5 seconds."), ("done", None)])
+        self.assertLess(time.monotonic() - started, 5)
+        for _ in range(3):  # both workers still answer
+            self.assertEqual(self.submit("display- 1."), [("output", "1\n"), ("done", None)])
+
+    def test_socket_is_owner_only(self):
+        self.assertEqual(stat.S_IMODE(os.stat(self.path).st_mode), 0o600)
+
+
+class PoolTest(unittest.TestCase):
+
+    def test_cancelled_waiters(self):
+        async def scenario():
+            pool = grah_server.Pool(1)
+            worker = grah_server.Worker()  # never started
+            pool.release(worker)
+            self.assertIs(await pool.acquire(None), worker)
+            # Cancelled while waiting: leaves the queue
+            waiting = asyncio.ensure_future(pool.acquire(None))
+            await asyncio.sleep(0)
+            waiting.cancel()
+            await asyncio.gather(waiting, return_exceptions=True)
+            self.assertEqual(pool.waiters, [])
+            # Cancelled after being handed the worker: gives it back
+            waiting = asyncio.ensure_future(pool.acquire(None))
+            await asyncio.sleep(0)
+            pool.release(worker)
+            waiting.cancel()
+            await asyncio.gather(waiting, return_exceptions=True)
+            self.assertEqual(pool.idle, [worker])
+
+        asyncio.run(scenario())
+
+    def test_socket_is_created_owner_only(self):
+        # Checked as soon as the socket exists, before serve() could change it
+        class Created(Exception):
+            pass
+
+        async def start_unix_server(handle, path, **options):
+            server = await original(handle, path, **options)
+            modes.append(stat.S_IMODE(os.stat(path).st_mode))
+            server.close()
+            raise Created
+
+        async def no_workers():
+            pass
+
+        original = asyncio.start_unix_server
+        modes = []
+        umask = os.umask(0o022)
+        with tempfile.TemporaryDirectory() as directory:
+            server = grah_server.Server(os.path.join(directory, "grah.sock"), workers=1)
+            server.pool.start = no_workers
+            asyncio.start_unix_server = start_unix_server
+            try:
+                with self.assertRaises(Created):
+                    asyncio.run(server.serve())
+            finally:
+                asyncio.start_unix_server = original
+                os.umask(umask)
+        self.assertEqual(modes, [0o600])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+import io
+import unittest
+from contextlib import redirect_stdout
+
+from Interpreter import Interpreter
+from grah_slots import Variables
+
+CONFIG = {
+    "declare": ["grah", "hero"], "display": ["display-"], "int": "int", "string": "string",
+    "for": "for", "if": "if", "else": "else", "print": "print",
+    "switch": "switch", "case": "case", "default": "default",
+}
+
+PROGRAM = """grah int n = 2.
+display- n.
+for i in range 3 {
+    n = n + i.
+    if n > 3 {
+        display- "big".
+    } else {
+        display- "small".
+    }
+}
+switch n {
+    case 5:
+        display- "five".
+    default:
+        display- n.
+}
+display- q.
+display- n * 10.
+"""
+
+
+class Reader:
+    # A file that records, for every line handed out, the output printed so far
+    def __init__(self, text, output):
+        self.lines = text.splitlines(True)
+        self.output = output
+        self.seen = []
+
+    def __iter__(self):
+        for line in self.lines:
+            self.seen.append(self.output.getvalue())
+            yield line
+
+
+class CountedVariables(Variables):
+    # Walking every variable on each chunk would make a long stream quadratic
+    def keys(self):
+        raise AssertionError("walked every variable")
+
+    items = keys
+
+
+def run(backend, program=PROGRAM, batch_lines=None):
+    output = io.StringIO()
+    interpreter = Interpreter(CONFIG, backend=backend)
+    with redirect_stdout(output):
+        if batch_lines is None:
+            interpreter.interpret(program)
+        else:
+            interpreter.interpret_stream(io.StringIO(program), batch_lines)
+    return output.getvalue()
+
+
+class StreamTest(unittest.TestCase):
+
+    def test_same_output_as_whole_file(self):
+        for backend in ("ast", "vm", "python"):
+            expected = run(backend)
+            for batch_lines in (1, 2, 100):
+                with self.subTest(backend=backend, batch_lines=batch_lines):
+                    self.assertEqual(run(backend, batch_lines=batch_lines), expected)
+
+    def test_statements_run_as_their_lines_arrive(self):
+        output = io.StringIO()
+        reader = Reader(PROGRAM, output)
+        with redirect_stdout(output):
+            Interpreter(CONFIG).interpret_stream(reader)
+        # Line 2 has run before line 3 is read; the loop only once its '}' (line 10) is in
+        self.assertEqual(reader.seen[2], "2\n")
+        self.assertEqual(reader.seen[9], "2\n")
+        self.assertEqual(reader.seen[10], "2\nsmall\nsmall\nbig\n")
+
+    def test_missing_period_stops_reading(self):
+        output = io.StringIO()
+        reader = Reader("display- 1.\ndisplay- 2\ndisplay- 3.\n", output)
+        with redirect_stdout(output):
+            Interpreter(CONFIG).interpret_stream(reader)
+        self.assertEqual(output.getvalue(), "1\nSyntax Error: Statements must end with a period.\n")
+        self.assertEqual(len(reader.seen), 2)
+
+    def test_chunks_do_not_walk_every_variable(self):
+        program = "".join(f"grah int v{i} = {i}.\n" for i in range(200)) + "display- v7 + v199.\ndisplay- v200.\n"
+        for backend in ("ast", "vm", "python"):
+            with self.subTest(backend=backend):
+                output = io.StringIO()
+                interpreter = Interpreter(CONFIG, backend=backend)
+                interpreter.variables.__class__ = CountedVariables
+                with redirect_stdout(output):
+                    interpreter.interpret_stream(io.StringIO(program))
+                self.assertEqual(output.getvalue(), "206\nError: Variable 'v200' is not defined.\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+import unittest
+
+from Interpreter import Interpreter
+from grah_output import CollectorSink
+from grah_switch import SwitchTable
+
+CONFIG = {
+    "declare": ["grah", "hero"], "display": ["display-"], "int": "int", "string": "string",
+    "for": "for", "if": "if", "else": "else", "print": "print",
+    "switch": "switch", "case": "case", "default": "default",
+}
+
+
+class SwitchTableTest(unittest.TestCase):
+
+    def test_dense_ints(self):
+        table = SwitchTable(["3", "4", "6"])
+        self.assertIsNotNone(table.dense)
+        self.assertEqual([table.lookup(value) for value in range(2, 8)], [None, 0, 1, None, 2, None])
+
+    def test_sparse_ints(self):
+        table = SwitchTable(["1", "1000", "-5"])
+        self.assertIsNone(table.dense)
+        self.assertEqual([table.lookup(1), table.lookup(1000), table.lookup(-5), table.lookup(2)], [0, 1, 2, None])
+
+    def test_labels_that_no_int_prints_as(self):
+        table = SwitchTable(["007", "+7", "7"])
+        self.assertEqual(table.lookup(7), 2)
+        self.assertEqual(table.lookup("007"), 0)
+
+    def test_strings_and_other_values(self):
+        table = SwitchTable(["abc", "2.5", "True", "None", "abc"])
+        self.assertEqual(table.lookup("abc"), 0)  # the first of two equal labels wins
+        self.assertEqual(table.lookup(2.5), 1)
+        self.assertEqual(table.lookup(True), 2)
+        self.assertEqual(table.lookup(None), 3)
+        self.assertIsNone(table.lookup("x"))
+        self.assertIsNone(table.lookup(1))
+
+
+class SwitchStatementTest(unittest.TestCase):
+
+    PROGRAM = "\n".join([
+        'grah string s = "b".',
+        "for i in range 7 {",
+        "    switch i {",
+        "        case 1:",
+        '            display- "one".',
+        "        case 5:",
+        '            display- "five".',
+        "        case default:",
+        '            display- "labelled".',
+        "        default:",
+        "            display- i * 10.",
+        "    }",
+        "}",
+        "switch s {",
+        "    case a:",
+        '        display- "a".',
+        "    case b:",
+        '        display- "b".',
+        "}",
+        "grah int h = 0.",
+        "h = 5 / 2.",
+        "switch h {",
+        "    case 2:",
+        '        display- "int".',
+        "    case 2.5:",
+        '        display- "half".',
+        "    default:",
+        '        display- "none".',
+        "}",
+    ])
+    EXPECTED = "0\none\n20\n30\n40\nfive\n60\nb\nhalf\n"
+
+    def test_every_backend(self):
+        for backend in ("ast", "vm", "python"):
+            for optimize in (False, True):
+                with self.subTest(backend=backend, optimize=optimize):
+                    sink = CollectorSink()
+                    Interpreter(CONFIG, backend=backend, output=sink, optimize=optimize).interpret(self.PROGRAM)
+                    self.assertEqual(sink.getvalue(), self.EXPECTED)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+import queue
+import time
+import unittest
+
+from grah_output import QueueSink
+from grah_worker import Run
+
+CONFIG = {
+    "declare": ["grah", "hero"], "display": ["display-"], "int": "int", "string": "string",
+    "for": "for", "if": "if", "else": "else", "print": "print",
+    "switch": "switch", "case": "case", "default": "default",
+}
+
+# Runs far longer than any test waits for
+FOREVER = """display- "started".
+grah int n = 0.
+for i in range 1000000000 {
+    if n > 5 {
+        n = 0.
+    } else {
+        n = n + 1.
+    }
+}
+"""
+
+
+def collect(run, until=lambda messages: False, limit=30.0):
+    messages = []
+    deadline = time.monotonic() + limit
+    while time.monotonic() < deadline:
+        messages += run.poll()
+        if (messages and messages[-1][0] == "done") or until(messages):
+            return messages
+        time.sleep(0.01)
+    run.stop()
+    raise AssertionError(f"run did not finish: {messages}")
+
+
+def output(messages):
+    return "".join(text for kind, text in messages if kind == "output")
+
+
+class QueueSinkTest(unittest.TestCase):
+
+    def test_batches_until_threshold_or_flush(self):
+        messages = queue.Queue()
+        sink = QueueSink(messages, flush_threshold=4)
+        sink.write("ab")
+        self.assertTrue(messages.empty())
+        sink.write("cd")
+        self.assertEqual(messages.get_nowait(), ("output", "abcd"))
+        sink.write("e")
+        sink.flush()
+        sink.flush()
+        self.assertEqual(messages.get_nowait(), ("output", "e"))
+        self.assertTrue(messages.empty())
+
+
+class RunTest(unittest.TestCase):
+
+    def test_output_then_done(self):
+        run = Run(CONFIG, 'display- 1 + 1.\ndisplay- "x".\n')
+        messages = collect(run)
+        self.assertEqual(output(messages), "2\nx\n")
+        self.assertEqual(messages[-1], ("done", None))
+        self.assertTrue(run.finished)
+
+    def test_output_arrives_while_running_and_stop(self):
+        run = Run(CONFIG, FOREVER)
+        messages = collect(run, until=lambda messages: output(messages))
+        self.assertEqual(output(messages), "started\n")
+        self.assertFalse(run.finished)
+        run.stop()
+        self.assertTrue(run.finished)
+        self.assertFalse(run.process.is_alive())
+
+    def test_timeout(self):
+        run = Run(CONFIG, FOREVER, timeout=0.5)
+        messages = collect(run)
+        self.assertIn(("error", "Error: Program stopped after 0.5 seconds."), messages)
+        self.assertFalse(run.process.is_alive())
+
+    def test_runs_do_not_share_state(self):
+        collect(Run(CONFIG, "grah int x = 5.\n"))
+        messages = collect(Run(CONFIG, "display- x.\n"))
+        self.assertEqual(output(messages), "Error: Variable 'x' is not defined.\n")
+
+
+if __name__ == "__main__":
+    unittest.main()